@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the character and token chunking modes.
+
+For each mode, chunks the given documents and reports the number of chunks, the time
+spent chunking and embedding, and how many chunks exceed the embedding model's input
+length (and so get truncated, i.e. partly never seen by the model).
+
+Usage (from the backend directory):
+    python benchmarks/bench_chunking.py docs/report.pdf docs/handbook.docx ...
+Without arguments a synthetic corpus is used.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from processing.loader import DocumentSegment, iter_document_segments
+from processing.chunker import chunk_segments, configure_chunking, count_tokens
+from processing.embedder import _get_embedding_model
+
+def synthetic_corpus(pages: int = 200):
+    random.seed(0)
+    vocabulary = [
+        "project", "timeline", "stakeholder", "budget", "cultural", "communication", "meeting",
+        "deadline", "Switzerland", "negotiation", "hierarchy", "feedback", "punctuality", "team",
+        "milestone", "risk", "requirements", "deliverable", "review", "consensus"
+    ]
+    for page in range(1, pages + 1):
+        paragraphs = []
+        for _ in range(6):
+            sentences = [
+                " ".join(random.choice(vocabulary) for _ in range(random.randint(8, 20))).capitalize() + "."
+                for _ in range(random.randint(3, 8))
+            ]
+            paragraphs.append(" ".join(sentences))
+        yield DocumentSegment("\n\n".join(paragraphs), {"page": page})
+
+def load_segments(paths):
+    if not paths:
+        return list(synthetic_corpus())
+    segments = []
+    for path in paths:
+        segments.extend(iter_document_segments(path, os.path.basename(path)))
+    return segments
+
+def run_mode(mode, segments, model, tokens, overlap_tokens):
+    configure_chunking(mode=mode, tokens=tokens, overlap_tokens=overlap_tokens)
+
+    start = time.perf_counter()
+    chunks = [text for text, _ in chunk_segments(segments)]
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.encode(chunks, convert_to_tensor=False)
+    embed_seconds = time.perf_counter() - start
+
+    # [CLS] and [SEP] take two of the model's positions
+    budget = model.max_seq_length - 2
+    lengths = [count_tokens(chunk) for chunk in chunks]
+    truncated = [length for length in lengths if length > budget]
+    total_tokens = sum(lengths)
+    lost_tokens = sum(length - budget for length in truncated)
+
+    return {
+        "mode": mode,
+        "chunks": len(chunks),
+        "chunk_s": chunk_seconds,
+        "embed_s": embed_seconds,
+        "truncated": len(truncated) / len(chunks) if chunks else 0.0,
+        "tokens_lost": lost_tokens / total_tokens if total_tokens else 0.0,
+        "avg_tokens": total_tokens / len(chunks) if chunks else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Documents to chunk (PDF, DOCX, XLSX, XLS, TXT)")
+    parser.add_argument("--tokens", type=int, default=250, help="Chunk size in token mode")
+    parser.add_argument("--overlap-tokens", type=int, default=30, help="Chunk overlap in token mode")
+    args = parser.parse_args()
+
+    segments = load_segments(args.paths)
+    model = _get_embedding_model()
+    print(f"Model max sequence length: {model.max_seq_length} word-pieces\n")
+
+    print(f"{'mode':<12}{'chunks':>8}{'chunk s':>10}{'embed s':>10}{'avg tok':>10}{'truncated':>11}{'tok lost':>10}")
+    for mode in ("characters", "tokens"):
+        r = run_mode(mode, segments, model, args.tokens, args.overlap_tokens)
+        print(
+            f"{r['mode']:<12}{r['chunks']:>8}{r['chunk_s']:>10.2f}{r['embed_s']:>10.2f}"
+            f"{r['avg_tokens']:>10.1f}{r['truncated']:>10.1%}{r['tokens_lost']:>10.1%}"
+        )
+
+if __name__ == "__main__":
+    main()
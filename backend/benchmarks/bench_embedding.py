@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark on CPU.
+
+Compares the former embedding path (default encode settings, every vector converted to
+a list of Python floats) with embed_texts at several batch sizes, and reports chunks/sec.
+The persistent embedding cache is disabled so that every chunk is actually encoded.
+
+Usage (from the backend directory):
+    python benchmarks/bench_embedding.py [--chunks 2000] [--batch-sizes 16 32 64 128]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sentence_transformers import SentenceTransformer
+import processing.embedder as embedder
+
+def make_chunks(count: int):
+    """Chunks of varied length, like the output of the chunker."""
+    random.seed(0)
+    vocabulary = [
+        "project", "timeline", "stakeholder", "budget", "cultural", "communication", "meeting",
+        "deadline", "Switzerland", "negotiation", "hierarchy", "feedback", "punctuality", "team"
+    ]
+    return [
+        " ".join(random.choice(vocabulary) for _ in range(random.randint(5, 180)))
+        for _ in range(count)
+    ]
+
+def legacy_embed(chunks):
+    embeddings = embedder.model.encode(chunks, convert_to_tensor=False)
+    return [embedding.tolist() for embedding in embeddings]
+
+def timed(func, chunks):
+    start = time.perf_counter()
+    func(chunks)
+    return len(chunks) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="Number of chunks to embed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    args = parser.parse_args()
+
+    embedder.model = SentenceTransformer(embedder.MODEL_NAME, device="cpu")
+    embedder.configure_embedding_cache(enabled=False)
+    chunks = make_chunks(args.chunks)
+
+    # Warm up
+    embedder.model.encode(chunks[:32])
+
+    print(f"{args.chunks} chunks, model {embedder.MODEL_NAME}, CPU\n")
+    print(f"{'path':<28}{'chunks/sec':>12}")
+    print(f"{'encode + tolist (before)':<28}{timed(legacy_embed, chunks):>12.1f}")
+    for batch in args.batch_sizes:
+        embedder.configure_embedding(batch=batch)
+        print(f"{f'embed_texts batch={batch}':<28}{timed(embedder.embed_texts, chunks):>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compares the torch and ONNX embedding backends on CPU.
+
+Each backend runs in its own process so that its memory use can be measured in
+isolation. Reported per backend: model load time, single-query latency (p50/p95),
+batch throughput (chunks/sec) and peak RSS. The ONNX embeddings are then checked
+against the torch ones: the script exits with status 1 if any pair of embeddings has
+a cosine similarity below --min-cosine.
+
+Usage (from the backend directory):
+    python benchmarks/bench_embedding_backends.py [--onnx-file onnx/model_qint8_avx2.onnx]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+def make_texts(count: int, min_words: int, max_words: int):
+    random.seed(0)
+    vocabulary = [
+        "project", "timeline", "stakeholder", "budget", "cultural", "communication", "meeting",
+        "deadline", "Switzerland", "negotiation", "hierarchy", "feedback", "punctuality", "team"
+    ]
+    return [
+        " ".join(random.choice(vocabulary) for _ in range(random.randint(min_words, max_words)))
+        for _ in range(count)
+    ]
+
+def run_backend(backend: str, onnx_file: str, chunks: int, output: str):
+    """Measures one backend; runs in a child process."""
+    import processing.embedder as embedder
+
+    embedder.configure_embedding_cache(enabled=False)
+    embedder.configure_embedding(model_backend=backend, onnx_model_file=onnx_file)
+
+    start = time.perf_counter()
+    embedder._get_embedding_model()
+    load_seconds = time.perf_counter() - start
+
+    queries = make_texts(200, 3, 15)
+    embedder.embed_texts(queries[:10])
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.embed_texts([query])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    texts = make_texts(chunks, 5, 180)
+    start = time.perf_counter()
+    embeddings = embedder.embed_texts(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    np.save(output, embeddings)
+    # ru_maxrss is in kilobytes on Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "chunks_per_s": throughput,
+        "rss_mb": rss_mb,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-file", default="onnx/model_qint8_avx2.onnx", help="ONNX export to compare")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks embedded for the throughput run")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Minimum cosine similarity to the torch output")
+    parser.add_argument("--worker", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_backend(args.worker, args.onnx_file, args.chunks, args.output)
+        return
+
+    results, embeddings = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("torch", "onnx"):
+            output = os.path.join(tmp, f"{backend}.npy")
+            child = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, "--onnx-file", args.onnx_file,
+                 "--chunks", str(args.chunks), "--output", output],
+                check=True, capture_output=True, text=True
+            )
+            results[backend] = json.loads(child.stdout.strip().splitlines()[-1])
+            embeddings[backend] = np.load(output)
+
+    print(f"{'backend':<10}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'chunks/s':>10}{'RSS MB':>9}")
+    for backend, r in results.items():
+        print(
+            f"{backend:<10}{r['load_s']:>8.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+            f"{r['chunks_per_s']:>10.1f}{r['rss_mb']:>9.0f}"
+        )
+
+    # Rows are unit length, so the row-wise dot product is the cosine similarity
+    cosines = np.einsum("ij,ij->i", embeddings["torch"], embeddings["onnx"])
+    print(f"\nParity ({args.onnx_file} vs torch): min cosine {cosines.min():.4f}, mean {cosines.mean():.4f}")
+    if cosines.min() < args.min_cosine:
+        print(f"FAIL: below the {args.min_cosine} tolerance")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
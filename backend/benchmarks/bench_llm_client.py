@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark of LLM API calls made from async request handlers.
+
+Starts a local stub of the chat completions API that answers after a fixed latency,
+then sends the same number of requests at each concurrency level with:
+
+- blocking: requests.post called directly in a coroutine, as LLMService used to do;
+  the event loop is blocked for each round-trip, so concurrent requests are serialized
+- unpooled: a new httpx.AsyncClient (and connection) per request
+- pooled: PublicAIClient.achat_completion over the shared keep-alive connection pool
+
+and reports requests/sec. The stub speaks plain HTTP, so HTTP/2 (which the client
+negotiates over TLS) is not exercised here.
+
+Usage (from the backend directory):
+    python benchmarks/bench_llm_client.py [--requests 200] [--latency-ms 50] [--concurrency 1 10 100]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+import requests
+import uvicorn
+from services.llm_services import PublicAIClient, close_http_clients, configure_llm_http
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "stub answer"}, "finish_reason": "stop"}],
+    "usage": {"total_tokens": 42},
+}).encode()
+
+def make_stub(latency_s: float):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        while (await receive()).get("more_body"):
+            pass
+        await asyncio.sleep(latency_s)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": COMPLETION})
+    return app
+
+def _serve(port: int, latency_s: float):
+    uvicorn.run(make_stub(latency_s), host="127.0.0.1", port=port, log_level="error", backlog=2048)
+
+def start_stub(latency_s: float) -> str:
+    """Runs the stub in its own process, so that it does not compete with the client for the GIL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    multiprocessing.Process(target=_serve, args=(port, latency_s), daemon=True).start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+async def run_level(call, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+async def main_async(args):
+    base_url = start_stub(args.latency_ms / 1000)
+    client = PublicAIClient(api_key="benchmark", base_url=base_url)
+    url = f"{base_url}/chat/completions"
+    configure_llm_http(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+
+    async def blocking():
+        requests.post(url, headers=client.headers, json={"model": "stub", "messages": MESSAGES}).raise_for_status()
+
+    async def unpooled():
+        async with httpx.AsyncClient() as http:
+            (await http.post(url, headers=client.headers, json={"model": "stub", "messages": MESSAGES})).raise_for_status()
+
+    async def pooled():
+        await client.achat_completion(MESSAGES, model="stub")
+
+    print(f"{args.requests} requests per run, stub latency {args.latency_ms} ms\n")
+    print(f"{'client':<10}" + "".join(f"{f'c={c} req/s':>14}" for c in args.concurrency))
+    for name, call in (("blocking", blocking), ("unpooled", unpooled), ("pooled", pooled)):
+        rates = []
+        for concurrency in args.concurrency:
+            # Blocking calls are serialized; fewer of them keep the run short
+            total = min(args.requests, 50) if name == "blocking" else args.requests
+            # PublicAIClient prints every payload
+            with contextlib.redirect_stdout(io.StringIO()):
+                rates.append(await run_level(call, total, concurrency))
+        print(f"{name:<10}" + "".join(f"{rate:>14.1f}" for rate in rates))
+    await close_http_clients()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
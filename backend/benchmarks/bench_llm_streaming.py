@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark of time-to-first-token of buffered vs streamed LLM answers.
+
+Starts a local stub of the chat completions API that generates a fixed number of
+tokens at a fixed rate. A buffered request (LLMService.generate) is answered once the
+whole completion is done; a streamed request (LLMService.stream) receives each token
+as a server-sent event as soon as it is generated. Reports time-to-first-token and
+total time of both.
+
+Usage (from the backend directory):
+    python benchmarks/bench_llm_streaming.py [--tokens 200] [--token-ms 20] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import uvicorn
+from services.llm_services import LLMService, close_http_clients
+
+def make_stub(tokens: int, token_s: float):
+    usage = {"prompt_tokens": 10, "completion_tokens": tokens, "total_tokens": tokens + 10}
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        stream = json.loads(body).get("stream", False)
+
+        if not stream:
+            await asyncio.sleep(tokens * token_s)
+            completion = {
+                "choices": [{"message": {"role": "assistant", "content": "tok " * tokens}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": json.dumps(completion).encode()})
+            return
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        for i in range(tokens):
+            await asyncio.sleep(token_s)
+            chunk = {"choices": [{"delta": {"content": "tok "}, "finish_reason": "stop" if i == tokens - 1 else None}]}
+            await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode(), "more_body": True})
+        final = {"choices": [], "usage": usage}
+        await send({"type": "http.response.body", "body": f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode()})
+    return app
+
+def _serve(port: int, tokens: int, token_s: float):
+    uvicorn.run(make_stub(tokens, token_s), host="127.0.0.1", port=port, log_level="error")
+
+def start_stub(tokens: int, token_s: float) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    multiprocessing.Process(target=_serve, args=(port, tokens, token_s), daemon=True).start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+async def buffered(llm: LLMService):
+    start = time.perf_counter()
+    await llm.generate("Hello")
+    elapsed = time.perf_counter() - start
+    # The first token reaches the client together with the last one
+    return elapsed, elapsed
+
+async def streamed(llm: LLMService):
+    start = time.perf_counter()
+    first = None
+    async for event in llm.stream("Hello"):
+        if first is None and "text" in event:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+async def main_async(args):
+    llm = LLMService(api_key="benchmark", model="stub")
+    llm.client.base_url = start_stub(args.tokens, args.token_ms / 1000)
+
+    print(f"{args.tokens} tokens at {args.token_ms} ms/token, {args.runs} runs\n")
+    print(f"{'mode':<10}{'TTFT ms':>12}{'total ms':>12}")
+    for name, run in (("buffered", buffered), ("streamed", streamed)):
+        ttfts, totals = [], []
+        for _ in range(args.runs):
+            # PublicAIClient prints every payload
+            with contextlib.redirect_stdout(io.StringIO()):
+                ttft, total = await run(llm)
+            ttfts.append(ttft * 1000)
+            totals.append(total * 1000)
+        print(f"{name:<10}{statistics.median(ttfts):>12.1f}{statistics.median(totals):>12.1f}")
+    await close_http_clients()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
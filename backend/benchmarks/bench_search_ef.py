@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the search ef setting (HNSW_SEARCH_EF) of the chroma and hnsw backends.
+
+Builds a cosine-space Chroma collection and an hnswlib graph with the same M and
+construction ef from synthetic, clustered unit vectors (shaped like all-MiniLM-L6-v2
+embeddings), then reports query latency (p50/p95) and recall@k at each search ef.
+Recall is measured against the true nearest neighbours computed with NumPy.
+Chroma only picks up a new search ef when a collection is loaded, so the collection
+is rebuilt with reindex() for each setting; the rebuild time is reported as well.
+
+Usage (from the backend directory):
+    python benchmarks/bench_search_ef.py [--vectors 50000] [--queries 200] [--k 5] [--ef 10 32 64 128 256]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from processing.vector_backends import ChromaBackend, HnswBackend
+from bench_vector_backends import build, make_vectors, overlap, run_queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--construction-ef", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[10, 16, 32, 64, 128, 256])
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim)
+    queries = make_vectors(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ChromaBackend(os.path.join(tmp, "chroma"), "benchmark", "cosine", args.m, args.construction_ef, args.ef[0]),
+            HnswBackend(os.path.join(tmp, "hnsw"), args.m, args.construction_ef, args.ef[0]),
+        ]
+        print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}, "
+              f"M={args.m}, construction ef={args.construction_ef}\n")
+        print(f"{'backend':<10}{'ef':>6}{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}{'rebuild s':>11}")
+        for backend in backends:
+            build(backend, vectors)
+            for ef in args.ef:
+                rebuild_seconds = 0.0
+                if backend.name == "chroma":
+                    if ef != args.ef[0]:
+                        rebuild_seconds = backend.reindex("cosine", args.m, args.construction_ef, ef)["seconds"]
+                else:
+                    backend.set_ef(ef)
+                # One untimed pass so that every ef is measured with a warm index
+                run_queries(backend, queries[:10], args.k)
+                latencies, results = run_queries(backend, queries, args.k)
+                print(
+                    f"{backend.name:<10}{ef:>6}{np.percentile(latencies, 50):>9.2f}"
+                    f"{np.percentile(latencies, 95):>9.2f}{overlap(results, truth, args.k):>10.3f}"
+                    f"{rebuild_seconds:>11.2f}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the vector backends: chroma, exact and hnsw.
+
+Builds each backend in a temporary directory from the same synthetic, clustered
+unit vectors (shaped like all-MiniLM-L6-v2 embeddings), then reports build time,
+query latency (p50/p95) and recall@k. Recall is measured against the true nearest
+neighbours computed with NumPy; the agreement of each backend with Chroma's results
+is reported as well.
+
+Usage (from the backend directory):
+    python benchmarks/bench_vector_backends.py [--vectors 50000] [--queries 200] [--k 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from processing.vector_backends import ChromaBackend, ExactBackend, HnswBackend
+
+def make_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around a few hundred centroids, like embeddings of a real corpus."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(max(count // 200, 1), dim))
+    vectors = centroids[rng.integers(len(centroids), size=count)] + 0.6 * rng.normal(size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def build(backend, vectors: np.ndarray, batch_size: int = 5000) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset:offset + batch_size]
+        ids = [f"chunk{offset + i}" for i in range(len(batch))]
+        metadatas = [{"file_id": f"file{(offset + i) // 50}"} for i in range(len(batch))]
+        backend.add(ids, batch, [f"text of {record_id}" for record_id in ids], metadatas)
+    return time.perf_counter() - start
+
+def run_queries(backend, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = backend.query(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([int(record_id[5:]) for record_id in result["ids"][0]])
+    return latencies, results
+
+def overlap(results, reference, k: int) -> float:
+    return float(np.mean([len(set(r) & set(ref[:k])) / k for r, ref in zip(results, reference)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim)
+    queries = make_vectors(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ChromaBackend(os.path.join(tmp, "chroma"), "benchmark"),
+            ExactBackend(os.path.join(tmp, "exact")),
+            HnswBackend(os.path.join(tmp, "hnsw")),
+        ]
+        print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+        print(f"{'backend':<10}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}{'vs chroma':>11}")
+        chroma_results = None
+        for backend in backends:
+            build_seconds = build(backend, vectors)
+            latencies, results = run_queries(backend, queries, args.k)
+            if chroma_results is None:
+                chroma_results = results
+            print(
+                f"{backend.name:<10}{build_seconds:>9.2f}{np.percentile(latencies, 50):>9.2f}"
+                f"{np.percentile(latencies, 95):>9.2f}{overlap(results, truth, args.k):>10.3f}"
+                f"{overlap(results, chroma_results, args.k):>11.3f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark of compressed vector storage in the exact backend.
+
+Builds the exact backend from the same synthetic, clustered unit vectors (shaped like
+all-MiniLM-L6-v2 embeddings) with float32 vectors only, with int8 codes, and with int8
+codes of PCA-reduced vectors. Each compressed variant is queried without rescoring
+(the codes alone pick the top k) and with rescoring of the best candidates in float32.
+Reports the bytes scanned per vector, query latency (p50/p95) and recall@k against the
+true nearest neighbours computed with NumPy.
+
+Usage (from the backend directory):
+    python benchmarks/bench_vector_compression.py [--vectors 50000] [--queries 200] [--k 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from processing.vector_backends import ExactBackend
+from bench_vector_backends import build, make_vectors, overlap, run_queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, default=100, help="Candidates rescored in float32")
+    parser.add_argument("--pca-dims", type=int, nargs="*", default=[192, 128, 64])
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim)
+    queries = make_vectors(args.queries, args.dim, seed=1)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k].tolist()
+
+    variants = [("float32", "none", 0)] + [("int8", "int8", 0)] + [
+        (f"int8+pca{dim}", "int8", dim) for dim in args.pca_dims if dim < args.dim
+    ]
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+    print(f"{'variant':<15}{'rescore':>8}{'bytes/vec':>11}{'scan MB':>9}{'build s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, compression, pca_dim in variants:
+            backend = ExactBackend(os.path.join(tmp, label), compression, pca_dim, args.rescore)
+            build_seconds = build(backend, vectors)
+            stats = backend.stats()
+            bytes_per_vector = stats["code_bytes"] // args.vectors if compression != "none" else args.dim * 4
+            rescore_options = [args.rescore, args.k] if compression != "none" else [0]
+            for rescore in rescore_options:
+                if compression != "none":
+                    # Rescoring only the top k leaves the ranking to the codes
+                    backend._compressed.rescore_candidates = rescore
+                latencies, results = run_queries(backend, queries, args.k)
+                print(
+                    f"{label:<15}{(rescore if rescore != args.k else 'no'):>8}{bytes_per_vector:>11}"
+                    f"{bytes_per_vector * args.vectors / 2**20:>9.1f}{build_seconds:>9.2f}"
+                    f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+                    f"{overlap(results, truth, args.k):>10.3f}"
+                )
+
+if __name__ == "__main__":
+    main()
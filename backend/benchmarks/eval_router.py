@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the local query router against the LLM router.
+
+Splits the logged LLM routing decisions chronologically, indexes the older ones as the
+server does and routes the newer ones locally. For each confidence threshold it reports
+coverage (the share of queries routed locally), agreement with the LLM router on those
+queries, overall agreement (queries below the threshold still go to the LLM), and the
+routing latency saved per request: the logged LLM routing time of the covered queries
+minus the local routing time. The keyword rules and the most frequent strategy are
+reported as baselines.
+
+Usage (from the backend directory):
+    python benchmarks/eval_router.py [--log router_data/decisions.jsonl] [--test-fraction 0.2] [--k 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from processing import embedder
+from services.local_router import ROUTER_DIR, STRATEGIES, LocalRouter, keyword_strategy, load_decisions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=os.path.join(ROUTER_DIR, "decisions.jsonl"))
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
+    args = parser.parse_args()
+
+    decisions = load_decisions(args.log)
+    if len(decisions) < 10:
+        print(f"Need at least 10 logged routing decisions in {args.log}, found {len(decisions)}")
+        return
+    split = int(len(decisions) * (1 - args.test_fraction))
+    train, test = decisions[:split], decisions[split:]
+    print(f"{len(train)} training / {len(test)} test decisions {dict(Counter(d['strategy'] for d in decisions))}\n")
+
+    embedder.configure_embedding_cache(enabled=False)
+    embeddings = embedder.embed_texts([decision["query"] for decision in decisions])
+    model_id = embedder.get_embedding_model_id()
+
+    with tempfile.TemporaryDirectory() as directory:
+        router = LocalRouter(directory, k=args.k, confidence_threshold=0.0, min_examples=1)
+        router.rebuild(model_id, embeddings[:split], [decision["strategy"] for decision in train])
+
+        predictions, local_ms = [], []
+        for decision, embedding in zip(test, embeddings[split:]):
+            keyword = keyword_strategy(decision.get("temporal_indicators"), decision.get("internal_references"))
+            started = time.perf_counter()
+            predictions.append(router.predict(model_id, embedding, keyword))
+            local_ms.append(1000 * (time.perf_counter() - started))
+
+    labels = [decision["strategy"] for decision in test]
+    llm_ms = [decision.get("llm_ms", 0.0) for decision in test]
+    keyword_rules = [
+        keyword_strategy(d.get("temporal_indicators"), d.get("internal_references")) or "DIRECT" for d in test
+    ]
+    majority = Counter(d["strategy"] for d in train).most_common(1)[0][0]
+    print(f"Baselines: keyword rules agree {np.mean([p == l for p, l in zip(keyword_rules, labels)]):.1%}, "
+          f"always {majority} agrees {np.mean([l == majority for l in labels]):.1%}")
+    print(f"LLM routing: {np.mean(llm_ms):.0f} ms mean (logged); local routing: {np.mean(local_ms):.2f} ms mean\n")
+
+    print(f"{'threshold':>10}{'coverage':>10}{'local agree':>13}{'overall agree':>15}{'saved ms/req':>14}")
+    for threshold in args.thresholds:
+        covered = [
+            i for i, prediction in enumerate(predictions)
+            if prediction is not None and prediction["confidence"] >= threshold
+        ]
+        agree = sum(predictions[i]["strategy"] == labels[i] for i in covered)
+        local_agreement = agree / len(covered) if covered else float("nan")
+        overall = (agree + len(test) - len(covered)) / len(test)
+        saved = (sum(llm_ms[i] for i in covered) - sum(local_ms)) / len(test)
+        print(f"{threshold:>10.2f}{len(covered) / len(test):>10.1%}{local_agreement:>13.1%}{overall:>15.1%}{saved:>14.0f}")
+
+    print("\nConfusion of locally routed queries at threshold 0.7 (rows: LLM, columns: local)")
+    print(f"{'':>8}" + "".join(f"{strategy:>8}" for strategy in STRATEGIES))
+    for strategy in STRATEGIES:
+        row = Counter(
+            prediction["strategy"] for prediction, label in zip(predictions, labels)
+            if label == strategy and prediction is not None and prediction["confidence"] >= 0.7
+        )
+        print(f"{strategy:>8}" + "".join(f"{row.get(other, 0):>8}" for other in STRATEGIES))
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,24 @@ class Settings(BaseSettings):
     llm_model: str = "swiss-ai/apertus-8b-instruct"
     llm_temperature: float = 0.1
     llm_max_tokens: int = 1000
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 120.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_http2: bool = True
     
     # Service settings
     max_rag_results: int = 5
     max_web_results: int = 5
     router_confidence_threshold: float = 7.0
     
+    # Local query router settings
+    local_router_enabled: bool = True
+    local_router_dir: str = "./router_data"
+    local_router_k: int = 10
+    local_router_confidence: float = 0.7
+    local_router_min_examples: int = 50
+    
     # Server configuration
     server_host: str = "localhost"
     server_port: int = 8000
@@ -27,6 +39,61 @@ class Settings(BaseSettings):
     
     # Database settings
     chroma_persist_directory: str = "./chroma_db"
+    vector_backend: str = "chroma"
+    vector_index_dir: str = "./vector_index"
+    vector_space: str = "cosine"
+    hnsw_m: int = 16
+    hnsw_construction_ef: int = 200
+    hnsw_search_ef: int = 64
+    vector_compression: str = "none"
+    vector_pca_dim: int = 0
+    vector_rescore_candidates: int = 100
+    vector_write_batch_size: int = 1000
+    
+    # Storage compaction settings
+    gc_interval_minutes: int = 60
+    gc_grace_minutes: int = 60
+    
+    # Upload settings
+    max_upload_size_mb: int = 200
+    max_upload_request_size_mb: int = 1024
+    upload_chunk_size_kb: int = 1024
+    upload_spool_max_size_kb: int = 5120
+    
+    # Ingestion settings
+    ingestion_workers: int = 2
+    ingestion_job_workers: int = 1
+    ingestion_queue_size: int = 16
+    
+    # Chunking settings
+    chunking_mode: str = "characters"
+    chunk_tokens: int = 250
+    chunk_overlap_tokens: int = 30
+    chunk_tokenizer: str = "sentence-transformers/all-MiniLM-L6-v2"
+    
+    # Embedding settings
+    embedding_batch_size: int = 64
+    embedding_backend: str = "torch"
+    embedding_onnx_file: str = "onnx/model_qint8_avx2.onnx"
+    query_embedding_max_batch_size: int = 32
+    query_embedding_max_wait_ms: float = 5.0
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl_seconds: float = 3600.0
+    
+    # Answer cache settings
+    answer_cache_size: int = 1000
+    answer_cache_ttl_seconds: float = 600.0
+    answer_cache_similarity: float = 0.95
+    
+    # Embedding cache settings
+    embedding_cache_enabled: bool = True
+    embedding_cache_dir: str = "./embedding_cache"
+    embedding_cache_max_entries: int = 200000
+    
+    # Gantt planner response cache settings
+    gantt_cache_enabled: bool = True
+    gantt_cache_dir: str = "./gantt_cache"
+    gantt_cache_max_mb: int = 100
     
     @field_validator('llm_temperature')
     @classmethod
@@ -49,6 +116,20 @@ class Settings(BaseSettings):
             raise ValueError('Confidence threshold must be between 0.0 and 10.0')
         return v
     
+    @field_validator('local_router_k', 'local_router_min_examples')
+    @classmethod
+    def validate_local_router_counts(cls, v):
+        if v < 1:
+            raise ValueError('Local router neighbors and minimum examples must be at least 1')
+        return v
+    
+    @field_validator('local_router_confidence')
+    @classmethod
+    def validate_local_router_confidence(cls, v):
+        if not 0.0 <= v <= 1.0:
+            raise ValueError('Local router confidence must be between 0.0 and 1.0')
+        return v
+    
     @field_validator('max_rag_results', 'max_web_results')
     @classmethod
     def validate_max_results(cls, v):
@@ -56,6 +137,188 @@ class Settings(BaseSettings):
             raise ValueError('Max results must be between 1 and 20')
         return v
     
+    @field_validator('llm_connect_timeout', 'llm_read_timeout')
+    @classmethod
+    def validate_llm_timeouts(cls, v):
+        if v <= 0:
+            raise ValueError('LLM timeouts must be positive')
+        return v
+    
+    @field_validator('llm_max_connections', 'llm_max_keepalive_connections')
+    @classmethod
+    def validate_llm_connections(cls, v):
+        if v < 1:
+            raise ValueError('LLM connection limits must be at least 1')
+        return v
+    
+    @field_validator('vector_backend')
+    @classmethod
+    def validate_vector_backend(cls, v):
+        if v not in ("chroma", "exact", "hnsw"):
+            raise ValueError('Vector backend must be "chroma", "exact" or "hnsw"')
+        return v
+    
+    @field_validator('vector_space')
+    @classmethod
+    def validate_vector_space(cls, v):
+        if v not in ("cosine", "l2", "ip"):
+            raise ValueError('Vector space must be "cosine", "l2" or "ip"')
+        return v
+    
+    @field_validator('hnsw_m', 'hnsw_construction_ef', 'hnsw_search_ef')
+    @classmethod
+    def validate_hnsw_params(cls, v):
+        if v < 2 or v > 4096:
+            raise ValueError('HNSW parameters must be between 2 and 4096')
+        return v
+    
+    @field_validator('vector_compression')
+    @classmethod
+    def validate_vector_compression(cls, v):
+        if v not in ("none", "int8"):
+            raise ValueError('Vector compression must be "none" or "int8"')
+        return v
+    
+    @field_validator('vector_pca_dim')
+    @classmethod
+    def validate_vector_pca_dim(cls, v):
+        if v < 0:
+            raise ValueError('Vector PCA dimension must be 0 (disabled) or positive')
+        return v
+    
+    @field_validator('vector_write_batch_size')
+    @classmethod
+    def validate_vector_write_batch_size(cls, v):
+        if v < 1:
+            raise ValueError('Vector write batch size must be at least 1')
+        return v
+    
+    @field_validator('vector_rescore_candidates')
+    @classmethod
+    def validate_vector_rescore_candidates(cls, v):
+        if v < 1 or v > 10000:
+            raise ValueError('Vector rescore candidates must be between 1 and 10000')
+        return v
+    
+    @field_validator('gc_interval_minutes', 'gc_grace_minutes')
+    @classmethod
+    def validate_gc_minutes(cls, v):
+        if v < 0:
+            raise ValueError('Compaction intervals must not be negative')
+        return v
+    
+    @field_validator('max_upload_size_mb', 'max_upload_request_size_mb', 'upload_chunk_size_kb', 'upload_spool_max_size_kb')
+    @classmethod
+    def validate_upload_sizes(cls, v):
+        if v < 1:
+            raise ValueError('Upload sizes must be at least 1')
+        return v
+    
+    @field_validator('ingestion_workers', 'ingestion_job_workers', 'ingestion_queue_size')
+    @classmethod
+    def validate_ingestion_workers(cls, v):
+        if v < 1 or v > 32:
+            raise ValueError('Ingestion worker and queue sizes must be between 1 and 32')
+        return v
+    
+    @field_validator('chunking_mode')
+    @classmethod
+    def validate_chunking_mode(cls, v):
+        if v not in ("characters", "tokens"):
+            raise ValueError('Chunking mode must be "characters" or "tokens"')
+        return v
+    
+    @field_validator('chunk_tokens')
+    @classmethod
+    def validate_chunk_tokens(cls, v):
+        if v < 16 or v > 8192:
+            raise ValueError('Chunk tokens must be between 16 and 8192')
+        return v
+    
+    @field_validator('chunk_overlap_tokens')
+    @classmethod
+    def validate_chunk_overlap_tokens(cls, v, info):
+        if v < 0 or v >= info.data.get('chunk_tokens', 250):
+            raise ValueError('Chunk overlap tokens must be at least 0 and smaller than chunk tokens')
+        return v
+    
+    @field_validator('embedding_batch_size')
+    @classmethod
+    def validate_embedding_batch_size(cls, v):
+        if v < 1 or v > 1024:
+            raise ValueError('Embedding batch size must be between 1 and 1024')
+        return v
+    
+    @field_validator('embedding_backend')
+    @classmethod
+    def validate_embedding_backend(cls, v):
+        if v not in ("torch", "onnx"):
+            raise ValueError('Embedding backend must be "torch" or "onnx"')
+        return v
+    
+    @field_validator('query_embedding_max_batch_size')
+    @classmethod
+    def validate_query_embedding_max_batch_size(cls, v):
+        if v < 1 or v > 1024:
+            raise ValueError('Query embedding batch size must be between 1 and 1024')
+        return v
+    
+    @field_validator('query_embedding_max_wait_ms')
+    @classmethod
+    def validate_query_embedding_max_wait_ms(cls, v):
+        if not 0.0 <= v <= 1000.0:
+            raise ValueError('Query embedding max wait must be between 0 and 1000 ms')
+        return v
+    
+    @field_validator('query_embedding_cache_size')
+    @classmethod
+    def validate_query_embedding_cache_size(cls, v):
+        if v < 0:
+            raise ValueError('Query embedding cache size must be at least 0')
+        return v
+    
+    @field_validator('query_embedding_cache_ttl_seconds')
+    @classmethod
+    def validate_query_embedding_cache_ttl(cls, v):
+        if v < 0:
+            raise ValueError('Query embedding cache TTL must be at least 0 seconds')
+        return v
+    
+    @field_validator('answer_cache_size')
+    @classmethod
+    def validate_answer_cache_size(cls, v):
+        if v < 0:
+            raise ValueError('Answer cache size must be at least 0')
+        return v
+    
+    @field_validator('answer_cache_ttl_seconds')
+    @classmethod
+    def validate_answer_cache_ttl(cls, v):
+        if v < 0:
+            raise ValueError('Answer cache TTL must be at least 0 seconds')
+        return v
+    
+    @field_validator('answer_cache_similarity')
+    @classmethod
+    def validate_answer_cache_similarity(cls, v):
+        if not 0.0 < v <= 1.0:
+            raise ValueError('Answer cache similarity must be greater than 0.0 and at most 1.0')
+        return v
+    
+    @field_validator('embedding_cache_max_entries')
+    @classmethod
+    def validate_embedding_cache_max_entries(cls, v):
+        if v < 1:
+            raise ValueError('Embedding cache must hold at least 1 entry')
+        return v
+    
+    @field_validator('gantt_cache_max_mb')
+    @classmethod
+    def validate_gantt_cache_max_mb(cls, v):
+        if v < 1:
+            raise ValueError('Gantt cache size must be at least 1 MB')
+        return v
+    
     model_config = {
         "env_file": ".env",
         "case_sensitive": False
@@ -41,6 +41,7 @@ class GanttRequest(BaseModel):
     """API request model for Gantt plan generation."""
     description: str = Field(..., min_length=10, description="Business plan description")
     project_name: Optional[str] = Field(None, description="Optional project name")
+    bypass_cache: bool = Field(False, description="Call the model even if the response to an identical request is cached")
 
 
 class ModifyGanttRequest(BaseModel):
@@ -8,9 +8,10 @@ to generate structured Gantt project plans from business descriptions.
 import json
 import os
 import openai
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from gantt.models import GanttPlan
+from gantt.response_cache import get_response_cache
 from pydantic import TypeAdapter, ValidationError
 
 load_dotenv()
@@ -57,8 +58,47 @@ class SwissAIGanttPlanner:
                 line_errors=[{"error": str(e), "loc": ("body",)}]
             )
 
-    def generate_gantt_plan(self, description: str, project_name: Optional[str] = None, max_retries: int = 3) -> dict:
-        """Generate a Gantt plan from a business description with validation and retries."""
+    def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                  use_cache: bool = True) -> Tuple[str, Optional[str]]:
+        """
+        Make a JSON-mode chat completion call and return its text, and the key to cache
+        it under once it is validated. Only deterministic (temperature 0) calls are
+        served from and stored in the response cache.
+        """
+        response_format = {"type": "json_object"}
+        cache = get_response_cache() if use_cache and temperature == 0.0 else None
+        key = None
+        if cache is not None:
+            key = cache.make_key(self.model, messages, temperature, max_tokens, response_format)
+            cached = cache.get(key)
+            if cached is not None:
+                print("Using cached response of an identical request.")
+                return cached, None
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format
+        )
+        return response.choices[0].message.content, key
+
+    def _cache_response(self, key: Optional[str], json_text: str):
+        """Cache a validated response under the key returned by _complete."""
+        cache = get_response_cache()
+        if key is not None and cache is not None:
+            try:
+                cache.put(key, json_text)
+            except OSError as e:
+                print(f"Could not cache the response: {e}")
+
+    def generate_gantt_plan(self, description: str, project_name: Optional[str] = None, max_retries: int = 3,
+                            use_cache: bool = True) -> dict:
+        """
+        Generate a Gantt plan from a business description with validation and retries.
+        Identical requests are answered from the response cache unless `use_cache` is False.
+        """
 
         schema_description = self.gantt_plan_adapter.json_schema()
 
@@ -74,19 +114,12 @@ Return ONLY valid JSON matching this exact schema with all required fields. Use
         for attempt in range(max_retries):
             print(f"Making API call to {self.model} (Attempt {attempt + 1}/{max_retries})...")
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.0,
-                    max_tokens=4000,
-                    response_format={"type": "json_object"}
-                )
-
-                json_text = response.choices[0].message.content
+                json_text, cache_key = self._complete(messages, temperature=0.0, max_tokens=4000, use_cache=use_cache)
 
                 # Validate the response
                 validated_plan = self._parse_and_validate_gantt_plan(json_text)
                 print("API call and validation successful!")
+                self._cache_response(cache_key, json_text)
                 return validated_plan.model_dump()
 
             except ValidationError as e:
@@ -138,15 +171,8 @@ Return only the complete, updated JSON object for the entire plan. Ensure the ou
         for attempt in range(max_retries):
             print(f"Making API call to {self.model} for plan modification (Attempt {attempt + 1}/{max_retries})...")
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=4000,
-                    response_format={"type": "json_object"}
-                )
-
-                json_text = response.choices[0].message.content
+                # Not deterministic (temperature 0.1), so never cached
+                json_text, _ = self._complete(messages, temperature=0.1, max_tokens=4000)
 
                 # Validate the response
                 validated_plan = self._parse_and_validate_gantt_plan(json_text)
@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of Gantt planner completions
+
+Deterministic (temperature 0) completion calls are cached on disk, keyed by a hash of
+the request that produced them, so identical requests are answered without calling
+the model again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CACHE_DIR = "./gantt_cache"
+CACHE_MAX_MB = 100
+# Eviction frees space down to this fraction of the size cap, so it runs rarely
+EVICT_TO_FRACTION = 0.9
+
+class ResponseCache:
+    """
+    A disk-backed cache of completion texts, one file per entry, named after the SHA-256
+    of the request (model, messages, temperature, max_tokens and response format).
+
+    A hit refreshes the file's modification time; once the cache holds more than
+    `max_bytes`, the least recently used entries are deleted until it is back under
+    EVICT_TO_FRACTION of it. Entries are written to a
+    temporary file and renamed, so a concurrent reader never sees a partial entry.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._total_bytes = sum(path.stat().st_size for path in self.directory.glob("*.json"))
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                 response_format: Optional[Dict] = None) -> str:
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached completion text for the key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                content = json.load(f)["content"]
+            os.utime(path)
+        except (OSError, json.JSONDecodeError, KeyError):
+            return None
+        return content
+
+    def put(self, key: str, content: str):
+        """Stores a completion text, evicting the least recently used entries beyond the size cap."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"content": content}, f)
+        size = tmp_path.stat().st_size
+        with self._lock:
+            if path.exists():
+                self._total_bytes -= path.stat().st_size
+            os.replace(tmp_path, path)
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO_FRACTION:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
+
+response_cache: Optional[ResponseCache] = None
+cache_dir = CACHE_DIR
+cache_max_mb = CACHE_MAX_MB
+cache_enabled = True
+
+def configure_response_cache(directory: str = CACHE_DIR, max_mb: int = CACHE_MAX_MB, enabled: bool = True):
+    """Sets where and how large the planner's response cache is. Takes effect on the next planner call."""
+    global response_cache, cache_dir, cache_max_mb, cache_enabled
+    cache_dir = directory
+    cache_max_mb = max_mb
+    cache_enabled = enabled
+    response_cache = None
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the response cache, or None if it is disabled."""
+    global response_cache
+    if not cache_enabled:
+        return None
+    if response_cache is None:
+        response_cache = ResponseCache(cache_dir, cache_max_mb * 1024 * 1024)
+    return response_cache
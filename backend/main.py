@@ -1,12 +1,14 @@
 from datetime import datetime
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from typing import List, Dict, Optional
 import uuid
+import asyncio
+import functools
 import logging
-import json
+import shutil
 from pydantic import BaseModel, ValidationError
 from services.rag_service import RAGService
 from dotenv import load_dotenv
@@ -15,21 +17,50 @@ from dotenv import load_dotenv
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from processing.loader import load_document_text
-from processing.chunker import chunk_text
-from processing.embedder import embed_chunks
+from config import settings
+from processing.upload import spool_upload
+from processing.embedder import configure_embedding, configure_embedding_cache, flush_embedding_cache
+from processing.chunker import configure_chunking
+from processing.embedding_batcher import query_embedding_batcher
+from processing.query_embedding_cache import query_embedding_cache
+from processing.answer_cache import answer_cache
+from processing.pipeline import (
+    ingest_document,
+    update_document,
+    release_document_chunks,
+    start_pipeline,
+    shutdown_pipeline
+)
 from processing.vector_store import vector_store_instance
+from processing.registry import (
+    UPLOAD_DIR,
+    COMPLETED_STATUS,
+    load_processed_files,
+    get_processed_file,
+    find_duplicate_file,
+    add_processed_file,
+    update_processed_file,
+    remove_processed_file,
+    start_ingestion,
+    finish_ingestion,
+    ingesting
+)
+from processing.jobs import JobStore, IngestionJobQueue, JOB_PAYLOAD_DIR
+from processing.compaction import StorageCompactor
 
 from routers.search import router as search_router
 from models.schemas import IntelligentSearchRequest, IntelligentSearchResponse, ChatCompletionRequest, ChatMessage
 from dependencies import get_query_router
 from services.query_router import QueryRouter
 import time
-from services.llm_services import get_public_ai_client
+from services.llm_services import get_public_ai_client, configure_llm_http, close_http_clients
 from services.llm_services import LLMService
+from services.sse import sse_response
+from services.local_router import local_router
 
 from gantt.planner import SwissAIGanttPlanner, create_planner
 from gantt.models import GanttRequest, APIGanttResponse, ModifyGanttRequest
+from gantt.response_cache import configure_response_cache
 
 load_dotenv()
 
@@ -54,6 +85,114 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_upload_request_size(request: Request, call_next):
+    """Rejects document uploads that declare a body larger than the limit, before the body is read."""
+    if request.url.path.startswith("/process-documents"):
+        content_length = request.headers.get("content-length")
+        max_request_size = settings.max_upload_request_size_mb * 1024 * 1024
+        if content_length and content_length.isdigit() and int(content_length) > max_request_size:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the maximum request size of {settings.max_upload_request_size_mb} MB"}
+            )
+    return await call_next(request)
+
+configure_llm_http(
+    connect_timeout=settings.llm_connect_timeout,
+    read_timeout=settings.llm_read_timeout,
+    max_connections=settings.llm_max_connections,
+    max_keepalive_connections=settings.llm_max_keepalive_connections,
+    http2=settings.llm_http2
+)
+
+# Persistent embedding cache shared by ingestion and queries
+vector_store_instance.configure(
+    backend=settings.vector_backend,
+    path=settings.chroma_persist_directory,
+    index_dir=settings.vector_index_dir,
+    hnsw_m=settings.hnsw_m,
+    hnsw_construction_ef=settings.hnsw_construction_ef,
+    hnsw_search_ef=settings.hnsw_search_ef,
+    space=settings.vector_space,
+    compression=settings.vector_compression,
+    pca_dim=settings.vector_pca_dim,
+    rescore_candidates=settings.vector_rescore_candidates,
+    write_batch_size=settings.vector_write_batch_size
+)
+configure_embedding(
+    batch=settings.embedding_batch_size,
+    model_backend=settings.embedding_backend,
+    onnx_model_file=settings.embedding_onnx_file
+)
+configure_embedding_cache(
+    directory=settings.embedding_cache_dir,
+    max_entries=settings.embedding_cache_max_entries,
+    enabled=settings.embedding_cache_enabled
+)
+query_embedding_batcher.configure(
+    max_batch_size=settings.query_embedding_max_batch_size,
+    max_wait_ms=settings.query_embedding_max_wait_ms
+)
+query_embedding_cache.configure(
+    max_entries=settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_cache_ttl_seconds
+)
+configure_response_cache(
+    directory=settings.gantt_cache_dir,
+    max_mb=settings.gantt_cache_max_mb,
+    enabled=settings.gantt_cache_enabled
+)
+local_router.configure(
+    directory=settings.local_router_dir,
+    k=settings.local_router_k,
+    confidence_threshold=settings.local_router_confidence,
+    min_examples=settings.local_router_min_examples,
+    enabled=settings.local_router_enabled
+)
+answer_cache.configure(
+    max_entries=settings.answer_cache_size,
+    ttl_seconds=settings.answer_cache_ttl_seconds,
+    similarity_threshold=settings.answer_cache_similarity
+)
+configure_chunking(
+    mode=settings.chunking_mode,
+    tokens=settings.chunk_tokens,
+    overlap_tokens=settings.chunk_overlap_tokens,
+    tokenizer=settings.chunk_tokenizer
+)
+
+# Background ingestion jobs
+job_queue = IngestionJobQueue(
+    JobStore(),
+    max_size=settings.ingestion_queue_size,
+    workers=settings.ingestion_job_workers
+)
+
+# Periodic reconciliation of the registry, the vector store and uploads/
+storage_compactor = StorageCompactor(
+    job_queue.store,
+    interval_minutes=settings.gc_interval_minutes,
+    grace_minutes=settings.gc_grace_minutes
+)
+
+@app.on_event("startup")
+async def startup_ingestion_pipeline():
+    start_pipeline(parse_workers=settings.ingestion_workers)
+    job_queue.start()
+    storage_compactor.start()
+
+@app.on_event("shutdown")
+async def shutdown_ingestion_pipeline():
+    await storage_compactor.stop()
+    await job_queue.stop()
+    await query_embedding_batcher.stop()
+    shutdown_pipeline()
+    flush_embedding_cache()
+    local_router.flush()
+    vector_store_instance.flush()
+    await close_http_clients()
+
 # Include the intelligent search router
 app.include_router(search_router)
 
@@ -62,10 +201,6 @@ class QueryRequest(BaseModel):
     query: str
     n_results: int = 5
 
-# Uploads directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 SUPPORTED_FILE_TYPES = {
     "application/pdf": ".pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
@@ -74,176 +209,223 @@ SUPPORTED_FILE_TYPES = {
     "text/plain": ".txt",
 }
 
-# File tracking system
-PROCESSED_FILES_DB = UPLOAD_DIR / "processed_files.json"
-
-def load_processed_files() -> Dict:
-    """Load the processed files database from JSON file."""
-    if PROCESSED_FILES_DB.exists():
-        try:
-            with open(PROCESSED_FILES_DB, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading processed files database: {e}")
-            return {"files": []}
-    return {"files": []}
-
-def save_processed_files(data: Dict):
-    """Save the processed files database to JSON file."""
-    try:
-        with open(PROCESSED_FILES_DB, 'w') as f:
-            json.dump(data, f, indent=2)
-    except IOError as e:
-        print(f"Error saving processed files database: {e}")
-
-def add_processed_file(filename: str, file_id: str, file_size: int, chunks_added: int):
-    """Add a processed file to the tracking database."""
-    db = load_processed_files()
-
-    # Check if file already exists by filename (avoid duplicates)
-    existing_file = next((f for f in db["files"] if f["filename"] == filename), None)
-    if existing_file:
-        print(f"File already exists in tracking database: {filename}")
-        return False  # File already tracked
-
-    new_file = {
-        "file_id": file_id,
-        "filename": filename,
-        "file_size": file_size,
-        "upload_time": time.time(),
-        "chunks_added": chunks_added,
-        "status": "completed"
-    }
-
-    db["files"].append(new_file)
-    save_processed_files(db)
-    print(f"Added file to tracking database: {filename}")
-    return True  # Successfully added
-
-def remove_processed_file(file_id: str) -> bool:
-    """Remove a processed file from the tracking database."""
-    db = load_processed_files()
-    original_count = len(db["files"])
-
-    # Remove the file with matching file_id
-    db["files"] = [f for f in db["files"] if f["file_id"] != file_id]
-
-    if len(db["files"]) < original_count:
-        save_processed_files(db)
-        print(f"Removed file from tracking database: {file_id}")
-        return True
-    return False
-
 @app.get("/")
 def read_root():
     return {"message": "Intelligent Document Processing API v2.0 - Now with smart search routing!"}
 
-@app.post("/process-documents/", response_model=Dict)
-async def process_documents_endpoint(files: List[UploadFile] = File(...)):
+async def _receive_upload(file: UploadFile, spool_dir: Path):
     """
-    Uploads one or more documents, saves them, extracts text, chunks it, and stores it in the vector database.
-    The original files are deleted after processing.
+    Validates an uploaded file and streams it into a spooled buffer.
+
+    Returns (spooled_upload, None) on success or (None, error_message) if the file is rejected.
     """
-    processed_files = []
-    errors = []
-    duplicates = []
-    total_chunks_added = 0
+    logger.info(f"Receiving file: {file.filename} ({file.content_type})")
 
-    for file in files:
-        file_path = None
-        try:
-            logger.info(f"Starting document processing for file: {file.filename}")
-            logger.info(f"File content type: {file.content_type}")
-
-            # Validate file type
-            if file.content_type not in SUPPORTED_FILE_TYPES:
-                error_message = f"Unsupported file type: {file.content_type}. Supported types are: {list(SUPPORTED_FILE_TYPES.keys())}"
-                logger.error(error_message)
-                errors.append({"filename": file.filename, "error": error_message})
-                continue
+    # Validate file type
+    if file.content_type not in SUPPORTED_FILE_TYPES:
+        error_message = f"Unsupported file type: {file.content_type}. Supported types are: {list(SUPPORTED_FILE_TYPES.keys())}"
+        logger.error(error_message)
+        return None, error_message
 
-            logger.info(f"File type validation passed")
+    # Stream the upload into a spooled buffer, hashing and size-checking as we go
+    try:
+        spooled = await spool_upload(
+            file,
+            max_size=settings.max_upload_size_mb * 1024 * 1024,
+            chunk_size=settings.upload_chunk_size_kb * 1024,
+            spool_max_size=settings.upload_spool_max_size_kb * 1024,
+            spool_dir=spool_dir
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return None, str(e)
 
-            # Save file temporarily
-            file_extension = SUPPORTED_FILE_TYPES[file.content_type]
-            file_id = str(uuid.uuid4())
-            unique_filename = f"{file_id}{file_extension}"
-            file_path = UPLOAD_DIR / unique_filename
+    logger.info(f"File size: {spooled.size} bytes (sha256: {spooled.sha256}, in memory: {spooled.in_memory})")
 
-            logger.info(f"Saving file as: {unique_filename}")
+    if spooled.size == 0:
+        spooled.close()
+        error_message = "File is empty or could not be read"
+        logger.error(error_message)
+        return None, error_message
 
-            contents = await file.read()
-            logger.info(f"File size: {len(contents)} bytes")
+    return spooled, None
 
-            if len(contents) == 0:
-                error_message = "File is empty or could not be read"
-                logger.error(error_message)
-                errors.append({"filename": file.filename, "error": error_message})
-                continue
+def _duplicate_error(filename: str, content_hash: str) -> str:
+    existing = find_duplicate_file(filename, content_hash)
+    if existing and existing["filename"] != filename:
+        return f"File '{filename}' has the same content as '{existing['filename']}', which already exists in the system."
+    return f"File '{filename}' already exists in the system."
 
-            with open(file_path, "wb") as buffer:
-                buffer.write(contents)
-            logger.info(f"File saved successfully to: {file_path}")
-
-            # Load and process the document using your modules
-            logger.info(f"Loading document text from: {file.filename}")
-            document_text = load_document_text(file_path, file.filename)
-            if not document_text or not document_text.strip():
-                error_message = "No text could be extracted from the document."
-                logger.error(error_message)
-                errors.append({"filename": file.filename, "error": error_message})
-                continue
+async def _process_upload(file: UploadFile) -> Dict:
+    """
+    Streams, parses, chunks, embeds and stores a single uploaded file.
 
-            logger.info(f"Document text loaded successfully (length: {len(document_text)} characters)")
+    Returns a dict with an "outcome" of "processed", "duplicate" or "error" and the
+    entry to report under that heading in the response.
+    """
+    spooled = None
+    file_id = None
+    tracked_id = None
+    try:
+        logger.info(f"Starting document processing for file: {file.filename}")
+
+        spooled, error_message = await _receive_upload(file, UPLOAD_DIR)
+        if spooled is None:
+            return {"outcome": "error", "entry": {"filename": file.filename, "error": error_message}}
+
+        # Track the file before parsing it so duplicates (by name or SHA-256 of the content)
+        # are rejected before any parsing or embedding work is done
+        file_id = tracked_id = str(uuid.uuid4())
+        # Until the entry is completed or removed, the storage compactor must not collect it
+        start_ingestion(file_id)
+        if not add_processed_file(file.filename, file_id, spooled.size, status="queued", content_hash=spooled.sha256):
+            file_id = None
+            error_message = _duplicate_error(file.filename, spooled.sha256)
+            logger.warning(error_message)
+            return {"outcome": "duplicate", "entry": {"filename": file.filename, "error": error_message}}
+
+        # Parse, chunk, embed and store off the event loop
+        ingestion = await ingest_document(
+            spooled.payload(),
+            file.filename,
+            file_id,
+            on_progress=lambda stage, **details: update_processed_file(file_id, status=stage, **details)
+        )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(
+            update_processed_file, file_id, status=COMPLETED_STATUS, chunks_added=ingestion["chunks_added"]
+        ))
+        logger.info(
+            f"Document processing for {file.filename} completed successfully "
+            f"({ingestion['chunks_added']} chunks, {ingestion['chunks_reused']} already stored)!"
+        )
 
-            # Chunk the text
-            logger.info(f"Chunking the document text...")
-            chunks = chunk_text(document_text)
-            logger.info(f"Text chunked into {len(chunks)} chunks")
+        return {
+            "outcome": "processed",
+            "entry": {
+                "file_id": file_id,
+                "filename": file.filename,
+                **ingestion
+            }
+        }
 
-            # Embed the chunks
-            logger.info(f"Creating embeddings for {len(chunks)} chunks...")
-            embeddings = embed_chunks(chunks)
-            logger.info(f"Embeddings created successfully ({len(embeddings)} embeddings)")
+    except Exception as e:
+        if isinstance(e, ValueError):
+            error_detail = str(e)
+        else:
+            error_detail = f"An unexpected error occurred: {str(e)}"
+        logger.error(f"Error processing {file.filename}: {error_detail}")
+        if file_id is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, release_document_chunks, file_id)
+            await loop.run_in_executor(None, remove_processed_file, file_id)
+        return {"outcome": "error", "entry": {"filename": file.filename, "error": error_detail}}
+    finally:
+        if tracked_id is not None:
+            finish_ingestion(tracked_id)
+        # Release the spooled upload
+        if spooled is not None:
+            try:
+                spooled.close()
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to cleanup spooled upload for {file.filename}: {cleanup_error}")
+
+async def _enqueue_ingestion_job(files: List[UploadFile]) -> JSONResponse:
+    """
+    Receives the uploaded files, stores them with the job and queues the job for
+    background ingestion. Returns 202 with the job right away.
+    """
+    if job_queue.is_full():
+        raise HTTPException(status_code=503, detail="The ingestion queue is full. Please retry later.")
 
-            # Store in vector db
-            logger.info(f"Storing chunks and embeddings in vector database...")
-            metadatas = [{"filename": file.filename, "file_id": file_id} for _ in chunks]
-            vector_store_instance.add_documents(chunks, embeddings, metadatas)
-            logger.info(f"Documents stored successfully in vector database")
+    job_id = str(uuid.uuid4())
+    job_dir = JOB_PAYLOAD_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
 
-            total_chunks_added += len(chunks)
-            processed_files.append({
-                "file_id": file_id,
+    # Marks of the added entries (see start_ingestion); handed over to the queue with the job
+    tracked: List[str] = []
+    try:
+        job_files = []
+        for file in files:
+            entry = {
                 "filename": file.filename,
-                "chunks_added": len(chunks)
-            })
-            logger.info(f"Document processing for {file.filename} completed successfully!")
-
-            # Add to processed files tracking database
-            file_added = add_processed_file(file.filename, file_id, len(contents), len(chunks))
-            if not file_added:
-                # File was a duplicate, add to duplicates list
-                error_message = f"File '{file.filename}' already exists in the system."
-                logger.warning(error_message)
-                duplicates.append({"filename": file.filename, "error": error_message})
-                # We don't need to remove the vector entries since they were never added for duplicates
+                "file_id": None,
+                "file_size": 0,
+                "sha256": None,
+                "payload_path": None,
+                "stage": "queued",
+                "chunks_added": 0,
+                "chunks_reused": 0,
+                "error": None
+            }
+            job_files.append(entry)
+
+            spooled, error_message = await _receive_upload(file, job_dir)
+            if spooled is None:
+                entry.update(stage="failed", error=error_message)
                 continue
 
-            print(f"Document processing for {file.filename} completed successfully!")
+            file_id = str(uuid.uuid4())
+            start_ingestion(file_id)
+            if not add_processed_file(file.filename, file_id, spooled.size, status="queued", job_id=job_id, content_hash=spooled.sha256):
+                finish_ingestion(file_id)
+                spooled.close()
+                entry.update(stage="duplicate", error=_duplicate_error(file.filename, spooled.sha256))
+                continue
 
-        except Exception as e:
-            error_detail = f"An unexpected error occurred: {str(e)}"
-            logger.error(f"Error processing {file.filename}: {error_detail}")
-            errors.append({"filename": file.filename, "error": error_detail})
-        finally:
-            # Clean up the saved file
-            if file_path and file_path.exists():
-                try:
-                    file_path.unlink()
-                    logger.info(f"Temporary file cleaned up: {file_path}")
-                except Exception as cleanup_error:
-                    logger.warning(f"Failed to cleanup temporary file {file_path}: {cleanup_error}")
+            tracked.append(file_id)
+            payload_path = job_dir / f"{file_id}{SUPPORTED_FILE_TYPES[file.content_type]}"
+            spooled.persist(payload_path)
+            entry.update(file_id=file_id, file_size=spooled.size, sha256=spooled.sha256, payload_path=str(payload_path))
+
+        if all(f["stage"] != "queued" for f in job_files):
+            # Nothing to ingest: answer like a synchronous upload would
+            shutil.rmtree(job_dir, ignore_errors=True)
+            errors = [{"filename": f["filename"], "error": f["error"]} for f in job_files if f["stage"] == "failed"]
+            duplicates = [{"filename": f["filename"], "error": f["error"]} for f in job_files if f["stage"] == "duplicate"]
+            if not errors:
+                raise HTTPException(status_code=409, detail={"message": "All files are duplicates.", "duplicates": duplicates})
+            raise HTTPException(status_code=400, detail={"message": "All files failed to process.", "errors": errors, "duplicates": duplicates})
+
+        job = job_queue.store.create(job_id, job_files)
+        try:
+            job_queue.submit(job_id)
+        except asyncio.QueueFull:
+            for f in job_files:
+                if f["stage"] == "queued":
+                    remove_processed_file(f["file_id"])
+            job_queue.store.update_job(job_id, status="failed", error="The ingestion queue is full.")
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise HTTPException(status_code=503, detail="The ingestion queue is full. Please retry later.")
+        tracked = []
+
+        logger.info(f"Queued ingestion job {job_id} with {len(job_files)} file(s)")
+        return JSONResponse(status_code=202, content=job)
+    finally:
+        for file_id in tracked:
+            finish_ingestion(file_id)
+
+@app.post("/process-documents/", response_model=Dict)
+async def process_documents_endpoint(files: List[UploadFile] = File(...), async_mode: bool = False):
+    """
+    Uploads one or more documents, extracts text, chunks it, and stores it in the vector database.
+    Each upload is streamed in fixed-size pieces into a spooled buffer that only touches disk
+    for large files; the buffer is discarded after processing.
+    Files are processed concurrently: parsing and chunking run in a process pool and
+    embedding runs on a dedicated worker thread, so the event loop stays responsive.
+
+    With `async_mode=true` the files are queued as an ingestion job and the job is returned
+    immediately (202); poll `GET /ingestion-jobs/{job_id}` for progress and the final result.
+    """
+    if async_mode:
+        return await _enqueue_ingestion_job(files)
+
+    outcomes = await asyncio.gather(*(_process_upload(file) for file in files))
+
+    processed_files = [o["entry"] for o in outcomes if o["outcome"] == "processed"]
+    errors = [o["entry"] for o in outcomes if o["outcome"] == "error"]
+    duplicates = [o["entry"] for o in outcomes if o["outcome"] == "duplicate"]
+    total_chunks_added = sum(f["chunks_added"] for f in processed_files)
 
     total_docs = vector_store_instance.get_count()
 
@@ -278,7 +460,7 @@ async def ask_intelligent(request: IntelligentSearchRequest, query_router: Query
     """
     start_time = time.time()
 
-    final_response, results, analysis, tokens_used = await query_router.process_query(request.query)
+    final_response, results, analysis, tokens_used, cached = await query_router.process_query(request.query)
 
     execution_time = time.time() - start_time
 
@@ -290,41 +472,61 @@ async def ask_intelligent(request: IntelligentSearchRequest, query_router: Query
         sources=results,
         analysis=analysis,
         execution_time=execution_time,
-        tokens_used=tokens_used
+        tokens_used=tokens_used,
+        cached=cached
     )
 
-@app.post("/chat-completion")
-async def chat_completion(request: ChatCompletionRequest):
-    try:
-        llm_service = LLMService()  # Uses default model from LLMService
+@app.post("/ask/stream")
+async def ask_intelligent_stream(request: IntelligentSearchRequest, query_router: QueryRouter = Depends(get_query_router)):
+    """
+    Streaming variant of /ask. Sends server-sent events as the query is processed:
+    "analysis", "sources", one "token" per piece of the answer as the LLM generates
+    it, then "usage" (or "error" if processing fails).
+    """
+    return sse_response(query_router.iter_query_events(request.query))
+
+async def _chat_messages_with_context(request: ChatCompletionRequest):
+    """
+    Returns the messages of a chat completion request, the last one extended with the
+    RAG results retrieved for it, and those results.
+    """
+    system_prompt = "You are a helpful assistant. If the provided information is not useful, do not use it and do not mention having acccess to it."
 
-        system_prompt = "You are a helpful assistant. If the provided information is not useful, do not use it and do not mention having acccess to it."
+    # Convert ChatMessage objects to dictionary format expected by LLMService
+    messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
 
-        # Convert ChatMessage objects to dictionary format expected by LLMService
-        messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    # Add the system prompt as the first message
+    # messages.insert(0, {"role": "system", "content": system_prompt})
 
-        # Add the system prompt as the first message
-        # messages.insert(0, {"role": "system", "content": system_prompt})
+    rag_service = RAGService()
+    query = messages[-1]["content"] if messages else ""
+    retrieval = rag_service.create_context(query)
+    results = await rag_service.search(query, retrieval=retrieval)
+    print(f"RAG search results: {results}")
 
-        rag_service = RAGService()
-        query = messages[-1]["content"] if messages else ""
-        results = await rag_service.search(query)
-        print(f"RAG search results: {results}")
+    if results:
+        context = "Use this retrieved information IF AND ONLY IF IT IS RELEVANT:\n"
+        for i, result in enumerate(results, 1):
+            context += f"{i}. [{result.source.upper()}] {result.title or 'Untitled'}\n"
+            context += f"   {result.content[:300]}{'...' if len(result.content) > 300 else ''}\n"
+            if result.url:
+                context += f"   Source: {result.url}\n"
+            context += "\n"
 
-        if results:
-            context = "Use this retrieved information IF AND ONLY IF IT IS RELEVANT:\n"
-            for i, result in enumerate(results, 1):
-                context += f"{i}. [{result.source.upper()}] {result.title or 'Untitled'}\n"
-                context += f"   {result.content[:300]}{'...' if len(result.content) > 300 else ''}\n"
-                if result.url:
-                    context += f"   Source: {result.url}\n"
-                context += "\n"
+        context += "DO NOT MENTION HAVING ACCESS TO THIS INFORMATION. IF IT IS NOT USEFUL, DO NOT USE IT.\n"
 
-            context += "DO NOT MENTION HAVING ACCESS TO THIS INFORMATION. IF IT IS NOT USEFUL, DO NOT USE IT.\n"
+        # Append context to the last message content
+        if messages:
+            messages[-1]["content"] += f"\n\n{context}"
 
-            # Append context to the last message content
-            if messages:
-                messages[-1]["content"] += f"\n\n{context}"
+    return messages, results
+
+@app.post("/chat-completion")
+async def chat_completion(request: ChatCompletionRequest):
+    try:
+        llm_service = LLMService()  # Uses default model from LLMService
+
+        messages, _ = await _chat_messages_with_context(request)
 
         # Generate response using the LLM service
         response = await llm_service.generate_with_messages(
@@ -353,6 +555,31 @@ async def chat_completion(request: ChatCompletionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in chat completion: {str(e)}")
 
+@app.post("/chat-completion/stream")
+async def chat_completion_stream(request: ChatCompletionRequest):
+    """
+    Streaming variant of /chat-completion. Sends server-sent events: "sources" with
+    the retrieved documents, one "token" per piece of the reply as the LLM generates
+    it, then "usage" (or "error" if the completion fails).
+    """
+    llm_service = LLMService()  # Uses default model from LLMService
+
+    async def events():
+        messages, results = await _chat_messages_with_context(request)
+        yield "sources", {"sources": [result.model_dump(mode="json") for result in results]}
+
+        async for event in llm_service.stream_with_messages(
+            messages=messages,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature
+        ):
+            if "text" in event:
+                yield "token", event
+            else:
+                yield "usage", {**event, "model": llm_service.model}
+
+    return sse_response(events())
+
 @app.get("/uploaded-files")
 async def list_uploaded_files():
     try:
@@ -374,23 +601,183 @@ async def list_uploaded_files():
 
 @app.delete("/uploaded-files/{file_id}")
 async def delete_processed_file(file_id: str):
-    try:
-        success = remove_processed_file(file_id)
+    """
+    Removes a processed file and deletes its vectors from the vector store.
+    Chunks that another tracked document shares are kept.
+    """
+    entry = get_processed_file(file_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
+    if entry.get("status", COMPLETED_STATUS) != COMPLETED_STATUS:
+        raise HTTPException(status_code=409, detail=f"File {file_id} is still being processed")
 
-        if success:
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "message": f"File {file_id} removed successfully",
-                    "file_id": file_id
-                }
-            )
-        else:
+    try:
+        loop = asyncio.get_running_loop()
+        chunks_deleted = await loop.run_in_executor(None, release_document_chunks, file_id)
+        if not remove_processed_file(file_id):
             raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
 
+        return JSONResponse(
+            status_code=200,
+            content={
+                "message": f"File {file_id} removed successfully",
+                "file_id": file_id,
+                "chunks_deleted": chunks_deleted
+            }
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
 
+@app.put("/uploaded-files/{file_id}")
+async def update_uploaded_file(file_id: str, file: UploadFile = File(...)):
+    """
+    Replaces a processed file with a new revision, re-ingesting it incrementally.
+    Only chunks that changed are embedded and stored; chunks no longer in the
+    document are deleted. The file keeps its file_id.
+    """
+    entry = get_processed_file(file_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
+    if entry.get("status", COMPLETED_STATUS) != COMPLETED_STATUS:
+        raise HTTPException(status_code=409, detail=f"File {file_id} is still being processed")
+
+    spooled, error_message = await _receive_upload(file, UPLOAD_DIR)
+    if spooled is None:
+        raise HTTPException(status_code=400, detail=error_message)
+
+    try:
+        duplicate = find_duplicate_file(file.filename, spooled.sha256)
+        if duplicate is not None and duplicate["file_id"] != file_id:
+            raise HTTPException(status_code=409, detail=_duplicate_error(file.filename, spooled.sha256))
+
+        previous_hashes = entry.get("chunk_hashes", [])
+        if spooled.sha256 == entry.get("content_hash"):
+            # Same content: nothing to re-ingest
+            update = {
+                "chunks_total": entry.get("chunks_added", 0),
+                "chunks_reused": len(set(previous_hashes)),
+                "chunks_added": 0,
+                "chunks_deleted": 0,
+                "chunks_embedded": 0
+            }
+        else:
+            loop = asyncio.get_running_loop()
+            if not entry.get("content_hash"):
+                # Files ingested before chunks were content-addressed have nothing to diff against
+                await loop.run_in_executor(None, release_document_chunks, file_id)
+                previous_hashes = []
+
+            # The entry leaves the completed status meanwhile; the storage compactor must not collect it
+            with ingesting(file_id):
+                await loop.run_in_executor(None, functools.partial(update_processed_file, file_id, status="queued"))
+                try:
+                    update = await update_document(
+                        spooled.payload(),
+                        file.filename,
+                        file_id,
+                        previous_hashes,
+                        on_progress=lambda stage, **details: update_processed_file(file_id, status=stage, **details)
+                    )
+                finally:
+                    await loop.run_in_executor(
+                        None, functools.partial(update_processed_file, file_id, status=COMPLETED_STATUS)
+                    )
+
+            await loop.run_in_executor(None, functools.partial(
+                update_processed_file,
+                file_id,
+                filename=file.filename,
+                file_size=spooled.size,
+                content_hash=spooled.sha256,
+                upload_time=time.time(),
+                chunks_added=update["chunks_total"]
+            ))
+
+        logger.info(f"Updated {file_id} from {file.filename}: {update}")
+        return JSONResponse(
+            status_code=200,
+            content={
+                "message": f"File {file_id} updated successfully",
+                "file_id": file_id,
+                "filename": file.filename,
+                **update
+            }
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating file: {str(e)}")
+    finally:
+        spooled.close()
+
+@app.get("/ingestion-jobs")
+async def list_ingestion_jobs(limit: int = 50):
+    """Lists the most recent ingestion jobs."""
+    jobs = job_queue.store.list(limit=limit)
+    return JSONResponse(status_code=200, content={"jobs": jobs, "total_jobs": len(jobs)})
+
+@app.get("/ingestion-jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """
+    Returns an ingestion job with the stage of each file
+    (queued, parsed, chunked, embedded, stored, failed or duplicate)
+    and, once the job has finished, the same result a synchronous upload returns.
+    """
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job with ID {job_id} not found")
+    return JSONResponse(status_code=200, content=job)
+
+@app.post("/maintenance/compact")
+async def compact_storage(force: bool = False):
+    """
+    Runs a storage compaction pass now and reports what it reclaimed: stale registry
+    entries, vectors no tracked file refers to, and leftover files in uploads/.
+    With `force=true` the vector store is compacted even if little of it is free.
+    """
+    try:
+        report = await storage_compactor.run(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error compacting storage: {str(e)}")
+    return JSONResponse(status_code=200, content=report)
+
+@app.get("/maintenance/compact")
+async def get_last_compaction():
+    """Returns the report of the last compaction pass (periodic or on demand)."""
+    return JSONResponse(status_code=200, content={"last_report": storage_compactor.last_report})
+
+class ReindexRequest(BaseModel):
+    space: Optional[str] = None
+    m: Optional[int] = None
+    construction_ef: Optional[int] = None
+    search_ef: Optional[int] = None
+
+@app.post("/vector-index/reindex")
+async def start_vector_reindex(request: Optional[ReindexRequest] = None):
+    """
+    Rebuilds the vector index in the background with the configured space and HNSW
+    parameters, or the ones given in the request. Searches and uploads keep working;
+    the new index is swapped in once it is complete. Poll `GET /vector-index/reindex`.
+    """
+    request = request or ReindexRequest()
+    try:
+        status = vector_store_instance.start_reindex(
+            space=request.space, m=request.m, ef_construction=request.construction_ef, ef_search=request.search_ef
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse(status_code=202, content=status)
+
+@app.get("/vector-index/reindex")
+async def get_vector_reindex_status():
+    """Returns the status of the last reindex, with its result once it has finished."""
+    return JSONResponse(status_code=200, content=vector_store_instance.reindex_status)
+
 class CulturalAlignRequest(BaseModel):
     text: str
     target_culture: str
@@ -399,6 +786,7 @@ class CulturalAlignRequest(BaseModel):
 class ChatHistoryRequest(BaseModel):
     messages: List[ChatMessage]
     project_name: Optional[str] = None
+    bypass_cache: bool = False
 
 @app.post("/cultural_align_text/")
 async def cultural_align_text(request: CulturalAlignRequest):
@@ -415,7 +803,7 @@ async def cultural_align_text(request: CulturalAlignRequest):
             "BETTER VERSION:"
         )
         print(f"Prompt for cultural alignment:\n{prompt}")
-        better_version = llm_client.simple_chat(prompt)
+        better_version = await llm_client.asimple_chat(prompt)
         print(f"Better version generated:\n{better_version}")
         return JSONResponse(status_code=200, content={
             "text": request.text,
@@ -446,6 +834,7 @@ async def make_gantt_plan(
 
     - **messages**: Chat history in standard format (role: "user"/"assistant", content: string)
     - **project_name**: Optional project name to use in the output
+    - **bypass_cache**: Call the model even if the response to an identical request is cached
     """
     start_time = datetime.now()
 
@@ -478,13 +867,14 @@ Please provide a structured business plan summary that includes:
 Business Plan Summary:"""
 
         print(f"Generating business plan summary from chat history...")
-        business_plan_summary = llm_client.simple_chat(summary_prompt)
+        business_plan_summary = await llm_client.asimple_chat(summary_prompt)
         print(f"Business plan summary generated: {business_plan_summary[:200]}...")
 
         # Use the summary to generate Gantt plan
         gantt_data = planner.generate_gantt_plan(
             description=business_plan_summary,
-            project_name=request.project_name or "Project from Chat"
+            project_name=request.project_name or "Project from Chat",
+            use_cache=not request.bypass_cache
         )
         print(gantt_data)
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -528,6 +918,7 @@ async def convert_to_gantt(
 
     - **description**: Text describing the business plan or project
     - **project_name**: Optional project name to use in the output
+    - **bypass_cache**: Call the model even if the response to an identical request is cached
     """
     start_time = datetime.now()
 
@@ -539,7 +930,8 @@ async def convert_to_gantt(
         # Generate Gantt plan
         gantt_data = planner.generate_gantt_plan(
             description=request.description,
-            project_name=request.project_name
+            project_name=request.project_name,
+            use_cache=not request.bypass_cache
         )
 
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from enum import Enum
 
@@ -39,6 +39,16 @@ class IntelligentSearchRequest(BaseModel):
     session_id: Optional[str] = None
     force_strategy: Optional[SearchStrategy] = None
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(5, ge=1, le=50)
+
+class BatchSearchItem(BaseModel):
+    index: int
+    query: str
+    results: List[SearchResult] = []
+    error: Optional[str] = None
+
 class IntelligentSearchResponse(BaseModel):
     query: str
     strategy_used: SearchStrategy
@@ -47,4 +57,5 @@ class IntelligentSearchResponse(BaseModel):
     sources: List[SearchResult]
     analysis: QueryAnalysis
     execution_time: float
-    tokens_used: int
\ No newline at end of file
+    tokens_used: int
+    cached: bool = False
\ No newline at end of file
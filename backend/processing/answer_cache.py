@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+
+MAX_ENTRIES = 1000
+TTL_SECONDS = 600.0
+SIMILARITY_THRESHOLD = 0.95
+
+class SemanticAnswerCache:
+    """
+    An in-process LRU cache of generated answers, keyed by query embedding.
+
+    A lookup is a hit when a cached query embedded by the same model is at least
+    `similarity_threshold` cosine-similar to the new one, was routed with the same
+    strategy key and is younger than `ttl_seconds`. Entries are tied to the vector
+    store's content version: once documents are added, changed or deleted, every
+    answer cached before is discarded, and answers computed from an older version
+    are not stored.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS,
+                 similarity_threshold: float = SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # Unit-length query embeddings, one row per slot; `_entries` maps slot -> entry in LRU order
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._content_version = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.latency_saved_seconds = 0.0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def configure(self, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS,
+                  similarity_threshold: float = SIMILARITY_THRESHOLD):
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            self.similarity_threshold = similarity_threshold
+            self._reset()
+
+    def get(self, model_id: str, embedding: np.ndarray, strategy: str, content_version: int) -> Optional[Dict]:
+        """
+        Returns the cached answer of the most similar matching query, with its
+        `similarity`, or None.
+        """
+        if not self.enabled:
+            return None
+        query = _unit(embedding)
+        with self._lock:
+            self._sync_version(content_version)
+            if self._matrix is None or self._matrix.shape[1] != len(query) or not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ query
+            scores[~self._live] = -np.inf
+            now = time.monotonic()
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.similarity_threshold:
+                    break
+                entry = self._entries[int(slot)]
+                if entry["expires_at"] <= now:
+                    self._remove(int(slot))
+                    self.expirations += 1
+                    continue
+                if entry["model_id"] != model_id or entry["strategy"] != strategy:
+                    continue
+                self._entries.move_to_end(int(slot))
+                self.hits += 1
+                self.latency_saved_seconds += entry["seconds"]
+                self.tokens_saved += entry["tokens_used"]
+                return {**entry["answer"], "similarity": float(scores[slot])}
+
+            self.misses += 1
+            return None
+
+    def put(self, model_id: str, embedding: np.ndarray, strategy: str, content_version: int,
+            answer: Dict, seconds: float = 0.0, tokens_used: int = 0):
+        """
+        Caches the answer to a query. `content_version` is the vector store version the
+        answer was computed from, `seconds` and `tokens_used` what computing it cost.
+        """
+        if not self.enabled:
+            return
+        query = _unit(embedding)
+        with self._lock:
+            self._sync_version(content_version)
+            if content_version != self._content_version:
+                # Documents changed while the answer was being generated
+                return
+            if self._matrix is None or self._matrix.shape[1] != len(query):
+                self._reset(len(query))
+            if len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+            slot = int(np.flatnonzero(~self._live)[0])
+            self._matrix[slot] = query
+            self._live[slot] = True
+            self._entries[slot] = {
+                "model_id": model_id,
+                "strategy": strategy,
+                "answer": answer,
+                "seconds": seconds,
+                "tokens_used": tokens_used,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+
+    def _sync_version(self, content_version: int):
+        if content_version > self._content_version:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._live[:] = False
+            self._content_version = content_version
+
+    def _remove(self, slot: int):
+        del self._entries[slot]
+        self._live[slot] = False
+
+    def _reset(self, dim: Optional[int] = None):
+        self._entries.clear()
+        if dim is None:
+            self._matrix = None
+            self._live = np.zeros(0, dtype=bool)
+        else:
+            self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+            self._live = np.zeros(self.max_entries, dtype=bool)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            "tokens_saved": self.tokens_saved,
+        }
+
+def _unit(embedding: np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+answer_cache = SemanticAnswerCache()
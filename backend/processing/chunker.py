@@ -1,18 +1,224 @@
-from typing import List
+import hashlib
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from processing.loader import DocumentSegment
 
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+# chunk_segments splits its buffer once it holds this many characters
+SEGMENT_BUFFER_SIZE = 4 * CHUNK_SIZE
+
+# Token mode: lengths are measured with the embedding model's tokenizer.
+# all-MiniLM-L6-v2 reads at most 256 word-pieces, including [CLS] and [SEP].
+CHUNKING_MODES = ("characters", "tokens")
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_TOKENS = 250
+CHUNK_OVERLAP_TOKENS = 30
+
+Chunk = Tuple[str, Dict[str, Any]]
+
+chunking_mode = "characters"
+chunk_tokens = CHUNK_TOKENS
+chunk_overlap_tokens = CHUNK_OVERLAP_TOKENS
+tokenizer_name = TOKENIZER_NAME
+_tokenizer = None
+_text_splitter: Optional[RecursiveCharacterTextSplitter] = None
+
+def configure_chunking(
+    mode: str = "characters",
+    tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    tokenizer: str = TOKENIZER_NAME
+):
+    """
+    Selects how chunk length is measured: "characters" (CHUNK_SIZE characters with
+    CHUNK_OVERLAP overlap) or "tokens" (`tokens` word-pieces of `tokenizer` with
+    `overlap_tokens` overlap). Takes effect on the next chunking call.
+    """
+    global chunking_mode, chunk_tokens, chunk_overlap_tokens, tokenizer_name, _tokenizer, _text_splitter
+    if mode not in CHUNKING_MODES:
+        raise ValueError(f"Unknown chunking mode: {mode}")
+    if tokenizer != tokenizer_name:
+        _tokenizer = None
+    chunking_mode = mode
+    chunk_tokens = tokens
+    chunk_overlap_tokens = overlap_tokens
+    tokenizer_name = tokenizer
+    _text_splitter = None
+
+def get_chunking_config() -> Tuple[str, int, int, str]:
+    """Returns the arguments of configure_chunking currently in effect (e.g. to pass to worker processes)."""
+    return chunking_mode, chunk_tokens, chunk_overlap_tokens, tokenizer_name
+
+def _get_tokenizer():
+    """Loads the tokenizer once. Only tokenizer.json is fetched, not the model weights."""
+    global _tokenizer
+    if _tokenizer is None:
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        _tokenizer = Tokenizer.from_file(hf_hub_download(tokenizer_name, "tokenizer.json"))
+        _tokenizer.no_truncation()
+        _tokenizer.no_padding()
+    return _tokenizer
+
+def count_tokens(text: str) -> int:
+    """Returns the number of word-pieces the embedding model sees for `text`, without special tokens."""
+    return len(_get_tokenizer().encode(text, add_special_tokens=False).ids)
+
+def _chunk_length(text: str) -> int:
+    return count_tokens(text) if chunking_mode == "tokens" else len(text)
+
+def _chunk_limit() -> int:
+    return chunk_tokens if chunking_mode == "tokens" else CHUNK_SIZE
+
+def _get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Builds the splitter for the current chunking mode once and reuses it."""
+    global _text_splitter
+    if _text_splitter is None:
+        if chunking_mode == "tokens":
+            _text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_tokens,
+                chunk_overlap=chunk_overlap_tokens,
+                length_function=count_tokens,
+            )
+        else:
+            _text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                length_function=len,
+            )
+    return _text_splitter
 
 def chunk_text(text: str) -> List[str]:
     """Splits a long text into smaller, semantically coherent chunks."""
     if not text or not text.strip():
         return []
-        
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-    )
-    chunks = text_splitter.split_text(text)
-    return [chunk for chunk in chunks if chunk.strip()]
\ No newline at end of file
+
+    chunks = _get_text_splitter().split_text(text)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def chunk_hash(chunk: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a chunk with its whitespace normalized.
+    Chunks that differ only in spacing or line breaks share the same hash.
+    """
+    normalized = re.sub(r"\s+", " ", chunk).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _chunk_metadata(spans: List[Tuple[int, Dict[str, Any]]], start: int, end: int) -> Dict[str, Any]:
+    """Metadata of the segment a chunk starts in, plus `page_end` if it runs onto a later page."""
+    first = next(meta for offset, meta in reversed(spans) if offset <= start)
+    last = next(meta for offset, meta in reversed(spans) if offset < end)
+    metadata = dict(first)
+    if "page" in first and last.get("page", first["page"]) != first["page"]:
+        metadata["page_end"] = last["page"]
+    return metadata
+
+class _RowGrouper:
+    """Packs consecutive spreadsheet rows of one sheet into chunks that each start with the header."""
+
+    def __init__(self):
+        self.sheet = None
+        self.prefix = ""
+        self.prefix_length = 0
+        self.rows: List[Tuple[int, str]] = []
+        self.size = 0
+
+    def add(self, segment: DocumentSegment) -> Iterator[Chunk]:
+        sheet = segment.metadata.get("sheet")
+        prefix = f"--- Sheet: {sheet} ---\n{segment.header}\n"
+        if (sheet, prefix) != (self.sheet, self.prefix):
+            yield from self.flush()
+            self.sheet, self.prefix = sheet, prefix
+            self.prefix_length = _chunk_length(prefix)
+        limit = _chunk_limit()
+        for row_number, line in segment.rows:
+            line_length = _chunk_length(line) + 1
+            if self.prefix_length + line_length > limit:
+                # A single row that does not fit: split it, header first in every piece
+                yield from self.flush()
+                row_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=max(limit - self.prefix_length, limit // 2),
+                    chunk_overlap=0,
+                    length_function=_chunk_length,
+                )
+                for piece in row_splitter.split_text(line):
+                    yield self.prefix + piece, self._metadata(row_number, row_number)
+                continue
+            if self.rows and self.prefix_length + self.size + line_length > limit:
+                yield from self.flush()
+            self.rows.append((row_number, line))
+            self.size += line_length
+
+    def flush(self) -> Iterator[Chunk]:
+        if self.rows:
+            text = self.prefix + "\n".join(line for _, line in self.rows)
+            yield text, self._metadata(self.rows[0][0], self.rows[-1][0])
+        self.rows, self.size = [], 0
+
+    def _metadata(self, row_start: int, row_end: int) -> Dict[str, Any]:
+        return {"sheet": self.sheet, "row_start": row_start, "row_end": row_end}
+
+def chunk_segments(segments: Iterable[DocumentSegment]) -> Iterator[Chunk]:
+    """
+    Splits a stream of document segments into chunks, yielding (chunk, metadata) pairs.
+
+    Segments are buffered until the buffer holds SEGMENT_BUFFER_SIZE characters; the buffer
+    is then split and every chunk but the last is yielded. The last one may be cut short
+    by the end of the buffer, so it is carried over into the next buffer. Memory therefore
+    stays bounded by the buffer size rather than by the size of the document.
+
+    Each chunk carries the metadata of the segment it starts in (e.g. its page number).
+
+    Spreadsheet segments are chunked by rows instead: whole rows are packed into chunks
+    under a copy of the sheet's header, so that each chunk can be understood on its own.
+    """
+    text_splitter = _get_text_splitter()
+    row_grouper = _RowGrouper()
+    buffer = ""
+    # (offset in buffer, metadata) of every segment in the buffer
+    spans: List[Tuple[int, Dict[str, Any]]] = []
+
+    def split(final: bool) -> Iterator[Chunk]:
+        nonlocal buffer, spans
+        pieces = [piece for piece in text_splitter.split_text(buffer) if piece.strip()]
+        search_from = 0
+        located = []
+        for piece in pieces:
+            start = buffer.find(piece, search_from)
+            located.append((piece, start))
+            search_from = start + 1
+        if not final and len(located) > 1:
+            _, carry_start = located.pop()
+        else:
+            carry_start = None
+        for piece, start in located:
+            yield piece, _chunk_metadata(spans, start, start + len(piece))
+        if carry_start is None:
+            buffer, spans = "", []
+        else:
+            carried = [(offset, meta) for offset, meta in spans if offset > carry_start]
+            containing = next(meta for offset, meta in reversed(spans) if offset <= carry_start)
+            buffer = buffer[carry_start:]
+            spans = [(0, containing)] + [(offset - carry_start, meta) for offset, meta in carried]
+
+    for segment in segments:
+        if segment.rows is not None:
+            if buffer.strip():
+                yield from split(final=True)
+            yield from row_grouper.add(segment)
+            continue
+        yield from row_grouper.flush()
+        if not segment.text.strip():
+            continue
+        if buffer:
+            buffer += "\n"
+        spans.append((len(buffer), segment.metadata))
+        buffer += segment.text
+        if len(buffer) >= SEGMENT_BUFFER_SIZE:
+            yield from split(final=False)
+    yield from row_grouper.flush()
+    if buffer.strip():
+        yield from split(final=True)
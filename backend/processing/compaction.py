@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from processing.jobs import ACTIVE_JOB_STATUSES, JOB_PAYLOAD_DIR, JobStore
+from processing.pipeline import release_document_chunks
+from processing.registry import (
+    UPLOAD_DIR,
+    PROCESSED_FILES_DB,
+    get_chunk_hashes,
+    load_processed_files,
+    remove_processed_file,
+    stale_file_entries
+)
+from processing.vector_store import vector_store_instance
+
+logger = logging.getLogger(__name__)
+
+GC_INTERVAL_MINUTES = 60
+GC_GRACE_MINUTES = 60
+
+def _path_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+def _referenced_ids(db: Dict) -> Set[str]:
+    """Ids of the vectors the tracked files refer to."""
+    referenced = set()
+    for entry in db["files"]:
+        hashes = get_chunk_hashes(entry["file_id"])
+        if hashes:
+            referenced.update(hashes)
+        elif not entry.get("content_hash"):
+            # Files ingested before chunks were content-addressed are keyed by file_id
+            referenced.update(f"{entry['file_id']}-chunk{i}" for i in range(entry.get("chunks_added", 0)))
+    return referenced
+
+class StorageCompactor:
+    """
+    Reconciles the file registry, the vector store and the uploads directory, and
+    reclaims the space of what is no longer referenced:
+
+    - registry entries stuck in an ingestion stage although no job or upload is working
+      on them any more (see registry.stale_file_entries) are removed with their vectors;
+    - vectors that no tracked file refers to are deleted, then the vector store is
+      compacted (see VectorBackend.compact);
+    - spooled uploads, job payloads and temporary files left behind in `uploads/`
+      (older than the grace period, or of finished jobs) are deleted.
+
+    Runs every `interval_minutes` on a background task (0 disables it) and on demand.
+    """
+
+    def __init__(self, job_store: JobStore, interval_minutes: float = GC_INTERVAL_MINUTES,
+                 grace_minutes: float = GC_GRACE_MINUTES):
+        self.job_store = job_store
+        self.interval_minutes = interval_minutes
+        self.grace_minutes = grace_minutes
+        self.last_report: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def configure(self, interval_minutes: float = GC_INTERVAL_MINUTES, grace_minutes: float = GC_GRACE_MINUTES):
+        self.interval_minutes = interval_minutes
+        self.grace_minutes = grace_minutes
+
+    def start(self):
+        self._lock = asyncio.Lock()
+        if self.interval_minutes > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval_minutes * 60)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Storage compaction failed: {e}")
+
+    async def run(self, force: bool = False) -> Dict:
+        """
+        Runs one compaction pass off the event loop and returns its report.
+        With `force`, the vector store is compacted even if little of it is free.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            self.last_report = await loop.run_in_executor(None, self.compact, force)
+            return self.last_report
+
+    def compact(self, force: bool = False) -> Dict:
+        started = time.perf_counter()
+        cutoff = time.time() - self.grace_minutes * 60
+        registry = self._reconcile_registry()
+        vectors = self._collect_vectors(force)
+        uploads = self._clean_uploads(cutoff)
+        report = {
+            "finished_at": time.time(),
+            "seconds": round(time.perf_counter() - started, 2),
+            "registry": registry,
+            "vector_store": vectors,
+            "uploads": uploads,
+            "reclaimed_bytes": vectors["reclaimed_bytes"] + uploads["reclaimed_bytes"],
+        }
+        logger.info(
+            f"Storage compaction reclaimed {report['reclaimed_bytes']} bytes "
+            f"({vectors['orphaned_vectors_deleted']} orphaned vectors, {uploads['files_removed']} upload files)"
+        )
+        return report
+
+    def _reconcile_registry(self) -> Dict:
+        removed = []
+        for entry in stale_file_entries():
+            release_document_chunks(entry["file_id"])
+            if remove_processed_file(entry["file_id"]):
+                removed.append(entry["file_id"])
+        return {"stale_entries_removed": len(removed), "file_ids": removed}
+
+    def _collect_vectors(self, force: bool) -> Dict:
+        # Ids are listed before the registry is read: a chunk's hash is recorded before
+        # its vector is stored, so every listed vector still in use is referenced below
+        stored: List[str] = [record_id for batch in vector_store_instance.iter_ids() for record_id in batch]
+        referenced = _referenced_ids(load_processed_files())
+        orphaned = [record_id for record_id in stored if record_id not in referenced]
+        if orphaned:
+            # Check again right before deleting, in case a new upload started to share a chunk
+            referenced = _referenced_ids(load_processed_files())
+            orphaned = [record_id for record_id in orphaned if record_id not in referenced]
+            vector_store_instance.delete_chunks(orphaned)
+
+        compaction = vector_store_instance.compact(0.0 if force else 0.25)
+        return {
+            "vectors": len(stored) - len(orphaned),
+            "orphaned_vectors_deleted": len(orphaned),
+            **compaction,
+        }
+
+    def _clean_uploads(self, cutoff: float) -> Dict:
+        active_jobs = {job["job_id"] for job in self.job_store.list(limit=None) if job["status"] in ACTIVE_JOB_STATUSES}
+        candidates = [
+            path for path in UPLOAD_DIR.iterdir()
+            if path.is_file() and path != PROCESSED_FILES_DB and path != self.job_store.path
+            and (path.name.startswith("upload-") or path.name.endswith(".tmp"))
+            and path.stat().st_mtime < cutoff
+        ]
+        if JOB_PAYLOAD_DIR.exists():
+            candidates.extend(
+                path for path in JOB_PAYLOAD_DIR.iterdir()
+                if path.name not in active_jobs and path.stat().st_mtime < cutoff
+            )
+
+        removed, reclaimed = 0, 0
+        for path in candidates:
+            try:
+                size = _path_bytes(path)
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove {path}: {e}")
+                continue
+            removed += 1
+            reclaimed += size
+        return {"files_removed": removed, "reclaimed_bytes": reclaimed}
@@ -1,33 +1,160 @@
+import threading
 import torch
-from typing import List
+import numpy as np
+from typing import Dict, List, Optional
 from sentence_transformers import SentenceTransformer
+from processing.chunker import chunk_hash
+from processing.embedding_cache import EmbeddingCache
 
 MODEL_NAME = 'all-MiniLM-L6-v2'
 
+# "torch" runs the PyTorch model; "onnx" runs an exported ONNX graph through onnxruntime
+# on the CPU. The model repository ships several exports, including int8-quantized ones
+# (onnx/model_qint8_avx2.onnx, onnx/model_qint8_avx512_vnni.onnx, onnx/model_qint8_arm64.onnx).
+EMBEDDING_BACKENDS = ("torch", "onnx")
+ONNX_FILE = "onnx/model_qint8_avx2.onnx"
+
+CACHE_DIR = "embedding_cache"
+CACHE_MAX_ENTRIES = 200_000
+BATCH_SIZE = 64
+
 model = None
+embedding_cache: Optional[EmbeddingCache] = None
+cache_enabled = True
+batch_size = BATCH_SIZE
+backend = "torch"
+onnx_file = ONNX_FILE
+# Embeddings are computed on several threads (ingestion, query batches); the model and the
+# cache must each be created only once
+_init_lock = threading.RLock()
+
+def configure_embedding(batch: int = BATCH_SIZE, model_backend: str = "torch", onnx_model_file: str = ONNX_FILE):
+    """
+    Sets how many texts are encoded per forward pass and which backend runs the model.
+    Changing the backend takes effect on the next embedding call.
+    """
+    global batch_size, backend, onnx_file, model, embedding_cache
+    if model_backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {model_backend}")
+    batch_size = batch
+    if (model_backend, onnx_model_file) != (backend, onnx_file):
+        backend = model_backend
+        onnx_file = onnx_model_file
+        model = None
+        embedding_cache = None
+
+def _model_id() -> str:
+    """Identifies the model and backend; vectors of different exports are cached separately."""
+    if backend == "onnx":
+        return f"{MODEL_NAME}-{onnx_file}"
+    return MODEL_NAME
+
+def get_embedding_model_id() -> str:
+    """Returns the identifier of the model and backend that embed_texts currently uses."""
+    return _model_id()
+
+def configure_embedding_cache(directory: str = CACHE_DIR, max_entries: int = CACHE_MAX_ENTRIES, enabled: bool = True):
+    """Sets where and how large the persistent embedding cache is. Takes effect on the next embedding call."""
+    global CACHE_DIR, CACHE_MAX_ENTRIES, cache_enabled, embedding_cache
+    CACHE_DIR = directory
+    CACHE_MAX_ENTRIES = max_entries
+    cache_enabled = enabled
+    embedding_cache = None
 
 def _get_embedding_model():
     """
     Initializes and returns the sentence transformer model, loading it only once.
-    Automatically detects and uses a GPU if available.
+    With the torch backend, automatically detects and uses a GPU if available.
     """
     global model
-    if model is None:
-        print("Initializing embedding model...")
-
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"Using device: {device}")
-        
-        model = SentenceTransformer(MODEL_NAME, device=device)
-        print("Embedding model loaded.")
-    return model
-
-def embed_chunks(chunks: List[str]) -> List[List[float]]:
-    """Embeds a list of text chunks using a sentence-transformer model."""
-    if not chunks:
-        return []
-    
-    embedding_model = _get_embedding_model()
-    embeddings = embedding_model.encode(chunks, convert_to_tensor=False)
-    
-    return [embedding.tolist() for embedding in embeddings]
+    with _init_lock:
+        if model is None:
+            print("Initializing embedding model...")
+
+            if backend == "onnx":
+                print(f"Using ONNX backend on CPU: {onnx_file}")
+                model = SentenceTransformer(
+                    MODEL_NAME, device='cpu', backend="onnx", model_kwargs={"file_name": onnx_file}
+                )
+            else:
+                device = 'cuda' if torch.cuda.is_available() else 'cpu'
+                print(f"Using device: {device}")
+
+                model = SentenceTransformer(MODEL_NAME, device=device)
+            print("Embedding model loaded.")
+        return model
+
+def _get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Opens the persistent embedding cache for the current model, once."""
+    global embedding_cache
+    with _init_lock:
+        if embedding_cache is None and cache_enabled:
+            dim = _get_embedding_model().get_sentence_embedding_dimension()
+            embedding_cache = EmbeddingCache(CACHE_DIR, _model_id(), dim, CACHE_MAX_ENTRIES)
+        return embedding_cache
+
+def flush_embedding_cache():
+    """Persists the embedding cache index, if the cache is open."""
+    if embedding_cache is not None:
+        embedding_cache.flush()
+
+def get_embedding_cache_stats() -> Dict:
+    """Returns hit-rate statistics of the persistent embedding cache."""
+    if embedding_cache is None:
+        return {"enabled": cache_enabled, "model": _model_id(), "entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+    return {"enabled": True, **embedding_cache.stats()}
+
+def _encode(texts: List[str]) -> np.ndarray:
+    """
+    Runs the model over `texts` in batches of `batch_size`.
+    SentenceTransformer.encode orders the texts by length before batching (and restores
+    the input order afterwards), so each batch is padded only to similar lengths.
+    """
+    embeddings = _get_embedding_model().encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embeds a list of texts using a sentence-transformer model.
+
+    Returns a C-contiguous float32 array of shape (len(texts), dim) whose rows have unit
+    length, so that the dot product of two rows is their cosine similarity.
+    Embeddings are looked up in the persistent cache first; only the misses are computed.
+    """
+    if not texts:
+        return np.empty((0, _get_embedding_model().get_sentence_embedding_dimension()), dtype=np.float32)
+
+    cache = _get_embedding_cache()
+    if cache is None:
+        return np.ascontiguousarray(_encode(texts))
+
+    keys = [chunk_hash(text) for text in texts]
+    cached = cache.get_many(keys)
+
+    # Compute each missing text once, even if it appears several times in the input
+    missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+    if missing:
+        computed = _encode(list(missing.values()))
+        cache.put_many(list(missing), computed)
+        cached.update(zip(missing, computed))
+
+    embeddings = np.empty((len(texts), cache.dim), dtype=np.float32)
+    for row, key in enumerate(keys):
+        embeddings[row] = cached[key]
+    # Entries cached before embeddings were normalized may not have unit length
+    return _normalize(embeddings)
+
+def embed_chunks(chunks: List[str]) -> np.ndarray:
+    """Embeds a list of text chunks; see embed_texts."""
+    return embed_texts(chunks)
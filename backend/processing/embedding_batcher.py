@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+from processing.embedder import embed_texts
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 5.0
+
+class EmbeddingBatcher:
+    """
+    Embeds query texts submitted concurrently from async handlers in shared batches.
+
+    A request waits at most `max_wait_ms` for others to join its batch (or until
+    `max_batch_size` requests are pending); the batch is then embedded in one model call
+    on a dedicated thread and each caller receives its own row. Requests that arrive
+    while a batch is being embedded form the next batch.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embedding")
+        self._pending: Deque[Tuple[str, asyncio.Future, float]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+
+        self.requests = 0
+        self.batched_requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.last_batch_size = 0
+        self.total_queue_ms = 0.0
+
+    def configure(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._pending.clear()
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Returns the embedding of `text` (a float32 vector of unit length)."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.requests += 1
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds several texts in one model call on the batcher's thread, see embed_texts.
+        For callers that already have a batch; it does not wait for other requests.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, embed_texts, texts)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+            if not self._pending:
+                self._wakeup.clear()
+            if batch:
+                await self._embed_batch(batch)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self.batches += 1
+        self.batched_requests += len(batch)
+        self.last_batch_size = len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.total_queue_ms += sum((started - submitted) * 1000 for _, _, submitted in batch)
+
+        try:
+            embeddings = await self._loop.run_in_executor(
+                self._executor, embed_texts, [text for text, _, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Embedding a batch of {len(batch)} queries failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), embedding in zip(batch, embeddings):
+            # The caller may have been cancelled meanwhile
+            if not future.done():
+                future.set_result(embedding)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            if not future.done():
+                future.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": len(self._pending),
+            "requests": self.requests,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "largest_batch": self.largest_batch,
+            "average_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            "average_queue_ms": self.total_queue_ms / self.batched_requests if self.batched_requests else 0.0,
+        }
+
+query_embedding_batcher = EmbeddingBatcher()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+class EmbeddingCache:
+    """
+    A disk-backed cache of embeddings for one model, keyed by chunk hash.
+
+    Vectors live as float32 rows in a memory-mapped file next to a JSON index that maps
+    each key to its row. The index is kept in least-recently-used order; once all
+    `max_entries` rows are taken, the least recently used row is overwritten.
+
+    Writing the index costs time proportional to the cache size, so it is written on a
+    background thread, at most once every `flush_interval` seconds, and never by the
+    caller of put_many; call `flush()` on shutdown to persist the rest.
+    Each row also records a digest of its key, so an index that is older than the vectors
+    (e.g. after a crash) can never serve a row that was reused for another key.
+    """
+
+    def __init__(self, directory: str, model_name: str, dim: int, max_entries: int, flush_interval: float = 5.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.vectors_path = self.directory / f"{slug}.f32"
+        self.index_path = self.directory / f"{slug}.index.json"
+        self.row_keys_path = self.directory / f"{slug}.keys"
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Serializes index writes; taken before `_lock`, which a write holds only to snapshot the index
+        self._flush_lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._last_flush = 0.0
+        self._flushing = False
+        self._load()
+
+    def _load(self):
+        """Opens the vector file (resizing it to `max_entries` rows) and loads the index."""
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r') as f:
+                    data = json.load(f)
+                if data.get("model") == self.model_name and data.get("dim") == self.dim:
+                    self._index = OrderedDict(
+                        (key, row) for key, row in data["entries"] if row < self.max_entries
+                    )
+            except (json.JSONDecodeError, IOError, KeyError) as e:
+                print(f"Error loading embedding cache index, starting empty: {e}")
+                self._index = OrderedDict()
+
+        self._vectors = self._open_rows(self.vectors_path, np.float32, (self.max_entries, self.dim))
+        self._row_keys = self._open_rows(self.row_keys_path, "S32", (self.max_entries,))
+
+        used_rows = set(self._index.values())
+        self._free_rows = [row for row in range(self.max_entries - 1, -1, -1) if row not in used_rows]
+
+    def _open_rows(self, path: Path, dtype, shape) -> np.memmap:
+        """Memory-maps a file of fixed-size rows, growing or shrinking it to `shape`."""
+        expected_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() != expected_size:
+                f.truncate(expected_size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    @staticmethod
+    def _key_digest(key: str) -> bytes:
+        return hashlib.sha256(key.encode("utf-8")).digest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Returns the cached vectors for the keys that are present."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._index.get(key)
+                if row is not None and self._row_keys[row] != self._key_digest(key):
+                    # The row was reused after the index was last written
+                    del self._index[key]
+                    self._free_rows.append(row)
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    continue
+                self._index.move_to_end(key)
+                found[key] = np.array(self._vectors[row])
+                self.hits += 1
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Stores vectors under the given keys, evicting the least recently used entries if needed."""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                row = self._index.get(key)
+                if row is None:
+                    if self._free_rows:
+                        row = self._free_rows.pop()
+                    else:
+                        _, row = self._index.popitem(last=False)
+                        self.evictions += 1
+                self._vectors[row] = vector
+                self._row_keys[row] = self._key_digest(key)
+                self._index[key] = row
+                self._index.move_to_end(key)
+            if not self._flushing and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flushing = True
+                self._last_flush = time.monotonic()
+                threading.Thread(target=self._background_flush, name="embedding-cache-flush", daemon=True).start()
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        except (IOError, OSError) as e:
+            print(f"Error saving embedding cache index: {e}")
+        finally:
+            self._flushing = False
+
+    def flush(self):
+        """Persists the index, including the current LRU order."""
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._index.items())
+                self._last_flush = time.monotonic()
+            # Vectors are flushed after the snapshot, so the rows on disk are never older than the index
+            self._vectors.flush()
+            self._row_keys.flush()
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"model": self.model_name, "dim": self.dim, "entries": entries}, f)
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._index),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,26 @@
+import io
+import json
+from typing import List, Union
+from processing.loader import iter_document_segments
+from processing.chunker import chunk_hash, chunk_segments
+
+# This module is imported by the ingestion worker processes, so it must stay free of
+# heavy imports (the embedding model, the vector store client, the web app).
+
+def parse_and_chunk(payload: Union[str, bytes], original_filename: str, spool_path: str) -> List[str]:
+    """
+    Streams the segments of a document through the chunker into a spool file.
+    Returns the hashes of the chunks, in document order.
+
+    `payload` is either a path to the document on disk or its raw bytes. Each chunk is
+    written to `spool_path` as it is produced, one JSON line [chunk, metadata] per chunk
+    (the metadata locates the chunk: page, sheet, ...), so neither this process nor the
+    result sent back to the caller holds the document's text.
+    """
+    source = io.BytesIO(payload) if isinstance(payload, bytes) else payload
+    hashes = []
+    with open(spool_path, "w", encoding="utf-8") as spool:
+        for text, metadata in chunk_segments(iter_document_segments(source, original_filename)):
+            spool.write(json.dumps([text, metadata]) + "\n")
+            hashes.append(chunk_hash(text))
+    return hashes
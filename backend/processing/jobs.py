@@ -0,0 +1,280 @@
+import asyncio
+import copy
+import functools
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from processing.pipeline import ingest_document, release_document_chunks
+from processing.registry import (
+    UPLOAD_DIR,
+    COMPLETED_STATUS,
+    finish_ingestion,
+    ingesting,
+    load_processed_files,
+    start_ingestion,
+    update_processed_file,
+    remove_processed_file
+)
+from processing.vector_store import vector_store_instance
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = UPLOAD_DIR / "ingestion_jobs.json"
+JOB_PAYLOAD_DIR = UPLOAD_DIR / "jobs"
+
+# Job lifecycle: queued -> running -> completed | failed
+ACTIVE_JOB_STATUSES = {"queued", "running"}
+# File lifecycle: queued -> parsed -> chunked -> embedded -> stored, or failed / duplicate
+TERMINAL_FILE_STAGES = {"stored", "failed", "duplicate"}
+
+class JobStore:
+    """Keeps ingestion jobs in a JSON file so that they survive a restart."""
+
+    def __init__(self, path: Path = JOBS_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f).get("jobs", {})
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading ingestion jobs database: {e}")
+        return {}
+
+    def _save(self):
+        try:
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"jobs": self._jobs}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Error saving ingestion jobs database: {e}")
+
+    def create(self, job_id: str, files: List[Dict]) -> Dict:
+        """Records a new job in the "queued" state."""
+        with self._lock:
+            now = time.time()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": now,
+                "updated_at": now,
+                "files": files,
+                "result": None,
+                "error": None
+            }
+            self._save()
+            return copy.deepcopy(self._jobs[job_id])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list(self, limit: Optional[int] = 50) -> List[Dict]:
+        """Returns the most recent jobs first (all of them if `limit` is None)."""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)
+            return copy.deepcopy(jobs[:limit])
+
+    def update_job(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updated_at"] = time.time()
+            self._save()
+
+    def update_file(self, job_id: str, index: int, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["files"][index].update(fields)
+            job["updated_at"] = time.time()
+            self._save()
+
+    def recover(self) -> List[str]:
+        """
+        Prepares jobs interrupted by a restart to run again and returns their ids.
+
+        Files that had not reached a terminal stage are reset to "queued" and marked as
+        resumed, so that any vectors they partially wrote are cleared before re-ingestion.
+        Files whose payload is gone are marked as failed.
+        """
+        with self._lock:
+            pending = []
+            for job in self._jobs.values():
+                if job["status"] not in ACTIVE_JOB_STATUSES:
+                    continue
+                for file in job["files"]:
+                    if file["stage"] in TERMINAL_FILE_STAGES:
+                        continue
+                    if file.get("payload_path") and Path(file["payload_path"]).exists():
+                        file["stage"] = "queued"
+                        file["resumed"] = True
+                    else:
+                        file["stage"] = "failed"
+                        file["error"] = "The upload was lost during a restart."
+                job["status"] = "queued"
+                job["updated_at"] = time.time()
+                pending.append(job["job_id"])
+            self._save()
+            return pending
+
+def summarize_job(job: Dict) -> Dict:
+    """Builds the same response shape as a synchronous /process-documents/ call."""
+    processed_files = [
+        {
+            "file_id": f["file_id"],
+            "filename": f["filename"],
+            "chunks_added": f["chunks_added"],
+            "chunks_reused": f.get("chunks_reused", 0)
+        }
+        for f in job["files"] if f["stage"] == "stored"
+    ]
+    return {
+        "message": "Document processing finished.",
+        "processed_files": processed_files,
+        "errors": [{"filename": f["filename"], "error": f["error"]} for f in job["files"] if f["stage"] == "failed"],
+        "duplicates": [{"filename": f["filename"], "error": f["error"]} for f in job["files"] if f["stage"] == "duplicate"],
+        "total_chunks_added": sum(f["chunks_added"] for f in processed_files),
+        "total_documents_in_store": vector_store_instance.get_count()
+    }
+
+async def _run_blocking(func: Callable, *args, **kwargs):
+    """Runs a JobStore or registry write in a worker thread, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+class IngestionJobQueue:
+    """
+    A bounded queue of ingestion jobs worked off by background tasks.
+
+    Every stage transition is written to the JobStore and mirrored to the status
+    field of the file's entry in processed_files.json, in worker threads.
+
+    The files of a submitted job must be marked with registry.start_ingestion; the queue
+    clears each mark once the file's entry is completed or removed.
+    """
+
+    def __init__(self, store: JobStore, max_size: int = 16, workers: int = 1):
+        self.store = store
+        self.max_size = max_size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Starts the workers and re-queues jobs that were interrupted by a restart."""
+        JOB_PAYLOAD_DIR.mkdir(exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        pending = self.store.recover()
+        self._reconcile_registry(pending)
+        if pending:
+            logger.info(f"Resuming {len(pending)} interrupted ingestion job(s)")
+            self._tasks.append(asyncio.create_task(self._requeue(pending)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    def submit(self, job_id: str):
+        """Queues a job created in the store. Raises asyncio.QueueFull if the queue is full."""
+        if self._queue is None:
+            raise RuntimeError("Ingestion job queue has not been started")
+        self._queue.put_nowait(job_id)
+
+    def _reconcile_registry(self, pending_jobs: List[str]):
+        """Resets tracked files of resumed jobs and drops entries left behind by interrupted uploads."""
+        resumable = {
+            file["file_id"]
+            for job_id in pending_jobs
+            for file in self.store.get(job_id)["files"]
+            if file["stage"] == "queued"
+        }
+        for entry in load_processed_files()["files"]:
+            if entry.get("status", COMPLETED_STATUS) == COMPLETED_STATUS:
+                continue
+            if entry["file_id"] in resumable:
+                start_ingestion(entry["file_id"])
+                update_processed_file(entry["file_id"], status="queued")
+            else:
+                release_document_chunks(entry["file_id"])
+                remove_processed_file(entry["file_id"])
+
+    async def _requeue(self, job_ids: List[str]):
+        for job_id in job_ids:
+            await self._queue.put(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed: {e}")
+                await _run_blocking(self.store.update_job, job_id, status="failed", error=str(e))
+                # Entries of files that did not run are left for the storage compactor
+                for file in self.store.get(job_id)["files"]:
+                    if file["file_id"] is not None:
+                        finish_ingestion(file["file_id"])
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        job = self.store.get(job_id)
+        await _run_blocking(self.store.update_job, job_id, status="running")
+
+        await asyncio.gather(*(
+            self._run_file(job_id, index, file)
+            for index, file in enumerate(job["files"])
+            if file["stage"] not in TERMINAL_FILE_STAGES
+        ))
+
+        job = self.store.get(job_id)
+        result = summarize_job(job)
+        status = "completed" if result["processed_files"] or not result["errors"] else "failed"
+        await _run_blocking(self.store.update_job, job_id, status=status, result=result)
+        shutil.rmtree(JOB_PAYLOAD_DIR / job_id, ignore_errors=True)
+        logger.info(f"Ingestion job {job_id} finished with status '{status}'")
+
+    async def _run_file(self, job_id: str, index: int, file: Dict):
+        file_id = file["file_id"]
+
+        def on_progress(stage: str, **details):
+            self.store.update_file(job_id, index, stage=stage)
+            update_processed_file(file_id, status=stage, **details)
+
+        loop = asyncio.get_running_loop()
+        with ingesting(file_id):
+            try:
+                if file.get("resumed"):
+                    # A previous attempt may have written some of the chunks already
+                    await loop.run_in_executor(None, release_document_chunks, file_id)
+
+                ingestion = await ingest_document(file["payload_path"], file["filename"], file_id, on_progress)
+                await _run_blocking(self.store.update_file, job_id, index, stage="stored", **ingestion)
+                await _run_blocking(
+                    update_processed_file, file_id, status=COMPLETED_STATUS, chunks_added=ingestion["chunks_added"]
+                )
+            except Exception as e:
+                logger.error(f"Error processing {file['filename']} in job {job_id}: {e}")
+                await _run_blocking(self.store.update_file, job_id, index, stage="failed", error=str(e))
+                await loop.run_in_executor(None, release_document_chunks, file_id)
+                await loop.run_in_executor(None, remove_processed_file, file_id)
+        # Not in a `finally`: when the queue is stopped for a restart, the task is cancelled
+        # and the payload must stay for recover() to run the file again
+        Path(file["payload_path"]).unlink(missing_ok=True)
@@ -1,53 +1,163 @@
+import datetime
+import io
 import os
 import docx
+import openpyxl
 import pypdf
-import pandas as pd
-from typing import Callable, Dict
-
-def _load_pdf(file_path: str) -> str:
-    """Loads text from a PDF file."""
-    text = ""
-    reader = pypdf.PdfReader(file_path)
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def _load_docx(file_path: str) -> str:
-    """Loads text from a DOCX file."""
-    text = ""
-    document = docx.Document(file_path)
-    for para in document.paragraphs:
-        text += para.text + "\n"
-    return text
-
-def _load_excel(file_path: str) -> str:
-    """Loads text from an Excel file (XLSX/XLS)."""
-    text = ""
-    xls = pd.ExcelFile(file_path)
-    for sheet_name in xls.sheet_names:
-        df = pd.read_excel(xls, sheet_name=sheet_name)
-        df.fillna("", inplace=True)
-        if not df.empty:
-            text += f"--- Sheet: {sheet_name} ---\n"
-            text += df.to_string(index=False) + "\n\n"
-    return text
-
-def _load_txt(file_path: str) -> str:
-    """Loads text from a plain text file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return f.read()
-
-LOADER_MAPPING: Dict[str, Callable[[str], str]] = {
-    ".pdf": _load_pdf,
-    ".docx": _load_docx,
-    ".xlsx": _load_excel,
-    ".xls": _load_excel,
-    ".txt": _load_txt,
+import xlrd
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# A loader accepts either a path on disk or a binary file-like object.
+DocumentSource = Union[str, os.PathLike, BinaryIO]
+
+# Paragraphs and lines are grouped into segments of about this many characters
+SEGMENT_CHARS = 2000
+# Spreadsheet rows per segment
+SHEET_ROW_BATCH = 50
+
+class DocumentSegment(NamedTuple):
+    """A piece of a document along with where it came from (page, sheet, paragraph, ...)."""
+    text: str
+    metadata: Dict[str, Any]
+    # Spreadsheet segments also carry their header line and their (row number, line)
+    # pairs, so that the chunker can keep rows whole and repeat the header.
+    header: Optional[str] = None
+    rows: Optional[List[Tuple[int, str]]] = None
+
+def _iter_pdf(source: DocumentSource) -> Iterator[DocumentSegment]:
+    """Yields the text of a PDF file one page at a time."""
+    reader = pypdf.PdfReader(source)
+    for page_number, page in enumerate(reader.pages, start=1):
+        yield DocumentSegment(page.extract_text() or "", {"page": page_number})
+
+def _iter_docx(source: DocumentSource) -> Iterator[DocumentSegment]:
+    """Yields the text of a DOCX file in blocks of consecutive paragraphs."""
+    document = docx.Document(source)
+    block, block_size, first_paragraph = [], 0, 1
+    for paragraph_number, para in enumerate(document.paragraphs, start=1):
+        if not block:
+            first_paragraph = paragraph_number
+        block.append(para.text)
+        block_size += len(para.text) + 1
+        if block_size >= SEGMENT_CHARS:
+            yield DocumentSegment("\n".join(block) + "\n", {"paragraph": first_paragraph})
+            block, block_size = [], 0
+    if block:
+        yield DocumentSegment("\n".join(block) + "\n", {"paragraph": first_paragraph})
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value).strip()
+
+def _iter_sheet_rows(sheet_name: str, rows: Iterable[Tuple[int, List[Any]]]) -> Iterator[DocumentSegment]:
+    """
+    Turns the (row number, cell values) pairs of one sheet into segments of SHEET_ROW_BATCH rows.
+    The first non-empty row is taken as the header; empty rows are skipped.
+    """
+    header = None
+    batch: List[Tuple[int, str]] = []
+    for row_number, values in rows:
+        cells = [_format_cell(value) for value in values]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        if header is None:
+            header = " | ".join(cell or f"Column {i}" for i, cell in enumerate(cells, start=1))
+            continue
+        batch.append((row_number, " | ".join(cells)))
+        if len(batch) >= SHEET_ROW_BATCH:
+            yield _sheet_segment(sheet_name, header, batch)
+            batch = []
+    if batch:
+        yield _sheet_segment(sheet_name, header, batch)
+
+def _sheet_segment(sheet_name: str, header: str, rows: List[Tuple[int, str]]) -> DocumentSegment:
+    text = f"--- Sheet: {sheet_name} ---\n{header}\n" + "\n".join(line for _, line in rows) + "\n"
+    metadata = {"sheet": sheet_name, "row_start": rows[0][0], "row_end": rows[-1][0]}
+    return DocumentSegment(text, metadata, header=header, rows=rows)
+
+def _iter_xlsx(source: DocumentSource) -> Iterator[DocumentSegment]:
+    """Streams the rows of an XLSX file in batches, without loading whole sheets."""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = enumerate(sheet.iter_rows(values_only=True), start=1)
+            yield from _iter_sheet_rows(sheet.title, rows)
+    finally:
+        workbook.close()
+
+def _iter_xls(source: DocumentSource) -> Iterator[DocumentSegment]:
+    """Yields the rows of a legacy XLS file in batches, loading one sheet at a time."""
+    if isinstance(source, (str, os.PathLike)):
+        workbook = xlrd.open_workbook(os.fspath(source), on_demand=True)
+    else:
+        workbook = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+
+    def row_values(sheet, index: int) -> List[Any]:
+        values = []
+        for cell in sheet.row(index):
+            if cell.ctype == xlrd.XL_CELL_DATE:
+                values.append(xlrd.xldate.xldate_as_datetime(cell.value, workbook.datemode))
+            else:
+                values.append(cell.value)
+        return values
+
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            rows = ((i + 1, row_values(sheet, i)) for i in range(sheet.nrows))
+            yield from _iter_sheet_rows(sheet.name, rows)
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+def _iter_lines(lines) -> Iterator[DocumentSegment]:
+    block, block_size, first_line = [], 0, 1
+    for line_number, line in enumerate(lines, start=1):
+        if not block:
+            first_line = line_number
+        block.append(line)
+        block_size += len(line)
+        if block_size >= SEGMENT_CHARS:
+            yield DocumentSegment("".join(block), {"line": first_line})
+            block, block_size = [], 0
+    if block:
+        yield DocumentSegment("".join(block), {"line": first_line})
+
+def _iter_txt(source: DocumentSource) -> Iterator[DocumentSegment]:
+    """Yields the text of a plain text file in blocks of lines."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from _iter_lines(f)
+        return
+    reader = io.TextIOWrapper(source, encoding='utf-8')
+    try:
+        yield from _iter_lines(reader)
+    finally:
+        # Leave the caller's file object open
+        reader.detach()
+
+LOADER_MAPPING: Dict[str, Callable[[DocumentSource], Iterator[DocumentSegment]]] = {
+    ".pdf": _iter_pdf,
+    ".docx": _iter_docx,
+    ".xlsx": _iter_xlsx,
+    ".xls": _iter_xls,
+    ".txt": _iter_txt,
 }
 
-def load_document_text(file_path: str, original_filename: str) -> str:
+def iter_document_segments(source: DocumentSource, original_filename: str) -> Iterator[DocumentSegment]:
     """
-    Detects file type from the original filename and extracts text using the appropriate loader.
+    Detects file type from the original filename and lazily yields the document's segments
+    (PDF pages, DOCX paragraph blocks, spreadsheet row batches, text line blocks).
+    `source` can be a path or an open binary file-like object.
     """
     _, file_extension = os.path.splitext(original_filename)
     ext_lower = file_extension.lower()
@@ -56,8 +166,15 @@ def load_document_text(file_path: str, original_filename: str) -> str:
         raise ValueError(f"Unsupported file type: {ext_lower}")
 
     loader_func = LOADER_MAPPING[ext_lower]
-    
+
     try:
-        return loader_func(file_path)
+        yield from loader_func(source)
     except Exception as e:
         raise RuntimeError(f"Error processing file '{original_filename}': {e}")
+
+def load_document_text(source: DocumentSource, original_filename: str) -> str:
+    """
+    Detects file type from the original filename and extracts the whole text.
+    `source` can be a path or an open binary file-like object.
+    """
+    return "".join(segment.text for segment in iter_document_segments(source, original_filename))
@@ -0,0 +1,276 @@
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, TextIO, Tuple, Union
+from processing.ingest_worker import parse_and_chunk
+from processing.chunker import Chunk, configure_chunking, get_chunking_config
+from processing.embedder import embed_texts
+from processing.registry import (
+    UPLOAD_DIR,
+    chunk_owners,
+    get_processed_file,
+    referenced_chunk_hashes,
+    unreferenced_chunk_hashes
+)
+from processing.vector_store import vector_store_instance
+
+DEFAULT_PARSE_WORKERS = 2
+
+parse_pool: Optional[ProcessPoolExecutor] = None
+embedding_executor: Optional[ThreadPoolExecutor] = None
+
+def start_pipeline(parse_workers: int = DEFAULT_PARSE_WORKERS):
+    """
+    Starts the ingestion workers: a process pool for the CPU-bound parsing and chunking,
+    and a single embedding thread that owns the embedding model.
+    Calling it again once the workers are running has no effect.
+    """
+    global parse_pool, embedding_executor
+    if parse_pool is None:
+        # Spawn instead of fork: the parent may already hold torch/tokenizer threads.
+        parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            # Spawned workers start from the defaults, so hand them this process's chunking settings
+            initializer=configure_chunking,
+            initargs=get_chunking_config()
+        )
+    if embedding_executor is None:
+        embedding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+
+def shutdown_pipeline():
+    """Stops the ingestion workers."""
+    global parse_pool, embedding_executor
+    if parse_pool is not None:
+        parse_pool.shutdown(wait=False, cancel_futures=True)
+        parse_pool = None
+    if embedding_executor is not None:
+        embedding_executor.shutdown(wait=False, cancel_futures=True)
+        embedding_executor = None
+
+@contextlib.contextmanager
+def _chunk_spool() -> Iterator[Path]:
+    """
+    A temporary file in the uploads directory that a parse worker writes a document's
+    chunks to (see parse_and_chunk); it is deleted on exit, or by the storage compactor
+    if the process dies meanwhile.
+    """
+    fd, name = tempfile.mkstemp(prefix="chunks-", suffix=".tmp", dir=UPLOAD_DIR)
+    os.close(fd)
+    path = Path(name)
+    try:
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+async def _parse_document(payload: Union[str, bytes], original_filename: str, spool_path: Path) -> List[str]:
+    """
+    Parses and chunks a document in the process pool, writing the chunks to `spool_path`.
+    Returns the chunk hashes.
+    """
+    global parse_pool
+    start_pipeline()
+    loop = asyncio.get_running_loop()
+    pool = parse_pool
+    try:
+        hashes = await loop.run_in_executor(pool, parse_and_chunk, payload, original_filename, str(spool_path))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for running out of memory); the pool is unusable from
+        # now on, so replace it for the next documents before reporting the failure.
+        if parse_pool is pool:
+            pool.shutdown(wait=False)
+            parse_pool = None
+            start_pipeline()
+        raise RuntimeError(f"The worker parsing '{original_filename}' terminated unexpectedly.")
+    if not hashes:
+        raise ValueError("No text could be extracted from the document.")
+    return hashes
+
+def _read_chunks(spool: TextIO, count: int) -> List[Chunk]:
+    """Reads the next `count` chunks (fewer at the end) from a chunk spool file."""
+    return [tuple(json.loads(line)) for line in itertools.islice(spool, count)]
+
+async def _store_missing_chunks(
+    spool_path: Path,
+    hashes: List[str],
+    original_filename: str,
+    file_id: str,
+    report: Callable[..., Awaitable[None]]
+) -> Tuple[int, int]:
+    """
+    Embeds and stores the chunks that no document has stored yet.
+    Returns how many distinct chunks were already stored and how many were embedded.
+
+    The chunks are read back from the spool file in batches of the vector store's write
+    batch size, so only a batch or two of the document is held in memory at a time. The
+    two steps are pipelined: while one batch is written to the vector store, the next
+    one is read and embedded.
+    """
+    loop = asyncio.get_running_loop()
+    batch_size = vector_store_instance.write_batch_size
+    seen: Set[str] = set()
+    embedded = 0
+    pending_write: Optional[asyncio.Future] = None
+    try:
+        with open(spool_path, "r", encoding="utf-8") as spool:
+            for start in range(0, len(hashes), batch_size):
+                chunks = await loop.run_in_executor(None, _read_chunks, spool, batch_size)
+                unique_chunks: Dict[str, Chunk] = {}
+                for h, chunk in zip(hashes[start:start + batch_size], chunks):
+                    if h not in seen:
+                        seen.add(h)
+                        unique_chunks[h] = chunk
+                if not unique_chunks:
+                    continue
+                existing = await loop.run_in_executor(None, vector_store_instance.get_existing_ids, list(unique_chunks))
+                batch = [(h, chunk) for h, chunk in unique_chunks.items() if h not in existing]
+                if not batch:
+                    continue
+
+                texts = [text for _, (text, _) in batch]
+                embeddings = await loop.run_in_executor(embedding_executor, embed_texts, texts)
+                metadatas = [
+                    {**location, "filename": original_filename, "file_id": file_id, "chunk_hash": h}
+                    for h, (_, location) in batch
+                ]
+                if pending_write is not None:
+                    await pending_write
+                pending_write = loop.run_in_executor(
+                    None, vector_store_instance.add_documents, texts, embeddings, metadatas, [h for h, _ in batch]
+                )
+                embedded += len(batch)
+        await report("embedded")
+        if pending_write is not None:
+            await pending_write
+    except BaseException:
+        # Do not leave a write running behind the caller's cleanup
+        if pending_write is not None:
+            await asyncio.gather(pending_write, return_exceptions=True)
+        raise
+    return len(seen) - embedded, embedded
+
+def _reporter(on_progress: Optional[Callable[..., None]]) -> Callable[..., Awaitable[None]]:
+    # Progress callbacks write the job and file registries, so they run off the event loop
+    async def report(stage: str, **details):
+        if on_progress is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, functools.partial(on_progress, stage, **details))
+    return report
+
+async def ingest_document(
+    payload: Union[str, bytes],
+    original_filename: str,
+    file_id: str,
+    on_progress: Optional[Callable[..., None]] = None
+) -> Dict:
+    """
+    Parses, chunks, embeds and stores one document without blocking the event loop.
+
+    `payload` is a path to the document or its raw bytes (see SpooledUpload.payload).
+    `on_progress(stage, **details)` is called in a worker thread as the document reaches
+    each stage ("parsed", "chunked", "embedded", "stored"). Parsing and chunking run as a
+    single worker call, so those two stages are reported together; "chunked" carries the
+    document's `chunk_hashes`, which should be recorded before anything is stored.
+
+    Chunks are content-addressed: a chunk already in the vector store (e.g. a disclaimer
+    shared with another document) is referenced instead of being embedded and stored again.
+
+    Returns {"chunks_added": <chunks in the document>, "chunks_reused": <distinct chunks that
+    were already stored>}, or raises ValueError if the document has no text.
+    """
+    report = _reporter(on_progress)
+
+    with _chunk_spool() as spool_path:
+        hashes = await _parse_document(payload, original_filename, spool_path)
+        await report("parsed")
+        await report("chunked", chunk_hashes=hashes)
+
+        reused, _ = await _store_missing_chunks(spool_path, hashes, original_filename, file_id, report)
+    await report("stored")
+    return {"chunks_added": len(hashes), "chunks_reused": reused}
+
+async def update_document(
+    payload: Union[str, bytes],
+    original_filename: str,
+    file_id: str,
+    previous_hashes: List[str],
+    on_progress: Optional[Callable[..., None]] = None
+) -> Dict:
+    """
+    Re-ingests a new revision of a tracked document incrementally.
+
+    The new revision is chunked and its chunk hashes are diffed against `previous_hashes`,
+    the chunks the document held so far. Only chunks that are not stored yet are embedded
+    and written, and chunks dropped from the document are deleted unless another
+    document still refers to them.
+
+    Progress is reported like ingest_document; "chunked" carries the union of the old
+    and new hashes (so nothing in use can be deleted meanwhile) and "stored" the new ones.
+
+    Returns the number of chunks in the new revision, the counts of distinct chunks
+    reused, added and deleted, and how many chunks actually had to be embedded.
+    """
+    report = _reporter(on_progress)
+
+    with _chunk_spool() as spool_path:
+        hashes = await _parse_document(payload, original_filename, spool_path)
+        await report("parsed")
+        await report("chunked", chunk_hashes=list(dict.fromkeys(previous_hashes + hashes)))
+
+        _, embedded = await _store_missing_chunks(spool_path, hashes, original_filename, file_id, report)
+    await report("stored", chunk_hashes=hashes)
+
+    old = set(previous_hashes)
+    new = set(hashes)
+
+    removed = old - new
+    loop = asyncio.get_running_loop()
+    still_referenced = await loop.run_in_executor(None, referenced_chunk_hashes, file_id)
+    await loop.run_in_executor(
+        None, vector_store_instance.delete_chunks, [h for h in removed if h not in still_referenced]
+    )
+
+    return {
+        "chunks_total": len(hashes),
+        "chunks_reused": len(new & old),
+        "chunks_added": len(new - old),
+        "chunks_deleted": len(removed),
+        "chunks_embedded": embedded
+    }
+
+def release_document_chunks(file_id: str) -> int:
+    """
+    Deletes the vectors of a tracked file that no other tracked file refers to.
+    Must be called before the file is removed from the registry.
+    Returns the number of chunks deleted.
+    """
+    entry = get_processed_file(file_id)
+    if entry is None:
+        return 0
+    if not entry.get("chunk_hashes") and not entry.get("content_hash"):
+        # Files ingested before chunks were content-addressed are keyed by file_id
+        vector_store_instance.delete_documents(file_id)
+        return entry.get("chunks_added", 0)
+    unreferenced = unreferenced_chunk_hashes(file_id)
+    vector_store_instance.delete_chunks(unreferenced)
+
+    # Chunks shared with other files stay; those first stored for this file are handed
+    # over to another file, so that search results stop naming this one
+    released = set(unreferenced)
+    shared = [h for h in dict.fromkeys(entry.get("chunk_hashes", [])) if h not in released]
+    owners = chunk_owners(shared, exclude_file_id=file_id)
+    reassigned = {}
+    for chunk_id, metadata in vector_store_instance.get_chunk_metadatas(shared).items():
+        owner = owners.get(chunk_id)
+        if owner is not None and metadata.get("file_id") == file_id:
+            reassigned[chunk_id] = {**metadata, "file_id": owner["file_id"], "filename": owner["filename"]}
+    vector_store_instance.update_chunk_metadatas(reassigned)
+    return len(unreferenced)
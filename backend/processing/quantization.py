@@ -0,0 +1,241 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+
+# Vectors needed before the quantizer is fitted; until then searches scan the float32 vectors
+TRAIN_MIN_VECTORS = 1024
+# Vectors sampled to fit the quantizer
+TRAIN_SAMPLE_SIZE = 50000
+# Rows converted to float32 at a time while scanning the codes
+SCAN_BLOCK_ROWS = 2048
+
+class ScalarQuantizer:
+    """
+    Maps float32 vectors to int8 codes, optionally after a PCA projection to `pca_dim` dimensions.
+
+    Each code dimension has its own scale, chosen so that 99.9% of the training values
+    fit into [-127, 127]. Dot products with a query are approximated by
+    codes @ query_weights(query); with PCA this is the dot product up to a constant per
+    query, which does not change the ranking.
+    """
+
+    def __init__(self, pca_dim: int = 0):
+        self.pca_dim = pca_dim
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def code_dim(self) -> int:
+        return len(self.scale)
+
+    def fit(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if 0 < self.pca_dim < vectors.shape[1]:
+            self.mean = vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+            self.components = np.ascontiguousarray(vt[:self.pca_dim], dtype=np.float32)
+        else:
+            self.mean = np.zeros(vectors.shape[1], dtype=np.float32)
+            self.components = None
+        scale = np.percentile(np.abs(self.project(vectors)), 99.9, axis=0) / 127
+        self.scale = np.maximum(scale, 1e-8).astype(np.float32)
+        return self
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        if self.components is None:
+            return vectors
+        return (vectors - self.mean) @ self.components.T
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint(self.project(np.asarray(vectors, dtype=np.float32)) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def query_weights(self, query: np.ndarray) -> np.ndarray:
+        projected = query if self.components is None else self.components @ query
+        return (projected * self.scale).astype(np.float32)
+
+    def save(self, path: Path):
+        arrays = {"mean": self.mean, "scale": self.scale, "pca_dim": np.array(self.pca_dim)}
+        if self.components is not None:
+            arrays["components"] = self.components
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "ScalarQuantizer":
+        with np.load(path) as data:
+            quantizer = cls(int(data["pca_dim"]))
+            quantizer.mean = data["mean"]
+            quantizer.scale = data["scale"]
+            quantizer.components = data["components"] if "components" in data else None
+        return quantizer
+
+class CodeScan(NamedTuple):
+    """
+    The quantizer and codes of a CompressedVectors at one point in time. The codes are
+    never truncated in place, so a scan stays valid after the backend lock is released.
+    """
+    quantizer: ScalarQuantizer
+    codes: np.memmap
+    rescore_candidates: int
+
+    def candidates(self, query: np.ndarray, live: np.ndarray, n: int) -> np.ndarray:
+        """Returns the slots of the `n` live vectors with the highest approximate scores; `live` covers the rows to scan."""
+        size = len(live)
+        weights = self.quantizer.query_weights(query)
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, size)
+            scores[start:end] = self.codes[start:end].astype(np.float32) @ weights
+        scores[~live] = -np.inf
+        n = min(n, size)
+        return np.argpartition(-scores, n - 1)[:n]
+
+class CompressedVectors:
+    """
+    int8 codes of the vectors stored by a local backend, one row per slot.
+
+    Searches scan the codes (a quarter of the float32 size, less with PCA) to pick
+    `rescore_candidates` candidates, whose float32 vectors are then read back to compute
+    the exact scores. The codes are stamped with the write generation of the record
+    store and re-encoded from the float32 vectors if they are stale.
+    """
+
+    def __init__(self, directory: Path, pca_dim: int = 0, rescore_candidates: int = 100):
+        self.directory = Path(directory)
+        self.pca_dim = pca_dim
+        self.rescore_candidates = rescore_candidates
+        self.quantizer_path = self.directory / "quantizer.npz"
+        self.codes_path = self.directory / "codes.i8"
+        self.state_path = self.directory / "codes.json"
+        self.quantizer: Optional[ScalarQuantizer] = None
+        self._codes: Optional[np.memmap] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.quantizer is not None
+
+    def _open_codes(self, capacity: int):
+        expected_size = capacity * self.quantizer.code_dim
+        with open(self.codes_path, "ab") as f:
+            if f.tell() < expected_size:
+                f.truncate(expected_size)
+        self._codes = np.memmap(
+            self.codes_path, dtype=np.int8, mode="r+", shape=(capacity, self.quantizer.code_dim)
+        )
+
+    def _write_state(self, generation: int):
+        self._codes.flush()
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"generation": generation, "pca_dim": self.pca_dim}))
+        tmp_path.replace(self.state_path)
+
+    def _encode_all(self, matrix: np.ndarray, size: int, generation: int):
+        for start in range(0, size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, size)
+            self._codes[start:end] = self.quantizer.encode(matrix[start:end])
+        self._write_state(generation)
+
+    def open(self, matrix: np.ndarray, size: int, generation: int):
+        """Loads a quantizer fitted earlier, re-encoding the vectors if the codes are stale."""
+        if not self.quantizer_path.exists():
+            return
+        quantizer = ScalarQuantizer.load(self.quantizer_path)
+        if quantizer.pca_dim != self.pca_dim:
+            return
+        self.quantizer = quantizer
+        self._open_codes(matrix.shape[0])
+        state = {}
+        if self.state_path.exists():
+            try:
+                state = json.loads(self.state_path.read_text())
+            except (json.JSONDecodeError, IOError):
+                state = {}
+        if state.get("generation") != generation:
+            self._encode_all(matrix, size, generation)
+
+    def train(self, matrix: np.ndarray, live: np.ndarray, size: int, generation: int):
+        """Fits the quantizer on (a sample of) the live vectors and encodes every vector."""
+        live_slots = np.flatnonzero(live[:size])
+        if len(live_slots) > TRAIN_SAMPLE_SIZE:
+            live_slots = np.sort(np.random.default_rng(0).choice(live_slots, TRAIN_SAMPLE_SIZE, replace=False))
+        self.quantizer = ScalarQuantizer(self.pca_dim).fit(matrix[live_slots])
+        self.quantizer.save(self.quantizer_path)
+        self._codes = None
+        self._open_codes(matrix.shape[0])
+        self._encode_all(matrix, size, generation)
+
+    def resize(self, capacity: int):
+        if self.trained:
+            self._codes.flush()
+            self._codes = None
+            self._open_codes(capacity)
+
+    def rebuild(self, matrix: np.ndarray, size: int, generation: int):
+        """Re-encodes every vector into a codes file sized to the matrix, e.g. after slots have moved."""
+        if not self.trained:
+            return
+        self._codes.flush()
+        self._codes = None
+        # A new file rather than truncating this one: searches may still be scanning it
+        self.codes_path.unlink()
+        self._open_codes(matrix.shape[0])
+        self._encode_all(matrix, size, generation)
+
+    def encode_compacted(self, matrix: np.ndarray, size: int) -> Optional[np.memmap]:
+        """
+        Encodes the first `size` rows of a compacted copy of the matrix into a new codes
+        file, to be swapped in by replace_codes. Returns None if not trained yet.
+        """
+        if not self.trained:
+            return None
+        path = self.codes_path.with_suffix(".i8.compact")
+        with open(path, "wb") as f:
+            f.truncate(matrix.shape[0] * self.quantizer.code_dim)
+        codes = np.memmap(path, dtype=np.int8, mode="r+", shape=(matrix.shape[0], self.quantizer.code_dim))
+        for start in range(0, size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, size)
+            codes[start:end] = self.quantizer.encode(matrix[start:end])
+        codes.flush()
+        return codes
+
+    def replace_codes(self, codes: np.memmap, capacity: int, generation: int):
+        """Replaces the codes with those of encode_compacted, sized for `capacity` slots."""
+        path = codes.filename
+        codes.flush()
+        del codes
+        self._codes.flush()
+        self._codes = None
+        os.replace(path, self.codes_path)
+        self._open_codes(capacity)
+        self._write_state(generation)
+
+    def write(self, slots: np.ndarray, vectors: np.ndarray, generation: int):
+        self._codes[slots] = self.quantizer.encode(vectors)
+        self._write_state(generation)
+
+    def mark_generation(self, generation: int):
+        """Records that a write which did not change any code (a deletion) happened."""
+        if self.trained:
+            self._write_state(generation)
+
+    def scan(self) -> Optional[CodeScan]:
+        """The current codes, to be scanned without the backend lock; None if not trained yet."""
+        if not self.trained:
+            return None
+        return CodeScan(self.quantizer, self._codes, self.rescore_candidates)
+
+    def stats(self, size: int) -> Dict:
+        if not self.trained:
+            return {"compression": "int8", "trained": False, "pca_dim": self.pca_dim}
+        return {
+            "compression": "int8",
+            "trained": True,
+            "pca_dim": self.pca_dim,
+            "code_dim": self.quantizer.code_dim,
+            "code_bytes": size * self.quantizer.code_dim,
+            "rescore_candidates": self.rescore_candidates,
+        }
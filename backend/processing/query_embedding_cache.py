@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 3600.0
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace do not change the embedding of the (uncased) model."""
+    return " ".join(query.lower().split())
+
+class QueryEmbeddingCache:
+    """
+    An in-process LRU cache of query embeddings, keyed by model and normalized query text.
+    Entries expire `ttl_seconds` after they were stored.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS):
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            self._evict()
+
+    def get(self, model_id: str, query: str) -> Optional[np.ndarray]:
+        key = (model_id, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model_id: str, query: str, embedding: np.ndarray):
+        if self.max_entries == 0:
+            return
+        # Keep a read-only copy: callers share the cached array
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.flags.writeable = False
+        with self._lock:
+            key = (model_id, normalize_query(query))
+            self._entries[key] = (embedding, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+query_embedding_cache = QueryEmbeddingCache()
@@ -0,0 +1,244 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+# Uploads directory
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# File tracking system
+PROCESSED_FILES_DB = UPLOAD_DIR / "processed_files.json"
+# The chunk hashes of each tracked file, one JSON list per file, kept out of
+# PROCESSED_FILES_DB so that status updates do not rewrite every file's chunk list
+CHUNK_HASHES_DIR = UPLOAD_DIR / "chunk_hashes"
+
+# Lifecycle of a tracked file. Ingestion moves a file through the stages in order;
+# a file that fails is removed from the registry rather than kept as "failed".
+FILE_STAGES = ["queued", "parsed", "chunked", "embedded", "stored"]
+COMPLETED_STATUS = "completed"
+
+_db_lock = threading.RLock()
+# Files this process is ingesting right now; the storage compactor leaves their entries alone
+_ingesting: Set[str] = set()
+
+def load_processed_files() -> Dict:
+    """
+    Load the processed files database from JSON file.
+    The entries do not include the files' chunk hashes; see get_chunk_hashes.
+    """
+    with _db_lock:
+        if PROCESSED_FILES_DB.exists():
+            try:
+                with open(PROCESSED_FILES_DB, 'r') as f:
+                    db = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error loading processed files database: {e}")
+                return {"files": []}
+            if any("chunk_hashes" in entry for entry in db["files"]):
+                _migrate_chunk_hashes(db)
+            return db
+        return {"files": []}
+
+def _migrate_chunk_hashes(db: Dict):
+    """Moves chunk hashes stored inline by earlier versions to CHUNK_HASHES_DIR."""
+    for entry in db["files"]:
+        hashes = entry.pop("chunk_hashes", None)
+        if hashes:
+            set_chunk_hashes(entry["file_id"], hashes)
+    save_processed_files(db)
+
+def save_processed_files(data: Dict):
+    """Save the processed files database to JSON file."""
+    with _db_lock:
+        try:
+            # Write to a temporary file first so a crash never leaves a truncated database
+            tmp_path = PROCESSED_FILES_DB.with_suffix(".json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, PROCESSED_FILES_DB)
+        except IOError as e:
+            print(f"Error saving processed files database: {e}")
+
+def _find_duplicate(db: Dict, filename: str, content_hash: Optional[str]) -> Optional[Dict]:
+    return next(
+        (f for f in db["files"]
+         if f["filename"] == filename or (content_hash and f.get("content_hash") == content_hash)),
+        None
+    )
+
+def find_duplicate_file(filename: str, content_hash: Optional[str] = None) -> Optional[Dict]:
+    """Return the tracked file with the same name or the same content hash, if any."""
+    return _find_duplicate(load_processed_files(), filename, content_hash)
+
+def add_processed_file(
+    filename: str,
+    file_id: str,
+    file_size: int,
+    chunks_added: int = 0,
+    status: str = COMPLETED_STATUS,
+    job_id: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> bool:
+    """
+    Add a file to the tracking database.
+    Returns False if a file with that name or that content hash is already tracked.
+    """
+    with _db_lock:
+        db = load_processed_files()
+
+        # Check if file already exists by filename or content (avoid duplicates)
+        if _find_duplicate(db, filename, content_hash):
+            print(f"File already exists in tracking database: {filename}")
+            return False  # File already tracked
+
+        new_file = {
+            "file_id": file_id,
+            "filename": filename,
+            "file_size": file_size,
+            "upload_time": time.time(),
+            "chunks_added": chunks_added,
+            "status": status,
+            "job_id": job_id,
+            "content_hash": content_hash
+        }
+
+        db["files"].append(new_file)
+        save_processed_files(db)
+        print(f"Added file to tracking database: {filename}")
+        return True  # Successfully added
+
+def _chunk_hashes_path(file_id: str) -> Path:
+    return CHUNK_HASHES_DIR / f"{file_id}.json"
+
+def get_chunk_hashes(file_id: str) -> List[str]:
+    """Return the chunk hashes recorded for a file (empty if none were recorded)."""
+    try:
+        with open(_chunk_hashes_path(file_id), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Error loading chunk hashes of {file_id}: {e}")
+        return []
+
+def set_chunk_hashes(file_id: str, hashes: List[str]):
+    """Record the chunk hashes of a file."""
+    CHUNK_HASHES_DIR.mkdir(exist_ok=True)
+    path = _chunk_hashes_path(file_id)
+    try:
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(hashes, f)
+        os.replace(tmp_path, path)
+    except IOError as e:
+        print(f"Error saving chunk hashes of {file_id}: {e}")
+
+def get_processed_file(file_id: str) -> Optional[Dict]:
+    """Return the tracking entry for a file, with its `chunk_hashes`, or None if it is not tracked."""
+    db = load_processed_files()
+    entry = next((f for f in db["files"] if f["file_id"] == file_id), None)
+    if entry is not None:
+        entry["chunk_hashes"] = get_chunk_hashes(file_id)
+    return entry
+
+def update_processed_file(file_id: str, **fields) -> bool:
+    """
+    Update fields of a tracked file. Returns False if the file is not tracked.
+    `chunk_hashes` is recorded with set_chunk_hashes instead of in the database.
+    """
+    with _db_lock:
+        db = load_processed_files()
+        entry = next((f for f in db["files"] if f["file_id"] == file_id), None)
+        if entry is None:
+            return False
+        if "chunk_hashes" in fields:
+            set_chunk_hashes(file_id, fields.pop("chunk_hashes"))
+        entry.update(fields)
+        save_processed_files(db)
+        return True
+
+def referenced_chunk_hashes(exclude_file_id: Optional[str] = None) -> Set[str]:
+    """Return every chunk hash referred to by a tracked file, optionally ignoring one file."""
+    db = load_processed_files()
+    return {
+        chunk
+        for f in db["files"] if f["file_id"] != exclude_file_id
+        for chunk in get_chunk_hashes(f["file_id"])
+    }
+
+def chunk_owners(hashes: List[str], exclude_file_id: Optional[str] = None) -> Dict[str, Dict]:
+    """Maps each of the given chunk hashes to a tracked file that refers to it, optionally ignoring one file."""
+    wanted = set(hashes)
+    owners: Dict[str, Dict] = {}
+    for f in load_processed_files()["files"]:
+        if f["file_id"] == exclude_file_id:
+            continue
+        for chunk in get_chunk_hashes(f["file_id"]):
+            if chunk in wanted and chunk not in owners:
+                owners[chunk] = f
+    return owners
+
+def unreferenced_chunk_hashes(file_id: str) -> List[str]:
+    """
+    Return the chunk hashes of a file that no other tracked file refers to,
+    i.e. the chunks that can be dropped from the vector store along with the file.
+    """
+    entry = get_processed_file(file_id)
+    if entry is None:
+        return []
+    referenced = referenced_chunk_hashes(exclude_file_id=file_id)
+    return [chunk for chunk in dict.fromkeys(entry.get("chunk_hashes", [])) if chunk not in referenced]
+
+def remove_processed_file(file_id: str) -> bool:
+    """Remove a processed file from the tracking database."""
+    with _db_lock:
+        db = load_processed_files()
+        original_count = len(db["files"])
+
+        # Remove the file with matching file_id
+        db["files"] = [f for f in db["files"] if f["file_id"] != file_id]
+
+        if len(db["files"]) < original_count:
+            save_processed_files(db)
+            _chunk_hashes_path(file_id).unlink(missing_ok=True)
+            print(f"Removed file from tracking database: {file_id}")
+            return True
+        return False
+
+def start_ingestion(file_id: str):
+    """
+    Marks a file as being ingested by this process. Call it before the file's entry is
+    added or leaves the completed status, and finish_ingestion once the entry is completed
+    or removed; see stale_file_entries.
+    """
+    with _db_lock:
+        _ingesting.add(file_id)
+
+def finish_ingestion(file_id: str):
+    with _db_lock:
+        _ingesting.discard(file_id)
+
+@contextlib.contextmanager
+def ingesting(file_id: str) -> Iterator[None]:
+    """Marks a file as being ingested for the duration of the block (see start_ingestion)."""
+    start_ingestion(file_id)
+    try:
+        yield
+    finally:
+        finish_ingestion(file_id)
+
+def stale_file_entries() -> List[Dict]:
+    """
+    Return the entries left in an ingestion stage that no ingestion is working on any
+    more, e.g. after a crash. The registry and the marks are read together, so an entry
+    that is being added or re-ingested is never returned.
+    """
+    with _db_lock:
+        return [
+            entry for entry in load_processed_files()["files"]
+            if entry.get("status", COMPLETED_STATUS) != COMPLETED_STATUS and entry["file_id"] not in _ingesting
+        ]
@@ -0,0 +1,121 @@
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+class SpooledUpload:
+    """
+    Holds an uploaded file while it is being processed.
+
+    The payload is kept in memory until it grows past `spool_max_size`, then it is
+    rolled over to a temporary file in `spool_dir`. The SHA-256 digest and the size
+    are computed while the data is written, so the payload never has to be re-read.
+    """
+
+    def __init__(self, filename: str, spool_max_size: int = SPOOL_MAX_SIZE, spool_dir: Optional[Path] = None):
+        self.filename = filename
+        self.size = 0
+        self.path: Optional[Path] = None
+        self._spool_max_size = spool_max_size
+        self._spool_dir = spool_dir
+        self._hasher = hashlib.sha256()
+        self._file: BinaryIO = io.BytesIO()
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of everything written so far."""
+        return self._hasher.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the payload is still held in memory."""
+        return self.path is None
+
+    def write(self, data: bytes):
+        """Appends a piece of the payload, rolling over to disk if it gets too large."""
+        if self.path is None and self.size + len(data) > self._spool_max_size:
+            self._rollover()
+        self._file.write(data)
+        self._hasher.update(data)
+        self.size += len(data)
+
+    def _rollover(self):
+        """Moves the in-memory payload to a temporary file on disk."""
+        _, file_extension = os.path.splitext(self.filename or "")
+        fd, name = tempfile.mkstemp(prefix="upload-", suffix=file_extension.lower(), dir=self._spool_dir)
+        disk_file = os.fdopen(fd, "w+b")
+        disk_file.write(self._file.getvalue())
+        self._file.close()
+        self._file = disk_file
+        self.path = Path(name)
+
+    def payload(self) -> Union[str, bytes]:
+        """
+        Returns the payload in a form that can be handed to another process:
+        the spool file path if it was rolled over to disk, otherwise the raw bytes.
+        """
+        if self.path is not None:
+            self._file.flush()
+            return str(self.path)
+        return self._file.getvalue()
+
+    def open(self) -> BinaryIO:
+        """Returns the payload as a readable file-like object positioned at the start."""
+        self._file.flush()
+        self._file.seek(0)
+        return self._file
+
+    def persist(self, destination: Path):
+        """Moves the payload to `destination` and releases the buffer."""
+        if self.path is not None:
+            self._file.close()
+            os.replace(self.path, destination)
+            self.path = None
+        else:
+            with open(destination, "wb") as f:
+                f.write(self._file.getvalue())
+            self._file.close()
+
+    def close(self):
+        """Releases the buffer and removes the spool file, if any."""
+        self._file.close()
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+async def spool_upload(
+    upload,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    spool_max_size: int = SPOOL_MAX_SIZE,
+    spool_dir: Optional[Path] = None
+) -> SpooledUpload:
+    """
+    Copies an uploaded file (anything with an async `read(size)`, e.g. FastAPI's UploadFile)
+    into a SpooledUpload in fixed-size pieces.
+
+    Raises ValueError as soon as the payload grows past `max_size` bytes.
+    """
+    spooled = SpooledUpload(upload.filename, spool_max_size=spool_max_size, spool_dir=spool_dir)
+    try:
+        while True:
+            data = await upload.read(chunk_size)
+            if not data:
+                break
+            if spooled.size + len(data) > max_size:
+                raise ValueError(f"File exceeds the maximum upload size of {max_size // (1024 * 1024)} MB")
+            spooled.write(data)
+    except Exception:
+        spooled.close()
+        raise
+    return spooled
@@ -0,0 +1,1103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from processing.quantization import TRAIN_MIN_VECTORS, CodeScan, CompressedVectors
+
+# SQLite limits the number of parameters of one statement
+_SQL_BATCH = 500
+# Compaction copies vectors and returns free pages of the record store in steps of this
+# size, taking the backend lock only for one step at a time
+_COMPACTION_COPY_ROWS = 10000
+_VACUUM_STEP_PAGES = 256
+# PRAGMA auto_vacuum value of incremental auto-vacuum
+_INCREMENTAL_VACUUM = 2
+
+def _empty_result() -> Dict:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+def _merge_results(results: List[Dict]) -> Dict:
+    """Combines single-query results into one result with a list per query."""
+    merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for result in results:
+        for key in merged:
+            merged[key].extend(result[key])
+    return merged
+
+def _directory_bytes(directory: Path) -> int:
+    return sum(path.stat().st_size for path in Path(directory).rglob("*") if path.is_file())
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+class _SearchSnapshot(NamedTuple):
+    """What an exact search scores, taken under the backend lock and scanned without it."""
+    matrix: np.ndarray
+    live: np.ndarray
+    generation: int
+    compactions: int
+    codes: Optional[CodeScan]
+
+class VectorBackend:
+    """
+    Stores chunk vectors with their text and metadata and finds the nearest ones.
+
+    Query results use Chroma's layout: {"ids", "documents", "metadatas", "distances"},
+    each a list holding one list per query vector.
+    """
+
+    name = "base"
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        """The most records a single add() accepts, or None if there is no limit."""
+        return None
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        """Stores records; a record whose id is already stored is replaced, so retries are safe."""
+        raise NotImplementedError
+
+    def query(self, embedding: np.ndarray, n_results: int) -> Dict:
+        raise NotImplementedError
+
+    def query_many(self, embeddings: np.ndarray, n_results: int) -> Dict:
+        """Queries with each row of `embeddings`; the result holds one list per row."""
+        return _merge_results([self.query(embedding, n_results) for embedding in embeddings])
+
+    def get_existing_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def delete_file(self, file_id: str):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict]:
+        """Returns the metadata of the given records that exist, by id."""
+        raise NotImplementedError
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        """Replaces the metadata of existing records."""
+        raise NotImplementedError
+
+    def iter_ids(self, batch_size: int = 1000) -> Iterator[List[str]]:
+        """Yields the ids of all stored records, in batches."""
+        raise NotImplementedError
+
+    def compact(self, min_free_fraction: float = 0.25) -> Dict:
+        """
+        Reclaims the space of deleted records once they make up at least
+        `min_free_fraction` of the storage. Returns what was reclaimed.
+        """
+        return {"compacted": False, "reclaimed_bytes": 0}
+
+    def flush(self):
+        """Persists anything still held in memory."""
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "count": self.count()}
+
+    def reindex(self, space: str = "cosine", m: int = 16, ef_construction: int = 200, ef_search: int = 64) -> Dict:
+        """Rebuilds the search index with new parameters while the backend keeps serving."""
+        raise NotImplementedError
+
+# Distance spaces of Chroma's HNSW index; the local backends always use cosine
+CHROMA_SPACES = ("cosine", "l2", "ip")
+# Chroma's parameters for collections created without "hnsw:*" metadata
+_CHROMA_DEFAULT_PARAMS = {"space": "l2", "m": 16, "ef_construction": 100, "ef_search": 10}
+
+def _chroma_index_params(collection) -> Dict:
+    """Reads the space and HNSW parameters a collection was created with."""
+    hnsw = None
+    try:
+        hnsw = (collection.configuration or {}).get("hnsw")
+    except Exception:
+        pass
+    if hnsw:
+        return {
+            "space": hnsw.get("space", "l2"),
+            "m": hnsw.get("max_neighbors", 16),
+            "ef_construction": hnsw.get("ef_construction", 100),
+            "ef_search": hnsw.get("ef_search", 10),
+        }
+    metadata = collection.metadata or {}
+    return {
+        "space": metadata.get("hnsw:space", _CHROMA_DEFAULT_PARAMS["space"]),
+        "m": metadata.get("hnsw:M", _CHROMA_DEFAULT_PARAMS["m"]),
+        "ef_construction": metadata.get("hnsw:construction_ef", _CHROMA_DEFAULT_PARAMS["ef_construction"]),
+        "ef_search": metadata.get("hnsw:search_ef", _CHROMA_DEFAULT_PARAMS["ef_search"]),
+    }
+
+class ChromaBackend(VectorBackend):
+    """
+    A persistent ChromaDB collection.
+
+    New collections are created with the given distance space and HNSW parameters
+    ("hnsw:*" collection metadata). Distances are reported as cosine distances in every
+    space: embeddings have unit length, so squared L2 distance is twice the cosine
+    distance and inner-product distance equals it.
+
+    The collection in use is recorded in ACTIVE_FILE. reindex() copies it into a new
+    collection with other parameters while it keeps serving, then switches to the copy.
+    """
+
+    name = "chroma"
+    ACTIVE_FILE = "active_collections.json"
+    REINDEX_BATCH = 1000
+
+    def __init__(self, path: str, collection_name: str, space: str = "cosine", m: int = 16,
+                 ef_construction: int = 200, ef_search: int = 64):
+        import chromadb
+
+        if space not in CHROMA_SPACES:
+            raise ValueError(f"Unknown vector space: {space}")
+        self.path = Path(path)
+        self.collection_name = collection_name
+        self._lock = threading.RLock()
+        # Receives every write while a reindex copies the collection
+        self._reindex_target = None
+
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            name=self._active_name(), metadata=self._index_metadata(space, m, ef_construction, ef_search)
+        )
+        self.index_params = _chroma_index_params(self.collection)
+        built_params = {key: self.index_params[key] for key in ("space", "m", "ef_construction")}
+        if built_params != {"space": space, "m": m, "ef_construction": ef_construction}:
+            print(
+                f"Collection {self.collection.name} was built with {built_params}; "
+                "reindex it to apply the configured space and HNSW parameters"
+            )
+        if self.index_params["ef_search"] != ef_search:
+            self.set_ef(ef_search)
+
+    @staticmethod
+    def _index_metadata(space: str, m: int, ef_construction: int, ef_search: int) -> Dict:
+        return {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search}
+
+    def _read_active(self) -> Dict:
+        try:
+            return json.loads((self.path / self.ACTIVE_FILE).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _active_name(self) -> str:
+        return self._read_active().get(self.collection_name, self.collection_name)
+
+    def _write_active(self, name: str):
+        active = self._read_active()
+        active[self.collection_name] = name
+        tmp_path = self.path / (self.ACTIVE_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(active))
+        tmp_path.replace(self.path / self.ACTIVE_FILE)
+
+    def _to_cosine(self, result: Dict) -> Dict:
+        if self.index_params["space"] == "l2" and result.get("distances"):
+            result["distances"] = [[distance / 2 for distance in row] for row in result["distances"]]
+        return result
+
+    def set_ef(self, ef_search: int):
+        """
+        Records a new search ef in the collection's configuration. Chroma applies it when
+        the collection is next loaded (after a restart); reindex() applies it at once.
+        """
+        try:
+            self.collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+            self.index_params["ef_search"] = ef_search
+        except Exception as e:
+            print(f"Could not change the search ef of {self.collection.name}: {e}")
+
+    @property
+    def max_batch_size(self):
+        return self.client.get_max_batch_size()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            self.collection.upsert(embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids)
+            if self._reindex_target is not None:
+                self._reindex_target.upsert(embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids)
+
+    def query(self, embedding, n_results):
+        collection = self.collection
+        return self._to_cosine(collection.query(query_embeddings=embedding.reshape(1, -1), n_results=n_results))
+
+    def query_many(self, embeddings, n_results):
+        collection = self.collection
+        return self._to_cosine(collection.query(query_embeddings=embeddings, n_results=n_results))
+
+    def get_existing_ids(self, ids, batch_size: int = 1000):
+        existing = set()
+        for start in range(0, len(ids), batch_size):
+            result = self.collection.get(ids=ids[start:start + batch_size], include=[])
+            existing.update(result["ids"])
+        return existing
+
+    def delete(self, ids):
+        with self._lock:
+            self.collection.delete(ids=ids)
+            if self._reindex_target is not None:
+                self._reindex_target.delete(ids=ids)
+
+    def delete_file(self, file_id):
+        with self._lock:
+            self.collection.delete(where={"file_id": file_id})
+            if self._reindex_target is not None:
+                self._reindex_target.delete(where={"file_id": file_id})
+
+    def count(self):
+        return self.collection.count()
+
+    def get_metadatas(self, ids):
+        if not ids:
+            return {}
+        result = self.collection.get(ids=ids, include=["metadatas"])
+        return dict(zip(result["ids"], result["metadatas"]))
+
+    def update_metadatas(self, ids, metadatas):
+        with self._lock:
+            self.collection.update(ids=ids, metadatas=metadatas)
+            if self._reindex_target is not None:
+                self._reindex_target.update(ids=ids, metadatas=metadatas)
+
+    def iter_ids(self, batch_size: int = 1000):
+        ids = self.collection.get(include=[])["ids"]
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    def compact(self, min_free_fraction: float = 0.25):
+        # Chroma compacts its own segments; deleted records are dropped as it does
+        return {"compacted": False, "reclaimed_bytes": 0, "disk_bytes": _directory_bytes(self.path)}
+
+    def stats(self):
+        return {"backend": self.name, "count": self.count(), "collection": self.collection.name, **self.index_params}
+
+    def reindex(self, space: str = "cosine", m: int = 16, ef_construction: int = 200, ef_search: int = 64) -> Dict:
+        """
+        Rebuilds the collection with new index parameters, online.
+
+        A new collection is created and filled from the current one in batches; writes
+        made meanwhile go to both. Once the copy is complete, the new collection becomes
+        the active one (recorded atomically in ACTIVE_FILE) and the old one is dropped.
+        """
+        if space not in CHROMA_SPACES:
+            raise ValueError(f"Unknown vector space: {space}")
+        started = time.perf_counter()
+        with self._lock:
+            if self._reindex_target is not None:
+                raise RuntimeError("A reindex is already in progress")
+            source = self.collection
+            target = self.client.create_collection(
+                name=f"{self.collection_name}-{time.strftime('%Y%m%d%H%M%S')}",
+                metadata=self._index_metadata(space, m, ef_construction, ef_search)
+            )
+            self._reindex_target = target
+
+        try:
+            # Ids are read once; records deleted before their batch is copied are skipped,
+            # records added afterwards reach the target through the writes above
+            ids = source.get(include=[])["ids"]
+            for start in range(0, len(ids), self.REINDEX_BATCH):
+                with self._lock:
+                    batch = source.get(
+                        ids=ids[start:start + self.REINDEX_BATCH], include=["embeddings", "documents", "metadatas"]
+                    )
+                    if batch["ids"]:
+                        target.upsert(
+                            ids=batch["ids"], embeddings=batch["embeddings"],
+                            documents=batch["documents"], metadatas=batch["metadatas"]
+                        )
+
+            with self._lock:
+                self._write_active(target.name)
+                self.collection = target
+                self.index_params = _chroma_index_params(target)
+                self._reindex_target = None
+        except Exception:
+            with self._lock:
+                self._reindex_target = None
+            self.client.delete_collection(target.name)
+            raise
+
+        self.client.delete_collection(source.name)
+        return {
+            "backend": self.name,
+            "collection": target.name,
+            "records": target.count(),
+            "params": self.index_params,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+class ExactBackend(VectorBackend):
+    """
+    An in-process index with exact search.
+
+    Vectors are stored normalized, as rows ("slots") of a memory-mapped float32 matrix;
+    ids, texts and metadata live in a SQLite record store next to it. A query is one
+    matrix-vector product over all slots, so results are exact; distances are cosine
+    distances. Slots of deleted records are reused by later additions.
+
+    With `compression="int8"`, searches scan int8 codes of the vectors (optionally
+    PCA-reduced to `pca_dim` dimensions) and rescore the best `rescore_candidates`
+    with the float32 vectors; see CompressedVectors. The codes are fitted once
+    TRAIN_MIN_VECTORS vectors are stored.
+    """
+
+    name = "exact"
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, compression: str = "none", pca_dim: int = 0, rescore_candidates: int = 100):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.directory / "vectors.f32"
+        self.compacted_matrix_path = self.directory / "vectors.f32.compact"
+        self._lock = threading.RLock()
+        # Slots written while a compaction builds the new matrix, applied to it before the swap
+        self._compaction_writes: Optional[Set[int]] = None
+        # Compactions that moved records to other slots since the store was opened
+        self._compactions = 0
+
+        self._db = sqlite3.connect(str(self.directory / "records.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "id TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, file_id TEXT, document TEXT, metadata TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_file_id ON records (file_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        if self._db.execute("PRAGMA auto_vacuum").fetchone()[0] != _INCREMENTAL_VACUUM:
+            # Stores created before compaction reclaimed pages incrementally are rewritten once
+            self._db.execute("VACUUM")
+
+        dim = self._get_meta("dim")
+        self.dim: Optional[int] = int(dim) if dim else None
+        # Incremented by every write; lets derived structures tell whether they are stale
+        self.generation = int(self._get_meta("generation") or 0)
+        self._finish_compaction()
+
+        self._matrix: Optional[np.memmap] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._free_slots: List[int] = []
+        self._compressed: Optional[CompressedVectors] = None
+        if compression == "int8":
+            self._compressed = CompressedVectors(self.directory, pca_dim, rescore_candidates)
+        if self.dim is not None:
+            self._load_slots()
+            if self._compressed is not None:
+                self._compressed.open(self._matrix, self._size, self.generation)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _map_rows(self, path: Path, capacity: int) -> np.memmap:
+        expected_size = capacity * self.dim * 4
+        with open(path, "ab") as f:
+            if f.tell() < expected_size:
+                f.truncate(expected_size)
+        return np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _open_matrix(self, capacity: int):
+        self._matrix = self._map_rows(self.matrix_path, capacity)
+
+    def _finish_compaction(self):
+        """Completes or discards the matrix of a compaction interrupted by a crash."""
+        if not self.compacted_matrix_path.exists():
+            return
+        if self._get_meta("compacted_generation") == str(self.generation):
+            # The records already point at the compacted slots
+            os.replace(self.compacted_matrix_path, self.matrix_path)
+        else:
+            self.compacted_matrix_path.unlink()
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def _load_slots(self):
+        slots = [row[0] for row in self._db.execute("SELECT slot FROM records")]
+        self._size = max(slots) + 1 if slots else 0
+        file_rows = self.matrix_path.stat().st_size // (self.dim * 4) if self.matrix_path.exists() else 0
+        self._open_matrix(max(self.INITIAL_CAPACITY, self._size, file_rows))
+        self._live = np.zeros(self.capacity, dtype=bool)
+        self._live[slots] = True
+        self._free_slots = [slot for slot in range(self._size - 1, -1, -1) if not self._live[slot]]
+
+    def _grow(self):
+        capacity = max(self.INITIAL_CAPACITY, self.capacity * 2)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        self._open_matrix(capacity)
+        self._live = np.concatenate([self._live, np.zeros(capacity - len(self._live), dtype=bool)])
+        if self._compressed is not None:
+            self._compressed.resize(capacity)
+        self._on_grow(capacity)
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._size >= self.capacity:
+            self._grow()
+        self._size += 1
+        return self._size - 1
+
+    def _slots_for(self, column: str, values: Sequence) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(values), _SQL_BATCH):
+            batch = list(values[start:start + _SQL_BATCH])
+            placeholders = ",".join("?" * len(batch))
+            for record_id, slot in self._db.execute(
+                f"SELECT id, slot FROM records WHERE {column} IN ({placeholders})", batch
+            ):
+                found[record_id] = slot
+        return found
+
+    def _commit_write(self):
+        self.generation += 1
+        self._set_meta("generation", self.generation)
+        self._db.commit()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        """Adds records; a record whose id is already stored is replaced."""
+        if not ids:
+            return
+        vectors = _normalize_rows(embeddings)
+        # The last occurrence of a repeated id wins
+        positions = list({record_id: i for i, record_id in enumerate(ids)}.values())
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta("dim", self.dim)
+                self._open_matrix(self.INITIAL_CAPACITY)
+                self._live = np.zeros(self.capacity, dtype=bool)
+                self._on_grow(self.capacity)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+
+            existing = self._slots_for("id", [ids[i] for i in positions])
+            slots = [existing[ids[i]] if ids[i] in existing else self._allocate_slot() for i in positions]
+
+            # Vectors are written before the records that point at them
+            self._matrix[slots] = vectors[positions]
+            self._matrix.flush()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (id, slot, file_id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (ids[i], slot, metadatas[i].get("file_id"), documents[i], json.dumps(metadatas[i]))
+                    for i, slot in zip(positions, slots)
+                ]
+            )
+            self._commit_write()
+            self._live[slots] = True
+            if self._compaction_writes is not None:
+                self._compaction_writes.update(slots)
+            if self._compressed is not None:
+                if self._compressed.trained:
+                    self._compressed.write(np.array(slots), vectors[positions], self.generation)
+                elif self._live.sum() >= TRAIN_MIN_VECTORS:
+                    self._compressed.train(self._matrix, self._live, self._size, self.generation)
+            self._on_added(np.array(slots), vectors[positions])
+
+    def _delete_slots(self, found: Dict[str, int]):
+        if not found:
+            return
+        ids = list(found)
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            self._db.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(batch))})", batch)
+        self._commit_write()
+        if self._compressed is not None:
+            self._compressed.mark_generation(self.generation)
+        slots = list(found.values())
+        self._live[slots] = False
+        self._free_slots.extend(slots)
+        self._on_deleted(slots)
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete_slots(self._slots_for("id", ids))
+
+    def delete_file(self, file_id):
+        with self._lock:
+            self._delete_slots(self._slots_for("file_id", [file_id]))
+
+    def get_existing_ids(self, ids):
+        with self._lock:
+            return set(self._slots_for("id", ids))
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def get_metadatas(self, ids):
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), _SQL_BATCH):
+                batch = list(ids[start:start + _SQL_BATCH])
+                for record_id, metadata in self._db.execute(
+                    f"SELECT id, metadata FROM records WHERE id IN ({','.join('?' * len(batch))})", batch
+                ):
+                    found[record_id] = json.loads(metadata)
+        return found
+
+    def update_metadatas(self, ids, metadatas):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE records SET file_id = ?, metadata = ? WHERE id = ?",
+                [(metadata.get("file_id"), json.dumps(metadata), record_id) for record_id, metadata in zip(ids, metadatas)]
+            )
+            # Vectors are unchanged, so derived indexes stay valid
+            self._db.commit()
+
+    def iter_ids(self, batch_size: int = 1000):
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT id FROM records")]
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    def _capacity_for(self, size: int) -> int:
+        capacity = self.INITIAL_CAPACITY
+        while capacity < size:
+            capacity *= 2
+        return capacity
+
+    def compact(self, min_free_fraction: float = 0.25):
+        """
+        Moves the live vectors into a new matrix file of the smallest capacity that holds
+        them, with no free slots in between, and returns the free pages of the record
+        store to the file system.
+
+        The new matrix and the indexes derived from it are written while the backend keeps
+        serving. Writes made meanwhile are applied to them, and the records are moved to
+        their new slots, in one short step under the lock before the new files replace
+        the old ones.
+        """
+        with self._lock:
+            if self._matrix is None:
+                return {"compacted": False, "reclaimed_bytes": 0}
+            blocked = self._compaction_blocked()
+            if blocked:
+                return {"compacted": False, "reclaimed_bytes": 0, "detail": blocked}
+            free = self.capacity - int(self._live.sum())
+            if free == 0 or free < min_free_fraction * self.capacity:
+                return {"compacted": False, "reclaimed_bytes": 0, "free_slots": free}
+            disk_bytes = _directory_bytes(self.directory)
+            live_slots = np.flatnonzero(self._live[:self._size])
+            self._compaction_writes = set()
+
+        codes = None
+        try:
+            matrix = self._copy_compacted(live_slots)
+            codes = self._compressed.encode_compacted(matrix, len(live_slots)) if self._compressed is not None else None
+            built = self._build_compacted(matrix, len(live_slots))
+            with self._lock:
+                moved = self._swap_compacted(live_slots, matrix, codes, built)
+        finally:
+            with self._lock:
+                self._compaction_writes = None
+            # Left behind only if the compaction failed
+            for path in (self.compacted_matrix_path, Path(codes.filename) if codes is not None else None):
+                if path is not None and path.exists():
+                    path.unlink()
+
+        self._reclaim_record_pages()
+        return {
+            "compacted": True,
+            "moved_vectors": moved,
+            "capacity": self.capacity,
+            "reclaimed_bytes": max(0, disk_bytes - _directory_bytes(self.directory)),
+        }
+
+    def _compaction_blocked(self) -> Optional[str]:
+        """Why a compaction cannot start now, or None. Called with the lock held."""
+        if self._compaction_writes is not None:
+            return "A compaction is in progress"
+        return None
+
+    def _copy_compacted(self, live_slots: np.ndarray) -> np.memmap:
+        """Copies the given slots' vectors, in order, into a new matrix file."""
+        if self.compacted_matrix_path.exists():
+            self.compacted_matrix_path.unlink()
+        matrix = self._map_rows(self.compacted_matrix_path, self._capacity_for(len(live_slots)))
+        for start in range(0, len(live_slots), _COMPACTION_COPY_ROWS):
+            batch = live_slots[start:start + _COMPACTION_COPY_ROWS]
+            with self._lock:
+                vectors = np.array(self._matrix[batch])
+            matrix[start:start + len(batch)] = vectors
+        matrix.flush()
+        return matrix
+
+    def _swap_compacted(self, live_slots: np.ndarray, matrix: np.memmap, codes, built) -> int:
+        """
+        Applies the writes made since `live_slots` were copied to the new matrix, moves
+        the records to their new slots and swaps the new files in. Called with the lock
+        held; returns the number of records that moved.
+        """
+        # New slot of every old slot: the copied slots keep their order, slots that were
+        # filled during the compaction follow them
+        new_slots = np.full(self._size, -1, dtype=np.int64)
+        new_slots[live_slots] = np.arange(len(live_slots))
+        live = np.flatnonzero(self._live[:self._size])
+        added = live[new_slots[live] < 0]
+        new_slots[added] = len(live_slots) + np.arange(len(added))
+        deleted = new_slots[live_slots[~self._live[live_slots]]]
+        written = np.union1d(np.fromiter(self._compaction_writes, dtype=np.int64), added)
+        written = written[self._live[written]]
+        vectors = np.array(self._matrix[written])
+        size = len(live_slots) + len(added)
+        capacity = max(matrix.shape[0], self._capacity_for(size))
+
+        if capacity > matrix.shape[0]:
+            matrix.flush()
+            matrix = self._map_rows(self.compacted_matrix_path, capacity)
+        matrix[new_slots[written]] = vectors
+        matrix.flush()
+
+        # Copied records only move down, so moving them in ascending slot order never puts two
+        # records on one slot; records added meanwhile are parked on negative slots until then
+        moved = live[new_slots[live] != live]
+        is_added = np.zeros(self._size, dtype=bool)
+        is_added[added] = True
+        parked = [(-int(new_slots[old]) - 1, int(old)) for old in moved[is_added[moved]]]
+        direct = [(int(new_slots[old]), int(old)) for old in moved[~is_added[moved]]]
+        for pairs in (parked, direct):
+            for start in range(0, len(pairs), _SQL_BATCH):
+                self._db.executemany("UPDATE records SET slot = ? WHERE slot = ?", pairs[start:start + _SQL_BATCH])
+        if parked:
+            self._db.execute("UPDATE records SET slot = -slot - 1 WHERE slot < 0")
+        # Committed with the records: after a crash, the new matrix belongs to this generation
+        self._set_meta("compacted_generation", self.generation + 1)
+        self._commit_write()
+
+        self._matrix.flush()
+        self._matrix = None
+        os.replace(self.compacted_matrix_path, self.matrix_path)
+        self._open_matrix(capacity)
+        self._size = size
+        self._live = np.zeros(capacity, dtype=bool)
+        self._live[:size] = True
+        self._live[deleted] = False
+        self._free_slots = sorted((int(slot) for slot in deleted), reverse=True)
+        self._compactions += 1
+
+        if self._compressed is not None:
+            if codes is not None:
+                self._compressed.replace_codes(codes, capacity, self.generation)
+                if len(written):
+                    self._compressed.write(new_slots[written], vectors, self.generation)
+            elif self._compressed.trained:
+                # The codes were fitted during the compaction
+                self._compressed.rebuild(self._matrix, self._size, self.generation)
+        self._install_compacted(built, new_slots[written], vectors, deleted, capacity)
+        return len(moved)
+
+    def _reclaim_record_pages(self):
+        """Returns the record store's free pages to the file system, a few at a time."""
+        while True:
+            with self._lock:
+                if self._db.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    break
+                self._db.execute(f"PRAGMA incremental_vacuum({_VACUUM_STEP_PAGES})").fetchall()
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {
+                "backend": self.name,
+                "count": int(self._live.sum()),
+                "slots": self._size,
+                "capacity": self.capacity,
+                "dim": self.dim,
+                "vector_bytes": self.capacity * (self.dim or 0) * 4,
+            }
+            if self._compressed is not None:
+                stats.update(self._compressed.stats(self._size))
+            return stats
+
+    def _results(self, slots: Sequence[int], distances: Sequence[float]) -> Dict:
+        """Looks up the records of the given slots, keeping their order."""
+        slots = [int(slot) for slot in slots]
+        rows = {}
+        for start in range(0, len(slots), _SQL_BATCH):
+            batch = slots[start:start + _SQL_BATCH]
+            for slot, record_id, document, metadata in self._db.execute(
+                f"SELECT slot, id, document, metadata FROM records WHERE slot IN ({','.join('?' * len(batch))})", batch
+            ):
+                rows[slot] = (record_id, document, json.loads(metadata))
+
+        result = _empty_result()
+        for slot, distance in zip(slots, distances):
+            if slot not in rows:
+                continue
+            record_id, document, metadata = rows[slot]
+            result["ids"][0].append(record_id)
+            result["documents"][0].append(document)
+            result["metadatas"][0].append(metadata)
+            result["distances"][0].append(float(distance))
+        return result
+
+    def _search_snapshot(self) -> _SearchSnapshot:
+        """
+        Called with the lock held. The matrix is only ever grown or swapped for a new file,
+        never truncated, so the snapshot can be scanned after the lock is released.
+        """
+        return _SearchSnapshot(
+            self._matrix[:self._size],
+            self._live[:self._size].copy(),
+            self.generation,
+            self._compactions,
+            self._compressed.scan() if self._compressed is not None else None,
+        )
+
+    @staticmethod
+    def _score(snapshot: _SearchSnapshot, query: np.ndarray, n_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the slots of the best `n_results` live vectors of the snapshot, best first, and their scores."""
+        k = min(n_results, int(snapshot.live.sum()))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if snapshot.codes is not None:
+            candidates = snapshot.codes.candidates(query, snapshot.live, max(k, snapshot.codes.rescore_candidates))
+            candidates = np.sort(candidates[snapshot.live[candidates]])
+            # Exact scores of the candidates only
+            candidate_scores = snapshot.matrix[candidates] @ query
+            order = np.argsort(-candidate_scores)[:k]
+            return candidates[order], candidate_scores[order]
+        scores = snapshot.matrix @ query
+        scores[~snapshot.live] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def _snapshot_results(self, snapshot: _SearchSnapshot, query: np.ndarray, n_results: int,
+                          slots: np.ndarray, scores: np.ndarray) -> Dict:
+        """
+        Looks up the records of slots scored on `snapshot`. Called with the lock held; writes
+        made since the snapshot may have freed or refilled some of the slots, so these are
+        rescored, and after a compaction moved the records the search is repeated.
+        """
+        if snapshot.compactions != self._compactions:
+            slots, scores = self._score(self._search_snapshot(), query, n_results)
+        elif snapshot.generation != self.generation:
+            slots = slots[self._live[slots]]
+            scores = self._matrix[slots] @ query
+            order = np.argsort(-scores)
+            slots, scores = slots[order], scores[order]
+        return self._results(slots, 1.0 - scores)
+
+    def _exact_search(self, query: np.ndarray, n_results: int) -> Dict:
+        """Scans every stored vector; called with the lock held."""
+        slots, scores = self._score(self._search_snapshot(), query, n_results)
+        return self._results(slots, 1.0 - scores)
+
+    def query(self, embedding, n_results):
+        query = _normalize_rows(embedding)[0]
+        with self._lock:
+            if self._matrix is None:
+                return _empty_result()
+            snapshot = self._search_snapshot()
+        # Scored without the lock, so that searches run in parallel with each other and with writes
+        slots, scores = self._score(snapshot, query, n_results)
+        with self._lock:
+            return self._snapshot_results(snapshot, query, n_results, slots, scores)
+
+    def query_many(self, embeddings, n_results):
+        queries = _normalize_rows(embeddings)
+        with self._lock:
+            if self._matrix is None:
+                return _merge_results([_empty_result() for _ in queries])
+            snapshot = self._search_snapshot()
+
+        k = min(n_results, int(snapshot.live.sum()))
+        if k == 0 or snapshot.codes is not None:
+            ranked = [self._score(snapshot, query, n_results) for query in queries]
+        else:
+            # One matrix-matrix product over all slots for every query
+            scores = queries @ snapshot.matrix.T
+            scores[:, ~snapshot.live] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            ranked = []
+            for row, row_top in zip(scores, top):
+                row_top = row_top[np.argsort(-row[row_top])]
+                ranked.append((row_top, row[row_top]))
+
+        with self._lock:
+            return _merge_results([
+                self._snapshot_results(snapshot, query, n_results, slots, scores)
+                for query, (slots, scores) in zip(queries, ranked)
+            ])
+
+    def reindex(self, space="cosine", m=16, ef_construction=200, ef_search=64):
+        if space != "cosine":
+            raise ValueError(f"The {self.name} backend only supports the cosine space")
+        return {"backend": self.name, "reindexed": False, "detail": "Exact search has no index to rebuild"}
+
+    # Hooks for indexes built on top of the stored vectors
+    def _on_grow(self, capacity: int):
+        pass
+
+    def _on_added(self, slots: np.ndarray, vectors: np.ndarray):
+        pass
+
+    def _on_deleted(self, slots: List[int]):
+        pass
+
+    def _build_compacted(self, matrix: np.ndarray, size: int):
+        """Builds derived indexes over the first `size` rows of a compacted matrix, without the lock."""
+        return None
+
+    def _install_compacted(self, built, slots: np.ndarray, vectors: np.ndarray, deleted_slots: np.ndarray,
+                           capacity: int):
+        """
+        Applies the writes made during a compaction (`vectors` stored at `slots`, and
+        `deleted_slots` freed) to what _build_compacted returned and swaps it in.
+        Called with the lock held.
+        """
+
+class HnswBackend(ExactBackend):
+    """
+    An in-process approximate index: an hnswlib graph over the vectors of ExactBackend.
+
+    The vector matrix and the record store remain the source of truth. The graph is
+    saved at most every `save_interval` seconds (and on flush) together with the write
+    generation it reflects; a graph that is missing or older than the record store is
+    rebuilt from the stored vectors when the index is opened.
+    """
+
+    name = "hnsw"
+
+    def __init__(self, directory: str, m: int = 16, ef_construction: int = 200, ef_search: int = 64,
+                 save_interval: float = 30.0):
+        try:
+            import hnswlib
+        except ImportError:
+            raise RuntimeError("The hnsw vector backend requires the hnswlib package")
+        self._hnswlib = hnswlib
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.save_interval = save_interval
+        self._index = None
+        self._dirty = False
+        # Slots written while a reindex builds a new graph, replayed onto it before the swap
+        self._reindex_log: Optional[List] = None
+        self._last_save = time.monotonic()
+        super().__init__(directory)
+        self.index_path = self.directory / "hnsw.bin"
+        self.state_path = self.directory / "hnsw.json"
+        if self.dim is not None:
+            self._load_index()
+
+    def _params(self) -> Dict:
+        return {"m": self.m, "ef_construction": self.ef_construction}
+
+    def _load_index(self):
+        state = {}
+        if self.state_path.exists():
+            try:
+                state = json.loads(self.state_path.read_text())
+            except (json.JSONDecodeError, IOError):
+                state = {}
+        self._index = self._hnswlib.Index(space="cosine", dim=self.dim)
+        if (
+            self.index_path.exists()
+            and state.get("generation") == self.generation
+            and state.get("params") == self._params()
+        ):
+            self._index.load_index(str(self.index_path), max_elements=self.capacity)
+        else:
+            self._build_index()
+        self._index.set_ef(self.ef_search)
+
+    def _build_index(self):
+        print(f"Building HNSW index in {self.directory}...")
+        self._index.init_index(max_elements=self.capacity, M=self.m, ef_construction=self.ef_construction)
+        live_slots = np.flatnonzero(self._live[:self._size])
+        for start in range(0, len(live_slots), 10000):
+            batch = live_slots[start:start + 10000]
+            self._index.add_items(self._matrix[batch], batch)
+        self._dirty = True
+        self._save_index()
+
+    def _save_index(self):
+        if self._index is None or not self._dirty:
+            return
+        self._index.save_index(str(self.index_path))
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"generation": self.generation, "params": self._params()}))
+        tmp_path.replace(self.state_path)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _after_write(self):
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self._save_index()
+
+    def _on_grow(self, capacity):
+        if self._index is None:
+            self._index = self._hnswlib.Index(space="cosine", dim=self.dim)
+            self._index.init_index(max_elements=capacity, M=self.m, ef_construction=self.ef_construction)
+            self._index.set_ef(self.ef_search)
+        else:
+            self._index.resize_index(capacity)
+
+    def _on_added(self, slots, vectors):
+        # Re-adding the label of a deleted element replaces it and unmarks the deletion
+        self._index.add_items(vectors, slots)
+        if self._reindex_log is not None:
+            self._reindex_log.append(("add", slots))
+        self._after_write()
+
+    @staticmethod
+    def _mark_deleted(index, slots):
+        for slot in slots:
+            try:
+                index.mark_deleted(slot)
+            except RuntimeError:
+                pass
+
+    def _on_deleted(self, slots):
+        self._mark_deleted(self._index, slots)
+        if self._reindex_log is not None:
+            self._reindex_log.append(("delete", slots))
+        self._after_write()
+
+    def _compaction_blocked(self):
+        if self._reindex_log is not None:
+            return "A reindex is in progress"
+        return super()._compaction_blocked()
+
+    def _build_compacted(self, matrix, size):
+        # Slots move, so a new graph is built over the new ones
+        index = self._hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=matrix.shape[0], M=self.m, ef_construction=self.ef_construction)
+        for start in range(0, size, 10000):
+            end = min(start + 10000, size)
+            index.add_items(matrix[start:end], np.arange(start, end))
+        return index
+
+    def _install_compacted(self, index, slots, vectors, deleted_slots, capacity):
+        if index.get_max_elements() < capacity:
+            index.resize_index(capacity)
+        if len(slots):
+            index.add_items(vectors, slots)
+        self._mark_deleted(index, deleted_slots)
+        index.set_ef(self.ef_search)
+        self._index = index
+        self._dirty = True
+
+    def reindex(self, space="cosine", m=16, ef_construction=200, ef_search=64):
+        """
+        Builds a new graph with new parameters while the current one keeps serving.
+
+        The stored vectors are added to the new graph in batches; writes made meanwhile
+        are logged and replayed onto it before it replaces the current graph.
+        """
+        if space != "cosine":
+            raise ValueError(f"The {self.name} backend only supports the cosine space")
+        started = time.perf_counter()
+        with self._lock:
+            if self._reindex_log is not None:
+                raise RuntimeError("A reindex is already in progress")
+            if self._compaction_writes is not None:
+                raise RuntimeError("A compaction is in progress")
+            if self._index is None:
+                # Nothing stored yet; the first write creates the graph with the new parameters
+                self.m, self.ef_construction, self.ef_search = m, ef_construction, ef_search
+                return {"backend": self.name, "records": 0, "params": self._params(), "seconds": 0.0}
+            self._reindex_log = []
+            live_slots = np.flatnonzero(self._live[:self._size])
+            index = self._hnswlib.Index(space="cosine", dim=self.dim)
+            index.init_index(max_elements=self.capacity, M=m, ef_construction=ef_construction)
+
+        try:
+            for start in range(0, len(live_slots), 10000):
+                with self._lock:
+                    batch = live_slots[start:start + 10000]
+                    vectors = np.array(self._matrix[batch])
+                index.add_items(vectors, batch)
+
+            with self._lock:
+                if index.get_max_elements() < self.capacity:
+                    index.resize_index(self.capacity)
+                for kind, slots in self._reindex_log:
+                    if kind == "add":
+                        index.add_items(np.array(self._matrix[slots]), slots)
+                    else:
+                        self._mark_deleted(index, slots)
+                index.set_ef(ef_search)
+                self._index = index
+                self.m, self.ef_construction, self.ef_search = m, ef_construction, ef_search
+                self._dirty = True
+                self._save_index()
+        finally:
+            with self._lock:
+                self._reindex_log = None
+
+        return {
+            "backend": self.name,
+            "records": len(live_slots),
+            "params": {**self._params(), "ef_search": self.ef_search},
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    def set_ef(self, ef_search: int):
+        with self._lock:
+            self.ef_search = ef_search
+            if self._index is not None:
+                self._index.set_ef(ef_search)
+
+    def query(self, embedding, n_results):
+        query = _normalize_rows(embedding)
+        with self._lock:
+            if self._index is None:
+                return _empty_result()
+            k = min(n_results, int(self._live[:self._size].sum()))
+            if k == 0:
+                return _empty_result()
+            try:
+                labels, distances = self._index.knn_query(query, k=k)
+            except RuntimeError:
+                # The graph could not produce k neighbours (e.g. too many deletions); scan instead
+                return self._exact_search(query[0], n_results)
+            return self._results(labels[0], distances[0])
+
+    def query_many(self, embeddings, n_results):
+        queries = _normalize_rows(embeddings)
+        with self._lock:
+            if self._index is None:
+                return _merge_results([_empty_result() for _ in queries])
+            k = min(n_results, int(self._live[:self._size].sum()))
+            if k == 0:
+                return _merge_results([_empty_result() for _ in queries])
+            try:
+                labels, distances = self._index.knn_query(queries, k=k)
+            except RuntimeError:
+                return _merge_results([self.query(query, n_results) for query in queries])
+            return _merge_results([self._results(row_labels, row_distances)
+                                   for row_labels, row_distances in zip(labels, distances)])
+
+    def flush(self):
+        with self._lock:
+            self._save_index()
+
+VECTOR_BACKENDS = ("chroma", "exact", "hnsw")
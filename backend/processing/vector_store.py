@@ -1,50 +1,240 @@
-import chromadb
-from typing import List, Dict
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from typing import Iterator, List, Dict, Optional, Set, Union
+from processing.vector_backends import (
+    CHROMA_SPACES, VECTOR_BACKENDS, ChromaBackend, ExactBackend, HnswBackend, VectorBackend
+)
 
 DB_PATH = "chroma_db"
 COLLECTION_NAME = "company_documents"
+INDEX_DIR = "vector_index"
+# Records written per backend call; capped by the backend's own limit
+WRITE_BATCH_SIZE = 1000
+
+# Embeddings are passed as float32 arrays of shape (n, dim); lists of floats are still accepted
+Embeddings = Union[np.ndarray, List[List[float]]]
 
 class VectorStore:
-    """A wrapper class for ChromaDB to manage document storage and retrieval."""
-    
+    """
+    Manages document storage and retrieval on top of a vector backend:
+    "chroma" (ChromaDB), "exact" (brute-force search over a memory-mapped matrix)
+    or "hnsw" (an hnswlib graph over the same matrix).
+    """
+
     def __init__(self, path: str = DB_PATH, collection_name: str = COLLECTION_NAME):
         """
-        Initializes the VectorStore.
-        
+        Initializes the VectorStore. The backend is opened on first use.
+
         Args:
             path: The directory to store the ChromaDB data.
             collection_name: The name of the collection to use.
         """
-        self.client = chromadb.PersistentClient(path=path)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self.path = path
+        self.collection_name = collection_name
+        self.backend_name = "chroma"
+        self.index_dir = INDEX_DIR
+        self.index_params: Dict = {"space": "cosine", "m": 16, "ef_construction": 200, "ef_search": 64}
+        self.compression_params: Dict = {}
+        self.max_write_batch_size = WRITE_BATCH_SIZE
+        self._backend: Optional[VectorBackend] = None
+        self._backend_lock = threading.Lock()
+        self.reindex_status: Dict = {"status": "idle"}
+        self._reindex_thread: Optional[threading.Thread] = None
+        # Incremented on every change of the stored chunks, so that results derived from
+        # them (see processing.answer_cache) can tell when they are out of date
+        self.content_version = 0
 
-    def add_documents(self, chunks: List[str], embeddings: List[List[float]], metadatas: List[Dict]):
+    def configure(
+        self,
+        backend: str = "chroma",
+        path: str = DB_PATH,
+        index_dir: str = INDEX_DIR,
+        hnsw_m: int = 16,
+        hnsw_construction_ef: int = 200,
+        hnsw_search_ef: int = 64,
+        space: str = "cosine",
+        compression: str = "none",
+        pca_dim: int = 0,
+        rescore_candidates: int = 100,
+        write_batch_size: int = WRITE_BATCH_SIZE
+    ):
+        """
+        Selects the backend. The exact and hnsw backends keep their data in
+        `index_dir`/<backend>; switching backends does not migrate stored vectors.
+        The distance space and HNSW parameters apply to newly created Chroma collections
+        and hnsw graphs; use reindex() to rebuild an existing index with them.
+        Compression ("int8", optionally with PCA to `pca_dim` dimensions) is only
+        available with the exact backend.
+        """
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend: {backend}")
+        if space not in CHROMA_SPACES:
+            raise ValueError(f"Unknown vector space: {space}")
+        if space != "cosine" and backend != "chroma":
+            raise ValueError(f"The {backend} vector backend only supports the cosine space")
+        if compression not in ("none", "int8"):
+            raise ValueError(f"Unknown vector compression: {compression}")
+        if compression != "none" and backend != "exact":
+            raise ValueError("Vector compression requires the exact vector backend")
+        with self._backend_lock:
+            if self._backend is not None:
+                self._backend.flush()
+                self._backend = None
+            self.backend_name = backend
+            self.path = path
+            self.index_dir = index_dir
+            self.index_params = {
+                "space": space, "m": hnsw_m, "ef_construction": hnsw_construction_ef, "ef_search": hnsw_search_ef
+            }
+            self.compression_params = {
+                "compression": compression, "pca_dim": pca_dim, "rescore_candidates": rescore_candidates
+            }
+            self.max_write_batch_size = write_batch_size
+            self.content_version += 1
+
+    @property
+    def backend(self) -> VectorBackend:
+        with self._backend_lock:
+            if self._backend is None:
+                if self.backend_name == "exact":
+                    self._backend = ExactBackend(str(Path(self.index_dir) / "exact"), **self.compression_params)
+                elif self.backend_name == "hnsw":
+                    hnsw_params = {key: value for key, value in self.index_params.items() if key != "space"}
+                    self._backend = HnswBackend(str(Path(self.index_dir) / "hnsw"), **hnsw_params)
+                else:
+                    self._backend = ChromaBackend(self.path, self.collection_name, **self.index_params)
+            return self._backend
+
+    @property
+    def write_batch_size(self) -> int:
+        """Records written per backend call: the configured size, capped by the backend's limit."""
+        backend_limit = self.backend.max_batch_size
+        if backend_limit is None:
+            return self.max_write_batch_size
+        return max(1, min(self.max_write_batch_size, backend_limit))
+
+    def add_documents(self, chunks: List[str], embeddings: Embeddings, metadatas: List[Dict], ids: Optional[List[str]] = None):
         """
         Adds documents, their embeddings, and metadata to the collection.
+        Without explicit ids, chunks are identified by file_id and position.
+
+        Records are upserted in batches of `write_batch_size`, each its own backend call,
+        so a large document never exceeds the backend's batch limit. Records already
+        stored under the same id are replaced, so a retry after a partial failure is safe.
         """
         if not chunks:
             return
 
-        ids = [f"{meta['file_id']}-chunk{i}" for i, meta in enumerate(metadatas)]
+        if ids is None:
+            ids = [f"{meta['file_id']}-chunk{i}" for i, meta in enumerate(metadatas)]
 
-        self.collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        batch_size = self.write_batch_size
+        for start in range(0, len(chunks), batch_size):
+            end = start + batch_size
+            self.backend.add(ids[start:end], embeddings[start:end], chunks[start:end], metadatas[start:end])
+            self.content_version += 1
 
-    def query(self, query_embedding: List[float], n_results: int = 5) -> Dict:
+    def query(self, query_embedding: Union[np.ndarray, List[float]], n_results: int = 5) -> Dict:
         """
         Queries the collection for the most similar documents.
         """
-        return self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        return self.backend.query(np.asarray(query_embedding, dtype=np.float32).reshape(-1), n_results)
+
+    def query_many(self, query_embeddings: Embeddings, n_results: int = 5) -> Dict:
+        """
+        Queries the collection with several embeddings in one call.
+        The result holds one list per query embedding, in order.
+        """
+        embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if len(embeddings) == 0:
+            return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        return self.backend.query_many(embeddings.reshape(len(embeddings), -1), n_results)
+
+    def get_existing_ids(self, ids: List[str]) -> Set[str]:
+        """Returns the subset of the given ids that are already stored."""
+        return self.backend.get_existing_ids(ids)
+
+    def delete_chunks(self, ids: List[str]):
+        """Deletes chunks by id."""
+        if ids:
+            self.backend.delete(ids)
+            self.content_version += 1
+
+    def delete_documents(self, file_id: str):
+        """Deletes every chunk that belongs to the given file."""
+        self.backend.delete_file(file_id)
+        self.content_version += 1
 
     def get_count(self) -> int:
         """Returns the total number of documents in the collection."""
-        return self.collection.count()
+        return self.backend.count()
+
+    def update_chunk_metadatas(self, metadatas: Dict[str, Dict]):
+        """Replaces the metadata of stored chunks, given by id."""
+        if metadatas:
+            self.backend.update_metadatas(list(metadatas), list(metadatas.values()))
+            self.content_version += 1
+
+    def get_chunk_metadatas(self, ids: List[str]) -> Dict[str, Dict]:
+        """Returns the metadata of the given stored chunks, by id."""
+        return self.backend.get_metadatas(ids) if ids else {}
+
+    def iter_ids(self, batch_size: int = 1000) -> Iterator[List[str]]:
+        """Yields the ids of all stored chunks, in batches."""
+        return self.backend.iter_ids(batch_size)
+
+    def compact(self, min_free_fraction: float = 0.25) -> Dict:
+        """Reclaims the space of deleted chunks if enough of the storage is free; see VectorBackend.compact."""
+        return self.backend.compact(min_free_fraction)
+
+    def get_stats(self) -> Dict:
+        """Returns the backend's size and storage statistics."""
+        return self.backend.stats()
+
+    def reindex(self, **params) -> Dict:
+        """
+        Rebuilds the backend's index with the configured index parameters, overridden by
+        `params` (space, m, ef_construction, ef_search). Searches and writes continue
+        while the new index is built; it is swapped in once complete.
+        """
+        index_params = {**self.index_params, **{key: value for key, value in params.items() if value is not None}}
+        result = self.backend.reindex(**index_params)
+        self.index_params = index_params
+        return result
+
+    def start_reindex(self, **params) -> Dict:
+        """Starts reindex() on a background thread; returns the reindex status."""
+        with self._backend_lock:
+            if self._reindex_thread is not None and self._reindex_thread.is_alive():
+                raise RuntimeError("A reindex is already in progress")
+            self.reindex_status = {
+                "status": "running",
+                "backend": self.backend_name,
+                "params": {**self.index_params, **{key: value for key, value in params.items() if value is not None}},
+                "started_at": time.time(),
+            }
+            self._reindex_thread = threading.Thread(
+                target=self._run_reindex, kwargs=params, name="vector-reindex", daemon=True
+            )
+            self._reindex_thread.start()
+            return dict(self.reindex_status)
+
+    def _run_reindex(self, **params):
+        try:
+            result = self.reindex(**params)
+            self.reindex_status = {**self.reindex_status, "status": "completed", "result": result}
+        except Exception as e:
+            print(f"Reindex failed: {e}")
+            self.reindex_status = {**self.reindex_status, "status": "failed", "error": str(e)}
+        self.reindex_status["finished_at"] = time.time()
+
+    def flush(self):
+        """Persists in-memory index state, if the backend is open."""
+        with self._backend_lock:
+            if self._backend is not None:
+                self._backend.flush()
 
 vector_store_instance = VectorStore()
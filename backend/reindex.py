@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Rebuilds the vector index with the configured space and HNSW parameters.
+
+Run it with the server stopped (a running server can reindex itself through
+POST /vector-index/reindex). Options override the values from the environment.
+
+Usage (from the backend directory):
+    python reindex.py [--space cosine] [--m 16] [--construction-ef 200] [--search-ef 64]
+"""
+
+import argparse
+
+from config import settings
+from processing.vector_store import vector_store_instance
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--space", choices=["cosine", "l2", "ip"])
+    parser.add_argument("--m", type=int)
+    parser.add_argument("--construction-ef", type=int)
+    parser.add_argument("--search-ef", type=int)
+    args = parser.parse_args()
+
+    vector_store_instance.configure(
+        backend=settings.vector_backend,
+        path=settings.chroma_persist_directory,
+        index_dir=settings.vector_index_dir,
+        hnsw_m=settings.hnsw_m,
+        hnsw_construction_ef=settings.hnsw_construction_ef,
+        hnsw_search_ef=settings.hnsw_search_ef,
+        space=settings.vector_space,
+        compression=settings.vector_compression,
+        pca_dim=settings.vector_pca_dim,
+        rescore_candidates=settings.vector_rescore_candidates,
+        write_batch_size=settings.vector_write_batch_size
+    )
+    print(f"Reindexing the {settings.vector_backend} vector backend...")
+    result = vector_store_instance.reindex(
+        space=args.space, m=args.m, ef_construction=args.construction_ef, ef_search=args.search_ef
+    )
+    vector_store_instance.flush()
+    print(result)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 import time
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from models.schemas import *
 from services.query_router import QueryRouter
-from dependencies import get_query_router
+from services.rag_service import RAGService
+from services.local_router import local_router
+from services.sse import sse_response
+from dependencies import get_query_router, get_rag_service
+from processing.answer_cache import answer_cache
+from processing.embedder import get_embedding_cache_stats
+from processing.embedding_batcher import query_embedding_batcher
+from processing.query_embedding_cache import query_embedding_cache
+from processing.vector_store import vector_store_instance
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -22,8 +31,26 @@ async def intelligent_search(
         # Reset token counter for this request
         query_router.llm_service.reset_token_counter()
         
+        # The query is embedded and retrieved once for all steps
+        retrieval = query_router.rag_service.create_context(request.query)
+        
+        # Reuse the answer of a semantically equivalent recent query
+        cached = await query_router.lookup_answer(request.query, retrieval, request.force_strategy)
+        if cached is not None:
+            return IntelligentSearchResponse(
+                query=request.query,
+                strategy_used=cached["strategy_used"],
+                confidence=cached["analysis"]["confidence"],
+                answer=cached["answer"],
+                sources=cached["sources"],
+                analysis=cached["analysis"],
+                execution_time=time.time() - start_time,
+                tokens_used=0,
+                cached=True
+            )
+        
         # Step 1: Analyze the query
-        analysis = await query_router.analyze_query(request.query)
+        analysis = await query_router.analyze_query(request.query, retrieval)
         
         # Step 2: Override strategy if requested
         if request.force_strategy:
@@ -32,7 +59,7 @@ async def intelligent_search(
             analysis.reasoning = f"Strategy forced to {request.force_strategy.value}"
         
         # Step 3: Execute search
-        results, actual_strategy = await query_router.execute_search(request.query, analysis)
+        results, actual_strategy = await query_router.execute_search(request.query, analysis, retrieval)
         
         # Step 4: Generate final response
         answer, response_tokens = await query_router.generate_final_response(
@@ -44,6 +71,11 @@ async def intelligent_search(
         # Get total tokens used
         total_tokens = query_router.llm_service.get_total_tokens_used()
         
+        query_router.store_answer(
+            request.query, retrieval, answer, results, analysis, actual_strategy,
+            execution_time, total_tokens, request.force_strategy
+        )
+        
         return IntelligentSearchResponse(
             query=request.query,
             strategy_used=actual_strategy,
@@ -58,6 +90,45 @@ async def intelligent_search(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@router.post("/intelligent/stream")
+async def intelligent_search_stream(
+    request: IntelligentSearchRequest,
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """
+    Streaming variant of /search/intelligent. Sends server-sent events as the search
+    progresses: "analysis", "sources", one "token" per piece of the answer as the LLM
+    generates it, then "usage" (or "error" if the search fails).
+    """
+    return sse_response(query_router.iter_query_events(request.query, request.force_strategy))
+
+@router.post("/batch")
+async def batch_search(
+    request: BatchSearchRequest,
+    rag_service: RAGService = Depends(get_rag_service)
+):
+    """
+    Searches the RAG documents for many queries in one call.
+
+    The queries are embedded together and looked up with multi-vector queries. The
+    response is streamed as newline-delimited JSON, one BatchSearchItem per query,
+    written as soon as its results are available (not necessarily in request order).
+    """
+    async def stream_results():
+        pending = set(range(len(request.queries)))
+        try:
+            async for index, results in rag_service.iter_search_many(request.queries, request.top_k):
+                pending.discard(index)
+                item = BatchSearchItem(index=index, query=request.queries[index], results=results)
+                yield item.model_dump_json() + "\n"
+        except Exception as e:
+            print(f"Batch search error: {str(e)}")
+            for index in sorted(pending):
+                item = BatchSearchItem(index=index, query=request.queries[index], error=f"Search failed: {str(e)}")
+                yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.post("/analyze-query", response_model=QueryAnalysis)
 async def analyze_query_only(
     query: str,
@@ -90,5 +161,11 @@ async def get_stats(query_router: QueryRouter = Depends(get_query_router)):
     """Get usage statistics"""
     return {
         "total_tokens_used": query_router.llm_service.get_total_tokens_used(),
-        "model": query_router.llm_service.model
+        "model": query_router.llm_service.model,
+        "embedding_cache": get_embedding_cache_stats(),
+        "query_embedding_batcher": query_embedding_batcher.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "vector_store": vector_store_instance.get_stats(),
+        "answer_cache": answer_cache.stats(),
+        "local_router": local_router.stats()
     }
\ No newline at end of file
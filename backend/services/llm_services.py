@@ -1,6 +1,105 @@
+import asyncio
+import json
 import os
-import requests
-from typing import List, Dict, Optional
+import threading
+import httpx
+from typing import AsyncIterator, List, Dict, Optional
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 120.0
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Connection settings shared by every PublicAIClient; see configure_llm_http
+http_settings = {
+    "connect_timeout": CONNECT_TIMEOUT,
+    "read_timeout": READ_TIMEOUT,
+    "max_connections": MAX_CONNECTIONS,
+    "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+    "http2": True,
+}
+
+# An AsyncClient's connections belong to the event loop that opened them, so each loop
+# gets its own client
+_async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+_sync_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+def configure_llm_http(
+    connect_timeout: float = CONNECT_TIMEOUT,
+    read_timeout: float = READ_TIMEOUT,
+    max_connections: int = MAX_CONNECTIONS,
+    max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+    http2: bool = True
+):
+    """Sets the timeouts and pool limits of the LLM HTTP clients. Takes effect for clients created afterwards."""
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("HTTP/2 requires the h2 package (httpx[http2]); using HTTP/1.1")
+            http2 = False
+    http_settings.update(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        http2=http2
+    )
+
+def _client_options() -> Dict:
+    return {
+        "http2": http_settings["http2"],
+        "timeout": httpx.Timeout(
+            http_settings["read_timeout"], connect=http_settings["connect_timeout"]
+        ),
+        "limits": httpx.Limits(
+            max_connections=http_settings["max_connections"],
+            max_keepalive_connections=http_settings["max_keepalive_connections"]
+        ),
+    }
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the AsyncClient shared by all LLM calls made on the running event loop.
+    Its connection pool keeps connections alive between requests.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            # Clients of loops that were closed without close_http_clients() can no longer be
+            # closed on their loop; dropping them lets their transports close their sockets
+            for closed_loop in [other for other in _async_clients if other.is_closed()]:
+                del _async_clients[closed_loop]
+            client = _async_clients[loop] = httpx.AsyncClient(**_client_options())
+        return client
+
+def get_sync_http_client() -> httpx.Client:
+    """Returns the Client shared by the blocking LLM calls."""
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_options())
+        return _sync_client
+
+async def close_http_clients():
+    """Closes the shared LLM HTTP clients and their connections, on every event loop."""
+    global _sync_client
+    current_loop = asyncio.get_running_loop()
+    with _client_lock:
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+    for loop, client in clients:
+        if loop is current_loop:
+            await client.aclose()
+        elif loop.is_running():
+            # A loop running in another thread: close the client there
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+    with _client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
 
 class PublicAIClient:
     def __init__(self, api_key: str = None, base_url: str = "https://api.publicai.co/v1"):
@@ -17,16 +116,15 @@ class PublicAIClient:
             "User-Agent": "IntelligentSearchAPI/1.0"
         }
 
-    def chat_completion(
+    def _payload(
         self,
         messages: List[Dict[str, str]],
-        model: str = "swiss-ai/apertus-8b-instruct",
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        top_p: Optional[float] = None,
-        stream: bool = False
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        top_p: Optional[float],
+        stream: bool
     ) -> Dict:
-        url = f"{self.base_url}/chat/completions"
         payload = {
             "model": model,
             "messages": messages
@@ -43,26 +141,103 @@ class PublicAIClient:
             payload["stream"] = stream
 
         print(payload)
+        return payload
+
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "swiss-ai/apertus-8b-instruct",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        stream: bool = False
+    ) -> Dict:
+        """Sends a chat completion request without blocking the event loop, over the shared connection pool."""
+        url = f"{self.base_url}/chat/completions"
+        payload = self._payload(messages, model, temperature, max_tokens, top_p, stream)
 
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = await get_async_http_client().post(url, headers=self.headers, json=payload)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Error making API request: {e}")
             raise
 
-    def simple_chat(self, user_message: str, model: str = "swiss-ai/apertus-8b-instruct", system_prompt: Optional[str] = None) -> str:
+    async def astream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "swiss-ai/apertus-8b-instruct",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Sends a streaming chat completion request and yields the server-sent
+        `chat.completion.chunk` objects as soon as the provider produces them.
+        The last chunk carries the token usage if the provider reports it.
+        """
+        url = f"{self.base_url}/chat/completions"
+        payload = self._payload(messages, model, temperature, max_tokens, top_p, stream=True)
+        payload["stream_options"] = {"include_usage": True}
+
+        try:
+            async with get_async_http_client().stream("POST", url, headers=self.headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    yield json.loads(data)
+        except httpx.HTTPError as e:
+            print(f"Error making API request: {e}")
+            raise
+
+    def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "swiss-ai/apertus-8b-instruct",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        stream: bool = False
+    ) -> Dict:
+        """Blocking variant of achat_completion for synchronous callers; do not call it from async code."""
+        url = f"{self.base_url}/chat/completions"
+        payload = self._payload(messages, model, temperature, max_tokens, top_p, stream)
+
+        try:
+            response = get_sync_http_client().post(url, headers=self.headers, json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error making API request: {e}")
+            raise
+
+    @staticmethod
+    def _simple_messages(user_message: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": user_message})
-        response = self.chat_completion(messages, model)
-        
+        return messages
+
+    @staticmethod
+    def _message_content(response: Dict) -> str:
         if "choices" in response and len(response["choices"]) > 0:
             return response["choices"][0]["message"]["content"]
         else:
             raise ValueError("Unexpected response format")
+
+    async def asimple_chat(self, user_message: str, model: str = "swiss-ai/apertus-8b-instruct", system_prompt: Optional[str] = None) -> str:
+        response = await self.achat_completion(self._simple_messages(user_message, system_prompt), model)
+        return self._message_content(response)
+
+    def simple_chat(self, user_message: str, model: str = "swiss-ai/apertus-8b-instruct", system_prompt: Optional[str] = None) -> str:
+        response = self.chat_completion(self._simple_messages(user_message, system_prompt), model)
+        return self._message_content(response)
         
 def get_public_ai_client() -> PublicAIClient:
     return PublicAIClient()
@@ -88,8 +263,8 @@ class LLMService:
                 messages.append({"role": "system", "content": system_prompt})
             messages.append({"role": "user", "content": prompt})
             
-            # Make the API call (synchronous, but we'll wrap it for async compatibility)
-            response = self.client.chat_completion(
+            # Make the API call over the shared async connection pool
+            response = await self.client.achat_completion(
                 messages=messages,
                 model=self.model,
                 max_tokens=max_tokens,
@@ -123,7 +298,7 @@ class LLMService:
     ) -> dict:
         """Generate response using message format directly"""
         try:
-            response = self.client.chat_completion(
+            response = await self.client.achat_completion(
                 messages=messages,
                 model=self.model,
                 max_tokens=max_tokens,
@@ -146,6 +321,57 @@ class LLMService:
         except Exception as e:
             raise Exception(f"LLM API error: {str(e)}")
     
+    async def stream(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.1,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """Streaming variant of generate, see stream_with_messages"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        async for event in self.stream_with_messages(messages, max_tokens=max_tokens, temperature=temperature):
+            yield event
+    
+    async def stream_with_messages(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 1000,
+        temperature: float = 0.1
+    ) -> AsyncIterator[dict]:
+        """
+        Generate a response as a stream: yields {"text": ...} for every piece of text as
+        soon as the provider sends it, then one {"tokens_used", "usage", "finish_reason"}
+        item once the generation is done.
+        """
+        usage = {}
+        finish_reason = None
+        try:
+            async for chunk in self.client.astream_chat_completion(
+                messages=messages,
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature
+            ):
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield {"text": text}
+                    if choice.get("finish_reason"):
+                        finish_reason = choice["finish_reason"]
+        except Exception as e:
+            raise Exception(f"LLM API error: {str(e)}")
+        
+        tokens_used = usage.get("total_tokens", 0)
+        self.total_tokens_used += tokens_used
+        yield {"tokens_used": tokens_used, "usage": usage, "finish_reason": finish_reason}
+    
     def get_total_tokens_used(self) -> int:
         """Get total tokens used in this session"""
         return self.total_tokens_used
@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from models.schemas import SearchStrategy
+
+ROUTER_DIR = "./router_data"
+K = 10
+CONFIDENCE_THRESHOLD = 0.7
+MIN_EXAMPLES = 50
+# The strategy the keyword signals point to counts as this many neighbors' votes
+KEYWORD_WEIGHT = 2.0
+# Below this similarity even the nearest logged query is unrelated; route with the LLM
+MIN_NEIGHBOR_SIMILARITY = 0.3
+# The index is saved after this many new examples, so that a crash loses at most these
+FLUSH_EVERY = 20
+
+STRATEGIES = [strategy.value for strategy in SearchStrategy]
+
+def keyword_strategy(temporal_found: List[str], internal_found: List[str]) -> Optional[str]:
+    """The strategy the keyword signals point to, as in the rule-based routing; None without signals."""
+    if temporal_found and internal_found:
+        return SearchStrategy.HYBRID.value
+    if temporal_found:
+        return SearchStrategy.WEB.value
+    if internal_found:
+        return SearchStrategy.RAG.value
+    return None
+
+def knn_votes(similarities: np.ndarray, labels: np.ndarray, k: int = K,
+              keyword: Optional[str] = None, keyword_weight: float = KEYWORD_WEIGHT) -> np.ndarray:
+    """
+    Per-strategy votes (in STRATEGIES order) of the `k` most similar examples, each
+    weighted by its similarity, plus the keyword signals' vote.
+    """
+    k = min(k, len(similarities))
+    nearest = np.argpartition(-similarities, k - 1)[:k]
+    weights = np.maximum(similarities[nearest], 0.0)
+    votes = np.bincount(labels[nearest], weights=weights, minlength=len(STRATEGIES))
+    if keyword is not None:
+        votes[STRATEGIES.index(keyword)] += keyword_weight * weights.mean()
+    return votes
+
+class LocalRouter:
+    """
+    Routes queries from the LLM router's past decisions, without an LLM call.
+
+    Every decision of the LLM router is appended to a JSONL decision log and added to a
+    k-nearest-neighbor index over the query embeddings. A new query is routed to the
+    strategy with the most similarity-weighted votes among its `k` most similar logged
+    queries and the keyword signals. The vote share is the confidence; below
+    `confidence_threshold`, with fewer than `min_examples` logged decisions or with no
+    similar logged query, predict() returns None and the LLM router decides.
+
+    The index is kept in memory and saved to `directory` by flush(), which add() calls
+    every `flush_every` new examples; `train_router.py` rebuilds it from the decision
+    log, e.g. after the embedding model changed. add(), log_decision() and flush() do
+    disk I/O, so async callers run them in a worker thread.
+    """
+
+    def __init__(self, directory: str = ROUTER_DIR, k: int = K, confidence_threshold: float = CONFIDENCE_THRESHOLD,
+                 min_examples: int = MIN_EXAMPLES, enabled: bool = True, flush_every: int = FLUSH_EVERY):
+        self.enabled = enabled
+        self.k = k
+        self.confidence_threshold = confidence_threshold
+        self.min_examples = min_examples
+        self.flush_every = flush_every
+        self._set_directory(directory)
+        self._lock = threading.Lock()
+        # The index and the decision log are written under their own locks, so that
+        # predict() never waits for the disk
+        self._flush_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+        self.local_decisions = 0
+        self.llm_fallbacks = 0
+        self.local_seconds = 0.0
+        self.examples_added = 0
+
+    def _set_directory(self, directory: str):
+        self.directory = Path(directory)
+        self.decision_log_path = self.directory / "decisions.jsonl"
+        self.index_path = self.directory / "knn_index.npz"
+        self.model_id: Optional[str] = None
+        self._embeddings: Optional[np.ndarray] = None
+        self._labels = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._loaded = False
+        self._dirty = False
+        self._unsaved = 0
+
+    def configure(self, directory: str = ROUTER_DIR, k: int = K, confidence_threshold: float = CONFIDENCE_THRESHOLD,
+                  min_examples: int = MIN_EXAMPLES, enabled: bool = True, flush_every: int = FLUSH_EVERY):
+        with self._lock:
+            self.enabled = enabled
+            self.k = k
+            self.confidence_threshold = confidence_threshold
+            self.min_examples = min_examples
+            self.flush_every = flush_every
+            if Path(directory) != self.directory:
+                self._set_directory(directory)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.index_path.exists():
+            return
+        try:
+            with np.load(self.index_path) as data:
+                embeddings = np.array(data["embeddings"], dtype=np.float32)
+                labels = np.array(data["labels"], dtype=np.int64)
+                model_id = str(data["model_id"])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error loading the local router index, starting empty: {e}")
+            return
+        self._embeddings, self._labels, self._size, self.model_id = embeddings, labels, len(labels), model_id
+
+    def predict(self, model_id: str, embedding: np.ndarray, keyword: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns the routing decision for a query embedding, as {"strategy", "confidence"
+        (0-1), "backup_strategy", "neighbors"}, or None if the LLM router should decide.
+        """
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        with self._lock:
+            self._load()
+            if self._size < self.min_examples or model_id != self.model_id:
+                self.llm_fallbacks += 1
+                return None
+            query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            similarities = self._embeddings[:self._size] @ query
+            labels = self._labels[:self._size]
+
+        if similarities.max() < MIN_NEIGHBOR_SIMILARITY:
+            self.llm_fallbacks += 1
+            return None
+        votes = knn_votes(similarities, labels, self.k, keyword)
+        ranked = np.argsort(-votes)
+        confidence = float(votes[ranked[0]] / votes.sum()) if votes.sum() > 0 else 0.0
+        if confidence < self.confidence_threshold:
+            self.llm_fallbacks += 1
+            return None
+
+        self.local_decisions += 1
+        self.local_seconds += time.perf_counter() - started
+        return {
+            "strategy": STRATEGIES[ranked[0]],
+            "confidence": confidence,
+            "backup_strategy": STRATEGIES[ranked[1]] if votes[ranked[1]] > 0 else None,
+            "neighbors": min(self.k, len(labels)),
+        }
+
+    def add(self, model_id: str, embedding: np.ndarray, strategy: str):
+        """Adds an LLM routing decision to the index; an index of another embedding model is replaced."""
+        if not self.enabled:
+            return
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._load()
+            if model_id != self.model_id or self._embeddings is None or self._embeddings.shape[1] != len(vector):
+                self.model_id = model_id
+                self._embeddings = np.zeros((0, len(vector)), dtype=np.float32)
+                self._labels = np.zeros(0, dtype=np.int64)
+                self._size = 0
+            if self._size == len(self._embeddings):
+                capacity = max(64, 2 * self._size)
+                embeddings = np.zeros((capacity, len(vector)), dtype=np.float32)
+                embeddings[:self._size] = self._embeddings[:self._size]
+                labels = np.zeros(capacity, dtype=np.int64)
+                labels[:self._size] = self._labels[:self._size]
+                self._embeddings, self._labels = embeddings, labels
+            self._embeddings[self._size] = vector
+            self._labels[self._size] = STRATEGIES.index(strategy)
+            self._size += 1
+            self._dirty = True
+            self._unsaved += 1
+            self.examples_added += 1
+            save = self._unsaved >= self.flush_every
+        if save:
+            self.flush()
+
+    def rebuild(self, model_id: str, embeddings: np.ndarray, strategies: List[str]):
+        """Replaces the index with the given decisions."""
+        with self._lock:
+            self._loaded = True
+            self.model_id = model_id
+            self._embeddings = np.asarray(embeddings, dtype=np.float32)
+            self._labels = np.array([STRATEGIES.index(strategy) for strategy in strategies], dtype=np.int64)
+            self._size = len(self._labels)
+            self._dirty = True
+
+    def log_decision(self, record: Dict):
+        """Appends an LLM routing decision to the decision log."""
+        if not self.enabled:
+            return
+        line = json.dumps(record) + "\n"
+        with self._log_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.decision_log_path, "a") as f:
+                f.write(line)
+
+    def flush(self):
+        """Saves the index if it changed since it was loaded or last saved."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                # add() only writes rows past the size and rebuild() swaps in new arrays,
+                # so these views stay unchanged while they are written outside the lock
+                embeddings = self._embeddings[:self._size]
+                labels = self._labels[:self._size]
+                model_id = self.model_id
+                index_path = self.index_path
+                self._dirty = False
+                self._unsaved = 0
+            try:
+                index_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = index_path.with_suffix(".npz.tmp")
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, embeddings=embeddings, labels=labels, model_id=np.array(model_id))
+                os.replace(tmp_path, index_path)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def stats(self) -> Dict:
+        routed = self.local_decisions + self.llm_fallbacks
+        return {
+            "enabled": self.enabled,
+            "examples": self._size,
+            "examples_added": self.examples_added,
+            "k": self.k,
+            "confidence_threshold": self.confidence_threshold,
+            "local_decisions": self.local_decisions,
+            "llm_fallbacks": self.llm_fallbacks,
+            "local_rate": self.local_decisions / routed if routed else 0.0,
+            "avg_local_ms": 1000 * self.local_seconds / self.local_decisions if self.local_decisions else 0.0,
+        }
+
+def load_decisions(path: Path) -> List[Dict]:
+    """Reads a decision log, oldest first, skipping lines that are not valid decisions."""
+    decisions = []
+    if not Path(path).exists():
+        return decisions
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("strategy") in STRATEGIES and record.get("query"):
+                decisions.append(record)
+    return decisions
+
+local_router = LocalRouter()
@@ -1,11 +1,18 @@
 import re
+import time
 import asyncio
-from typing import List, Tuple
+import functools
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from models.schemas import *
+from processing.answer_cache import answer_cache
+from processing.embedder import get_embedding_model_id
 from services.llm_services import LLMService
-from services.rag_service import RAGService
+from services.local_router import keyword_strategy, local_router
+from services.rag_service import RAGService, RetrievalContext
 from services.web_search_service import WebSearchService
 
+RESPONSE_ERROR_PREFIX = "I apologize, but I encountered an error while generating a response"
+
 class QueryRouter:
     def __init__(
         self, 
@@ -32,15 +39,26 @@ class QueryRouter:
             'uploaded', 'saved', 'stored'
         ]
     
-    async def analyze_query(self, query: str) -> QueryAnalysis:
-        """Sophisticated query analysis using LLM"""
+    async def analyze_query(self, query: str, retrieval: Optional[RetrievalContext] = None) -> QueryAnalysis:
+        """
+        Sophisticated query analysis using LLM.
+        With a retrieval context, the RAG similarity preview retrieves the results that a
+        later RAG search of the same request reuses.
+        Queries similar to ones the LLM has routed before are routed locally, without the
+        LLM call, when the local router is confident (see services.local_router).
+        """
         
         # Quick keyword analysis for context
-        temporal_found = [kw for kw in self.temporal_keywords if kw.lower() in query.lower()]
-        internal_found = [kw for kw in self.internal_keywords if kw.lower() in query.lower()]
+        temporal_found, internal_found = self._keyword_signals(query)
+        
+        # Get RAG similarity preview; its query embedding is also used for local routing
+        if retrieval is None:
+            retrieval = self.rag_service.create_context(query, top_k=1)
+        rag_similarity = await self.rag_service.quick_search(query, retrieval=retrieval) or 0.0
         
-        # Get RAG similarity preview
-        rag_similarity = await self.rag_service.quick_search(query) or 0.0
+        local_analysis = self._local_analysis(retrieval, temporal_found, internal_found)
+        if local_analysis is not None:
+            return local_analysis
         
         system_prompt = """You are an expert at analyzing search queries to determine the best information retrieval strategy. You must respond in a specific format that can be parsed programmatically."""
         
@@ -100,6 +118,7 @@ class QueryRouter:
         """
         
         try:
+            started = time.perf_counter()
             response = await self.llm_service.generate(
                 analysis_prompt,
                 max_tokens=300,
@@ -107,13 +126,83 @@ class QueryRouter:
                 system_prompt=system_prompt
             )
             
-            return self._parse_analysis(response.get('text', ''), temporal_found, internal_found)
+            analysis = self._parse_analysis(response.get('text', ''), temporal_found, internal_found)
+            if re.search(r'PRIMARY_STRATEGY:\s*(RAG|WEB|DIRECT|HYBRID)\b', response.get('text', '')):
+                # Appends to the decision log and may save the local router's index
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, functools.partial(
+                    self._record_decision, query, retrieval, analysis, rag_similarity, time.perf_counter() - started
+                ))
+            return analysis
         
         except Exception as e:
             print(f"LLM analysis failed: {e}")
             # Fallback to rule-based analysis
             return self._fallback_analysis(query, temporal_found, internal_found, rag_similarity)
     
+    def _local_analysis(
+        self,
+        retrieval: RetrievalContext,
+        temporal_found: List[str],
+        internal_found: List[str]
+    ) -> Optional[QueryAnalysis]:
+        """Routes the query with the local router, or returns None if the LLM has to decide."""
+        if retrieval.embedding is None:
+            return None
+        keyword = keyword_strategy(temporal_found, internal_found)
+        prediction = local_router.predict(get_embedding_model_id(), retrieval.embedding, keyword)
+        if prediction is None:
+            return None
+        
+        key_factors = ["local_router"]
+        if keyword is not None:
+            key_factors.append("keyword_signals")
+        backup = prediction["backup_strategy"]
+        return QueryAnalysis(
+            strategy=SearchStrategy(prediction["strategy"]),
+            confidence=round(10 * prediction["confidence"], 1),
+            backup_strategy=SearchStrategy(backup) if backup else None,
+            reasoning=(
+                f"Routed locally: {prediction['confidence']:.0%} of the similarity-weighted votes of the "
+                f"{prediction['neighbors']} most similar previously routed queries and the keyword signals"
+            ),
+            key_factors=key_factors,
+            temporal_indicators=temporal_found,
+            internal_references=internal_found
+        )
+    
+    def _record_decision(
+        self,
+        query: str,
+        retrieval: RetrievalContext,
+        analysis: QueryAnalysis,
+        rag_similarity: float,
+        seconds: float
+    ):
+        """Logs an LLM routing decision and teaches it to the local router."""
+        try:
+            local_router.log_decision({
+                "query": query,
+                "strategy": analysis.strategy.value,
+                "confidence": analysis.confidence,
+                "backup_strategy": analysis.backup_strategy.value if analysis.backup_strategy else None,
+                "temporal_indicators": analysis.temporal_indicators,
+                "internal_references": analysis.internal_references,
+                "rag_similarity": rag_similarity,
+                "llm_ms": round(1000 * seconds, 1),
+                "timestamp": time.time()
+            })
+            if retrieval.embedding is not None:
+                local_router.add(get_embedding_model_id(), retrieval.embedding, analysis.strategy.value)
+        except Exception as e:
+            print(f"Failed to record routing decision: {e}")
+    
+    def _keyword_signals(self, query: str) -> Tuple[List[str], List[str]]:
+        """Temporal and internal reference keywords found in the query"""
+        temporal_found = [kw for kw in self.temporal_keywords if kw.lower() in query.lower()]
+        internal_found = [kw for kw in self.internal_keywords if kw.lower() in query.lower()]
+        return temporal_found, internal_found
+    
     def _parse_analysis(self, response_text: str, temporal_found: List[str], internal_found: List[str]) -> QueryAnalysis:
         """Parse LLM analysis response"""
         try:
@@ -199,8 +288,13 @@ class QueryRouter:
                 internal_references=internal_found
             )
     
-    async def execute_search(self, query: str, analysis: QueryAnalysis) -> Tuple[List[SearchResult], SearchStrategy]:
-        """Execute the search strategy"""
+    async def execute_search(
+        self,
+        query: str,
+        analysis: QueryAnalysis,
+        retrieval: Optional[RetrievalContext] = None
+    ) -> Tuple[List[SearchResult], SearchStrategy]:
+        """Execute the search strategy, reusing the request's retrieval for RAG results"""
         
         strategy = analysis.strategy
         results = []
@@ -208,7 +302,7 @@ class QueryRouter:
         try:
             if strategy == SearchStrategy.RAG:
                 print("Executing RAG search...")
-                results = await self.rag_service.search(query)
+                results = await self.rag_service.search(query, retrieval=retrieval)
                 
             elif strategy == SearchStrategy.WEB:
                 print("Executing Web search...")
@@ -217,7 +311,7 @@ class QueryRouter:
             elif strategy == SearchStrategy.HYBRID:
                 # Execute both searches in parallel
                 print("Executing Hybrid search (RAG + Web)...")
-                rag_task = self.rag_service.search(query)
+                rag_task = self.rag_service.search(query, retrieval=retrieval)
                 web_task = self.web_search_service.search(query)
                 
                 rag_results, web_results = await asyncio.gather(rag_task, web_task, return_exceptions=True)
@@ -241,7 +335,7 @@ class QueryRouter:
                     reasoning="Trying backup strategy",
                     key_factors=["backup_strategy"]
                 )
-                results, strategy = await self.execute_search(query, backup_analysis)
+                results, strategy = await self.execute_search(query, backup_analysis, retrieval)
             
             return results, strategy
             
@@ -252,29 +346,164 @@ class QueryRouter:
                 return [], SearchStrategy.DIRECT
             raise e
     
-    async def process_query(self, query: str) -> Tuple[str, List[SearchResult], QueryAnalysis, int]:
+    def _cache_strategy(self, query: str, force_strategy: Optional[SearchStrategy] = None) -> str:
+        """
+        The strategy a cached answer must have been routed with to be reused for the query:
+        the forced strategy, or else the one its keyword signals point to. The LLM routing
+        is part of what a cache hit saves, so its outcome cannot be part of the key.
+        """
+        if force_strategy:
+            return force_strategy.value
+        temporal_found, internal_found = self._keyword_signals(query)
+        return self._fallback_analysis(query, temporal_found, internal_found, 0.0).strategy.value
+
+    async def lookup_answer(
+        self,
+        query: str,
+        retrieval: RetrievalContext,
+        force_strategy: Optional[SearchStrategy] = None
+    ) -> Optional[Dict]:
+        """
+        Returns the cached answer of a semantically equivalent earlier query, or None.
+        The query is embedded into the retrieval context, so a miss costs no extra embedding.
+        """
+        if not answer_cache.enabled:
+            return None
+        try:
+            if retrieval.embedding is None:
+                retrieval.embedding = await self.rag_service.embed_query(query)
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+            return None
+        return answer_cache.get(
+            get_embedding_model_id(),
+            retrieval.embedding,
+            self._cache_strategy(query, force_strategy),
+            retrieval.content_version
+        )
+
+    def store_answer(
+        self,
+        query: str,
+        retrieval: RetrievalContext,
+        answer: str,
+        results: List[SearchResult],
+        analysis: QueryAnalysis,
+        strategy: SearchStrategy,
+        execution_time: float,
+        tokens_used: int,
+        force_strategy: Optional[SearchStrategy] = None
+    ):
+        """Caches a generated answer for later semantically equivalent queries; failed answers are not cached."""
+        if not answer_cache.enabled or retrieval.embedding is None or answer.startswith(RESPONSE_ERROR_PREFIX):
+            return
+        answer_cache.put(
+            get_embedding_model_id(),
+            retrieval.embedding,
+            self._cache_strategy(query, force_strategy),
+            retrieval.content_version,
+            {
+                "answer": answer,
+                "sources": [result.model_dump() for result in results],
+                "analysis": analysis.model_dump(),
+                "strategy_used": strategy.value
+            },
+            seconds=execution_time,
+            tokens_used=tokens_used
+        )
+
+    async def process_query(self, query: str) -> Tuple[str, List[SearchResult], QueryAnalysis, int, bool]:
         """
         Processes a query from start to finish: analysis, execution, and response generation.
+        The query is embedded and looked up in the vector store at most once.
+        The answer of a semantically equivalent recent query is reused if cached; the last
+        element of the result tells whether it was.
         """
+        start_time = time.time()
+        retrieval = self.rag_service.create_context(query)
+
+        cached = await self.lookup_answer(query, retrieval)
+        if cached is not None:
+            results = [SearchResult(**result) for result in cached["sources"]]
+            return cached["answer"], results, QueryAnalysis(**cached["analysis"]), 0, True
+
         # 1. Analyze the query
-        analysis = await self.analyze_query(query)
+        analysis = await self.analyze_query(query, retrieval)
         
         # 2. Execute the search based on the analysis
-        results, strategy = await self.execute_search(query, analysis)
+        results, strategy = await self.execute_search(query, analysis, retrieval)
         
         # 3. Generate the final response
         final_response, tokens_used = await self.generate_final_response(query, results, strategy, analysis)
         
-        return final_response, results, analysis, tokens_used
+        self.store_answer(
+            query, retrieval, final_response, results, analysis, strategy, time.time() - start_time, tokens_used
+        )
+        return final_response, results, analysis, tokens_used, False
 
-    async def generate_final_response(
-        self, 
-        query: str, 
-        results: List[SearchResult], 
+    async def iter_query_events(
+        self,
+        query: str,
+        force_strategy: Optional[SearchStrategy] = None
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Streaming variant of process_query. Yields (event, data) pairs as each step
+        finishes: "analysis" with the routing decision, "sources" with the retrieved
+        results, one "token" per piece of answer text as the LLM produces it, and
+        finally "usage" with the tokens used by the answer and the execution time.
+        A cached answer is sent as a single "token" event, with "cached" set in "usage".
+        """
+        start_time = time.time()
+        retrieval = self.rag_service.create_context(query)
+
+        cached = await self.lookup_answer(query, retrieval, force_strategy)
+        if cached is not None:
+            yield "analysis", QueryAnalysis(**cached["analysis"]).model_dump(mode="json")
+            yield "sources", {
+                "strategy_used": cached["strategy_used"],
+                "sources": [SearchResult(**result).model_dump(mode="json") for result in cached["sources"]]
+            }
+            yield "token", {"text": cached["answer"]}
+            yield "usage", {
+                "tokens_used": 0, "usage": {}, "finish_reason": "stop",
+                "execution_time": time.time() - start_time, "cached": True
+            }
+            return
+
+        analysis = await self.analyze_query(query, retrieval)
+        if force_strategy:
+            analysis.strategy = force_strategy
+            analysis.confidence = 10.0
+            analysis.reasoning = f"Strategy forced to {force_strategy.value}"
+        yield "analysis", analysis.model_dump(mode="json")
+
+        results, strategy = await self.execute_search(query, analysis, retrieval)
+        yield "sources", {
+            "strategy_used": strategy.value,
+            "sources": [result.model_dump(mode="json") for result in results]
+        }
+
+        answer = []
+        async for event in self.stream_final_response(query, results, strategy, analysis):
+            if "text" in event:
+                answer.append(event["text"])
+                yield "token", event
+            else:
+                execution_time = time.time() - start_time
+                self.store_answer(
+                    query, retrieval, "".join(answer), results, analysis, strategy,
+                    execution_time, event["tokens_used"], force_strategy
+                )
+                yield "usage", {**event, "execution_time": execution_time, "cached": False}
+
+    def _final_response_prompt(
+        self,
+        query: str,
+        results: List[SearchResult],
         strategy: SearchStrategy,
         analysis: QueryAnalysis
-    ) -> Tuple[str, int]:
-        """Generate the final response using LLM"""
+    ) -> Tuple[str, str]:
+        """Builds the (system prompt, prompt) of the final response."""
         
         context = ""
         if results:
@@ -309,6 +538,19 @@ class QueryRouter:
         Answer:
         """
         
+        return system_prompt, response_prompt
+
+    async def generate_final_response(
+        self, 
+        query: str, 
+        results: List[SearchResult], 
+        strategy: SearchStrategy,
+        analysis: QueryAnalysis
+    ) -> Tuple[str, int]:
+        """Generate the final response using LLM"""
+        
+        system_prompt, response_prompt = self._final_response_prompt(query, results, strategy, analysis)
+        
         try:
             response = await self.llm_service.generate(
                 response_prompt,
@@ -321,4 +563,21 @@ class QueryRouter:
         
         except Exception as e:
             print(f"Response generation failed: {e}")
-            return f"I apologize, but I encountered an error while generating a response: {str(e)}", 0
\ No newline at end of file
+            return f"{RESPONSE_ERROR_PREFIX}: {str(e)}", 0
+
+    async def stream_final_response(
+        self,
+        query: str,
+        results: List[SearchResult],
+        strategy: SearchStrategy,
+        analysis: QueryAnalysis
+    ) -> AsyncIterator[Dict]:
+        """Streaming variant of generate_final_response, see LLMService.stream"""
+        system_prompt, response_prompt = self._final_response_prompt(query, results, strategy, analysis)
+        async for event in self.llm_service.stream(
+            response_prompt,
+            max_tokens=1000,
+            temperature=0.3,
+            system_prompt=system_prompt
+        ):
+            yield event
@@ -1,67 +1,178 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
 from models.schemas import SearchResult
-from processing.embedder import embed_chunks
+from processing.embedder import get_embedding_model_id
+from processing.embedding_batcher import query_embedding_batcher
+from processing.query_embedding_cache import query_embedding_cache
 from processing.vector_store import vector_store_instance
 
+class RetrievalContext:
+    """
+    Retrieval state shared by the steps of one request.
+
+    The query is embedded once and the vector store is queried once for the top
+    `top_k` chunks; the similarity preview used by query analysis and the search
+    results are both served from that single retrieval.
+    """
+
+    def __init__(self, query: str, top_k: int = 5, content_version: int = 0):
+        self.query = query
+        self.top_k = top_k
+        # Vector store content version when the request started
+        self.content_version = content_version
+        self.embedding: Optional[np.ndarray] = None
+        self.results: Optional[List[SearchResult]] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def retrieved(self) -> bool:
+        return self.results is not None
+
+    @property
+    def top_similarity(self) -> float:
+        """Similarity of the best matching chunk, or 0.0 if nothing was retrieved."""
+        if not self.results:
+            return 0.0
+        return self.results[0].relevance_score or 0.0
+
+# Queries sent to the vector store per multi-vector query of a batch search; results
+# are streamed back after each group
+BATCH_QUERY_GROUP = 32
+
+def _to_search_results(documents: List[str], metadatas: List[Dict], distances: List[float]) -> List[SearchResult]:
+    """Converts one query's vector store results to SearchResults."""
+    search_results = []
+    for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
+        # Convert distance to similarity score (lower distance = higher similarity)
+        similarity_score = max(0, 1 - distance) if distance is not None else 0.5
+
+        search_results.append(SearchResult(
+            source="rag",
+            title=(metadata or {}).get('filename', f'Document {i+1}'),
+            content=doc,
+            url=None,  # RAG documents don't have URLs
+            relevance_score=similarity_score
+        ))
+    return search_results
+
 class RAGService:
     def __init__(self):
         self.vector_store = vector_store_instance
-    
-    async def search(self, query: str, top_k: int = 5) -> List[SearchResult]:
-        """Search through RAG documents"""
-        try:
-            # Embed the query using your existing embedder
-            query_embedding = embed_chunks([query])[0]
-            
-            # Query your existing vector store
-            results = self.vector_store.query(
-                query_embedding=query_embedding,
-                n_results=top_k
-            )
-            
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Embeds a query, reusing the embedding of a recent identical query if cached."""
+        model_id = get_embedding_model_id()
+        embedding = query_embedding_cache.get(model_id, query)
+        if embedding is None:
+            # Embed the query, batched with concurrent requests
+            embedding = await query_embedding_batcher.embed(query)
+            query_embedding_cache.put(model_id, query, embedding)
+        return embedding
+
+    def create_context(self, query: str, top_k: int = 5) -> RetrievalContext:
+        """Creates the retrieval context of a request; nothing is retrieved until it is needed."""
+        return RetrievalContext(query, top_k, self.vector_store.content_version)
+
+    async def retrieve(self, context: RetrievalContext) -> List[SearchResult]:
+        """Embeds the context's query and retrieves its top-k chunks, once per context."""
+        async with context._lock:
+            if context.results is not None:
+                return context.results
+
+            if context.embedding is None:
+                context.embedding = await self.embed_query(context.query)
+
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, self.vector_store.query, context.embedding, context.top_k)
+
             # Convert to SearchResult format
             search_results = []
             if results and results.get('documents') and results['documents'][0]:
                 documents = results['documents'][0]
                 metadatas = results.get('metadatas', [[{}] * len(documents)])[0]
                 distances = results.get('distances', [[0] * len(documents)])[0]
-                
-                for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
-                    # Convert distance to similarity score (lower distance = higher similarity)
-                    similarity_score = max(0, 1 - distance) if distance is not None else 0.5
-                    
-                    search_results.append(SearchResult(
-                        source="rag",
-                        title=metadata.get('filename', f'Document {i+1}'),
-                        content=doc,
-                        url=None,  # RAG documents don't have URLs
-                        relevance_score=similarity_score
-                    ))
-            
+                search_results = _to_search_results(documents, metadatas, distances)
+
+            context.results = search_results
             return search_results
-            
+
+    async def search(self, query: str, top_k: int = 5, retrieval: Optional[RetrievalContext] = None) -> List[SearchResult]:
+        """
+        Search through RAG documents.
+        With a retrieval context that retrieves at least `top_k` chunks, its retrieval is
+        reused; with a smaller one, at least its query embedding is.
+        """
+        try:
+            if retrieval is None or retrieval.top_k < top_k:
+                embedding = retrieval.embedding if retrieval is not None else None
+                retrieval = self.create_context(query, top_k)
+                retrieval.embedding = embedding
+            results = await self.retrieve(retrieval)
+            return results[:top_k]
+
         except Exception as e:
             print(f"RAG search error: {str(e)}")
             return []
-    
-    async def quick_search(self, query: str) -> Optional[float]:
-        """Quick similarity check without full retrieval"""
+
+    async def quick_search(self, query: str, retrieval: Optional[RetrievalContext] = None) -> Optional[float]:
+        """
+        Quick similarity check without full retrieval.
+        With a retrieval context, its retrieval is done now and reused by the later search.
+        """
         try:
-            # Do a quick search with just 1 result to get similarity
-            query_embedding = embed_chunks([query])[0]
-            results = self.vector_store.query(
-                query_embedding=query_embedding,
-                n_results=1
-            )
-            
-            if results and results.get('distances') and results['distances'][0]:
-                distance = results['distances'][0][0]
-                # Convert distance to similarity score
-                similarity = max(0, 1 - distance) if distance is not None else 0
-                return similarity
-            
-            return 0.0
-            
+            if retrieval is None:
+                # Do a quick search with just 1 result to get similarity
+                retrieval = self.create_context(query, top_k=1)
+            await self.retrieve(retrieval)
+            return retrieval.top_similarity
+
         except Exception as e:
             print(f"Quick search error: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    async def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeds several queries; those not in the query embedding cache are embedded
+        together in one model call.
+        """
+        model_id = get_embedding_model_id()
+        cached = [query_embedding_cache.get(model_id, query) for query in queries]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            computed = await query_embedding_batcher.embed_many([queries[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                query_embedding_cache.put(model_id, queries[i], embedding)
+                cached[i] = embedding
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    async def iter_search_many(
+        self, queries: List[str], top_k: int = 5, group_size: int = BATCH_QUERY_GROUP
+    ) -> AsyncIterator[Tuple[int, List[SearchResult]]]:
+        """
+        Searches for many queries at once, yielding (query index, results) pairs.
+
+        All queries are embedded first; the vector store is then queried with
+        `group_size` embeddings per call, and each group's results are yielded as soon
+        as that call returns.
+        """
+        if not queries:
+            return
+        embeddings = await self.embed_queries(queries)
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(queries), group_size):
+            results = await loop.run_in_executor(
+                None, self.vector_store.query_many, embeddings[start:start + group_size], top_k
+            )
+            documents = results.get('documents') or []
+            metadatas = results.get('metadatas') or [[{}] * len(docs) for docs in documents]
+            distances = results.get('distances') or [[0] * len(docs) for docs in documents]
+            for offset, query_results in enumerate(zip(documents, metadatas, distances)):
+                yield start + offset, _to_search_results(*query_results)
+
+    async def search_many(self, queries: List[str], top_k: int = 5) -> List[List[SearchResult]]:
+        """Searches through RAG documents for each query; returns one result list per query."""
+        results: List[List[SearchResult]] = [[] for _ in queries]
+        async for index, search_results in self.iter_search_many(queries, top_k):
+            results[index] = search_results
+        return results
@@ -0,0 +1,28 @@
+import json
+from typing import AsyncIterator, Dict, Tuple
+from fastapi.responses import StreamingResponse
+
+def sse_event(event: str, data: Dict) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events: AsyncIterator[Tuple[str, Dict]]) -> StreamingResponse:
+    """
+    Streams (event, data) pairs to the client as server-sent events, each one as soon
+    as it is produced. Since the status code is sent with the first event, a failure
+    afterwards is reported as a final "error" event.
+    """
+    async def stream():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"Streaming error: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
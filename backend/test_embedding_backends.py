@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Parity test of the ONNX embedding backend against the torch backend.
+
+Skipped when the ONNX extra (optimum, onnxruntime) or the model files are not available.
+Run from the backend directory:
+    python -m pytest test_embedding_backends.py
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum.onnxruntime")
+
+import processing.embedder as embedder
+
+# Minimum cosine similarity between the two backends' embeddings of the same text;
+# the int8-quantized exports stay above it for this model
+MIN_COSINE = 0.98
+
+TEXTS = [
+    "What is the deadline for the project timeline?",
+    "Swiss teams value punctuality and direct feedback in meetings.",
+    "Budget approval requires sign-off from every stakeholder.",
+    "Hierarchy and communication styles differ between cultures, which affects negotiations.",
+    "Kick-off",
+]
+
+@pytest.fixture
+def restore_embedding_config():
+    config = (embedder.batch_size, embedder.backend, embedder.onnx_file, embedder.cache_enabled)
+    yield
+    batch, backend, onnx_file, cache_enabled = config
+    embedder.configure_embedding(batch=batch, model_backend=backend, onnx_model_file=onnx_file)
+    embedder.configure_embedding_cache(enabled=cache_enabled)
+
+def _embed(backend: str) -> np.ndarray:
+    embedder.configure_embedding_cache(enabled=False)
+    embedder.configure_embedding(model_backend=backend, onnx_model_file=embedder.ONNX_FILE)
+    try:
+        return embedder.embed_texts(TEXTS)
+    except OSError as e:
+        pytest.skip(f"The {backend} model is not available: {e}")
+
+def test_onnx_embeddings_match_torch(restore_embedding_config):
+    torch_embeddings = _embed("torch")
+    onnx_embeddings = _embed("onnx")
+
+    assert onnx_embeddings.shape == torch_embeddings.shape
+    # Rows are unit length, so the row-wise dot product is the cosine similarity
+    cosines = np.einsum("ij,ij->i", torch_embeddings, onnx_embeddings)
+    assert cosines.min() >= MIN_COSINE, f"cosine similarities to torch: {cosines}"
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests of the background ingestion job queue.
+
+Ingestion itself is replaced by a stand-in, so these tests need neither the embedding
+model nor a vector store with data. Run from the backend directory:
+    python -m pytest test_ingestion_jobs.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import processing.compaction as compaction
+import processing.jobs as jobs
+import processing.registry as registry
+
+class _VectorStore:
+    def get_count(self) -> int:
+        return 0
+
+class _Ingestion:
+    """Stands in for ingest_document; the first call hangs until it is cancelled."""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = None
+
+    async def __call__(self, payload, original_filename, file_id, on_progress=None):
+        self.calls += 1
+        if self.calls == 1:
+            on_progress("parsed")
+            self.started.set()
+            await asyncio.Event().wait()
+        on_progress("stored")
+        return {"chunks_added": 3, "chunks_reused": 0}
+
+@pytest.fixture
+def job_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "PROCESSED_FILES_DB", tmp_path / "processed_files.json")
+    monkeypatch.setattr(registry, "CHUNK_HASHES_DIR", tmp_path / "chunk_hashes")
+    monkeypatch.setattr(jobs, "JOB_PAYLOAD_DIR", tmp_path / "jobs")
+    monkeypatch.setattr(jobs, "vector_store_instance", _VectorStore())
+    monkeypatch.setattr(jobs, "release_document_chunks", lambda file_id: 0)
+    monkeypatch.setattr(compaction, "release_document_chunks", lambda file_id: 0)
+    ingestion = _Ingestion()
+    monkeypatch.setattr(jobs, "ingest_document", ingestion)
+    return tmp_path, ingestion
+
+async def _wait_for_job(store: jobs.JobStore, job_id: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while store.get(job_id)["status"] in jobs.ACTIVE_JOB_STATUSES:
+        assert time.monotonic() < deadline, f"job still {store.get(job_id)['status']}"
+        await asyncio.sleep(0.01)
+
+def _create_job(queue: jobs.IngestionJobQueue, payload_path, job_id: str, file_id: str):
+    payload_path.parent.mkdir(parents=True)
+    payload_path.write_text("Travel policy")
+    registry.start_ingestion(file_id)
+    registry.add_processed_file("policy.txt", file_id, 13, status="queued", job_id=job_id)
+    queue.store.create(job_id, [{
+        "filename": "policy.txt",
+        "file_id": file_id,
+        "payload_path": str(payload_path),
+        "stage": "queued",
+        "chunks_added": 0,
+        "chunks_reused": 0,
+        "error": None
+    }])
+    queue.submit(job_id)
+
+def test_running_job_resumes_after_restart(job_env):
+    tmp_path, ingestion = job_env
+    jobs_db = tmp_path / "ingestion_jobs.json"
+    job_id, file_id = "job-1", "file-1"
+    payload_path = tmp_path / "jobs" / job_id / f"{file_id}.txt"
+
+    async def first_run():
+        ingestion.started = asyncio.Event()
+        queue = jobs.IngestionJobQueue(jobs.JobStore(jobs_db))
+        queue.start()
+        _create_job(queue, payload_path, job_id, file_id)
+        await asyncio.wait_for(ingestion.started.wait(), 10)
+        # A graceful shutdown while the file is being ingested
+        await queue.stop()
+
+    asyncio.run(first_run())
+    assert payload_path.exists()
+    assert jobs.JobStore(jobs_db).get(job_id)["status"] == "running"
+
+    async def second_run():
+        queue = jobs.IngestionJobQueue(jobs.JobStore(jobs_db))
+        queue.start()
+        try:
+            await _wait_for_job(queue.store, job_id)
+        finally:
+            await queue.stop()
+        return queue.store.get(job_id)
+
+    job = asyncio.run(second_run())
+    assert ingestion.calls == 2
+    assert job["status"] == "completed"
+    assert job["files"][0]["stage"] == "stored"
+    assert job["result"]["total_chunks_added"] == 3
+    entry = registry.get_processed_file(file_id)
+    assert entry["status"] == registry.COMPLETED_STATUS
+    assert entry["chunks_added"] == 3
+    assert not payload_path.parent.exists()
+
+def test_compaction_keeps_entries_being_ingested(job_env):
+    tmp_path, ingestion = job_env
+
+    async def run():
+        ingestion.started = asyncio.Event()
+        queue = jobs.IngestionJobQueue(jobs.JobStore(tmp_path / "ingestion_jobs.json"))
+        queue.start()
+        try:
+            # A synchronous upload in progress, and one whose request died without cleanup
+            registry.start_ingestion("uploading")
+            registry.add_processed_file("uploading.txt", "uploading", 10, status="embedded")
+            registry.add_processed_file("interrupted.txt", "interrupted", 10, status="embedded")
+            _create_job(queue, tmp_path / "jobs" / "job-1" / "queued.txt", "job-1", "queued")
+            await asyncio.wait_for(ingestion.started.wait(), 10)
+            compactor = compaction.StorageCompactor(queue.store, interval_minutes=0, grace_minutes=0)
+            return compactor._reconcile_registry()
+        finally:
+            await queue.stop()
+            registry.finish_ingestion("uploading")
+
+    report = asyncio.run(run())
+    assert report["file_ids"] == ["interrupted"]
+    assert registry.get_processed_file("uploading") is not None
+    assert registry.get_processed_file("queued") is not None
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests that documents are ingested in bounded memory: the parse worker streams chunks to
+a spool file, and the pipeline embeds and stores them batch by batch.
+
+The embedding model and the vector store are replaced by stand-ins. Run from the
+backend directory:
+    python -m pytest test_ingestion_pipeline.py
+"""
+
+import asyncio
+import tracemalloc
+
+import numpy as np
+import openpyxl
+import pytest
+
+import processing.ingest_worker as ingest_worker
+import processing.loader as loader
+import processing.pipeline as pipeline
+
+ROWS = 100_000
+WRITE_BATCH_SIZE = 50
+
+@pytest.fixture(scope="module")
+def large_export(tmp_path_factory):
+    path = tmp_path_factory.mktemp("export") / "export.xlsx"
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Bookings")
+    for row in _export_rows():
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+def _export_rows():
+    yield ["Booking", "Traveller", "Destination", "Cost centre", "Amount"]
+    for i in range(ROWS):
+        yield [i, f"Traveller {i % 977}", f"City {i % 131}", f"CC-{i % 17}", (i * 7) % 5000]
+
+def test_parse_worker_streams_spreadsheet_chunks(tmp_path, monkeypatch):
+    # The rows come from a generator through the loader's row batching, so that what is
+    # measured is the chunking and the spooling rather than the spreadsheet parser
+    def iter_segments(source, original_filename):
+        return loader._iter_sheet_rows("Bookings", enumerate(_export_rows(), start=1))
+
+    monkeypatch.setattr(ingest_worker, "iter_document_segments", iter_segments)
+    spool_path = tmp_path / "chunks.tmp"
+
+    tracemalloc.start()
+    try:
+        hashes = ingest_worker.parse_and_chunk(b"", "export.xlsx", str(spool_path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    with open(spool_path, encoding="utf-8") as spool:
+        assert sum(1 for _ in spool) == len(hashes)
+    # The export's text is written out, not held: peak memory is a small fraction of it
+    spool_size = spool_path.stat().st_size
+    assert peak < spool_size / 4, f"peak {peak} bytes for a {spool_size} byte spool"
+
+class _VectorStore:
+    write_batch_size = WRITE_BATCH_SIZE
+
+    def __init__(self, tracker: "_Tracker"):
+        self.tracker = tracker
+        self.ids = set()
+
+    def get_existing_ids(self, ids):
+        return self.ids.intersection(ids)
+
+    def add_documents(self, texts, embeddings, metadatas, ids):
+        self.ids.update(ids)
+        self.tracker.written += len(texts)
+
+class _Tracker:
+    """Counts the chunks read from the spool and written, and the most held in between."""
+
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.most_in_flight = 0
+        self.embed_batches = []
+
+    def read_chunks(self, spool, count):
+        chunks = _read_chunks(spool, count)
+        self.read += len(chunks)
+        self.most_in_flight = max(self.most_in_flight, self.read - self.written)
+        return chunks
+
+    def embed(self, texts):
+        self.embed_batches.append(len(texts))
+        embeddings = np.random.default_rng(0).standard_normal((len(texts), 8)).astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+_read_chunks = pipeline._read_chunks
+
+def test_chunks_are_embedded_and_stored_batch_by_batch(large_export, tmp_path, monkeypatch):
+    tracker = _Tracker()
+    store = _VectorStore(tracker)
+    monkeypatch.setattr(pipeline, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "vector_store_instance", store)
+    monkeypatch.setattr(pipeline, "embed_texts", tracker.embed)
+    monkeypatch.setattr(pipeline, "_read_chunks", tracker.read_chunks)
+
+    async def ingest():
+        try:
+            return await pipeline.ingest_document(str(large_export), large_export.name, "file-1")
+        finally:
+            pipeline.shutdown_pipeline()
+
+    result = asyncio.run(ingest())
+
+    assert result["chunks_added"] == tracker.read
+    assert tracker.written == len(store.ids) > WRITE_BATCH_SIZE * 10
+    assert max(tracker.embed_batches) <= WRITE_BATCH_SIZE
+    # One batch being written while the next one is embedded, never more
+    assert tracker.most_in_flight <= 2 * WRITE_BATCH_SIZE
+    assert not list(tmp_path.glob("chunks-*.tmp"))
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
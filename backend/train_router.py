@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Rebuilds the local query router's index from the decision log.
+
+The server adds every LLM routing decision to the index as it is made; rebuild it when
+the embedding model changed (the old index is then ignored) or to train from a decision
+log collected elsewhere. Run it with the server stopped, since the server saves its own
+index on shutdown.
+
+Usage (from the backend directory):
+    python train_router.py [--log router_data/decisions.jsonl]
+"""
+
+import argparse
+import time
+
+from config import settings
+from processing.embedder import configure_embedding, embed_texts, get_embedding_model_id
+from services.local_router import load_decisions, local_router
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="Decision log to train from (default: the configured one)")
+    args = parser.parse_args()
+
+    configure_embedding(
+        batch=settings.embedding_batch_size,
+        model_backend=settings.embedding_backend,
+        onnx_model_file=settings.embedding_onnx_file
+    )
+    local_router.configure(
+        directory=settings.local_router_dir,
+        k=settings.local_router_k,
+        confidence_threshold=settings.local_router_confidence,
+        min_examples=settings.local_router_min_examples
+    )
+    decisions = load_decisions(args.log or local_router.decision_log_path)
+    if not decisions:
+        print("No routing decisions logged yet")
+        return
+
+    started = time.perf_counter()
+    embeddings = embed_texts([decision["query"] for decision in decisions])
+    local_router.rebuild(get_embedding_model_id(), embeddings, [decision["strategy"] for decision in decisions])
+    local_router.flush()
+
+    counts = {}
+    for decision in decisions:
+        counts[decision["strategy"]] = counts.get(decision["strategy"], 0) + 1
+    print(f"Indexed {len(decisions)} decisions {counts} in {time.perf_counter() - started:.1f}s -> {local_router.index_path}")
+
+if __name__ == "__main__":
+    main()
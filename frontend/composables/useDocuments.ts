@@ -14,6 +14,7 @@ interface ApiFile {
   file_size: number;
   upload_time: number;
   file_id: string;
+  status?: string;
 }
 
 const documents = ref<Document[]>([]);
@@ -42,7 +43,7 @@ const fetchDocuments = async () => {
         name: file.filename,
         size: formatFileSize(file.file_size),
         upload_date: formatDate(file.upload_time),
-        status: "completed" as const,
+        status: !file.status || file.status === "completed" ? "completed" as const : "processing" as const,
         file_id: file.file_id
       }));
     } else {